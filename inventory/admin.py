@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Categorie, Produit, MouvementStock, Fournisseur
+from .models import AlerteStock, Categorie, Produit, MouvementStock, Fournisseur, StatistiquesProduit
 
 @admin.register(Categorie)
 class CategorieAdmin(admin.ModelAdmin):
@@ -13,10 +13,13 @@ class FournisseurAdmin(admin.ModelAdmin):
 
 @admin.register(Produit)
 class ProduitAdmin(admin.ModelAdmin):
-    list_display = ('nom', 'code_barre', 'quantite_actuelle', 'prix_unitaire', 'categorie', 'seuil_alerte_faible', 'est_stock_faible_display', 'est_en_rupture_display')
+    list_display = ('nom', 'code_barre', 'quantite_actuelle', 'prix_unitaire', 'categorie', 'seuil_alerte_faible', 'est_stock_faible_display', 'est_en_rupture_display',
+                    'total_entrees_display', 'total_sorties_display', 'dernier_mouvement_display', 'dernier_fournisseur_display')
     list_filter = ('categorie', 'quantite_actuelle')
     search_fields = ('nom', 'code_barre')
     readonly_fields = ('quantite_actuelle',)
+    # Agrégats stockés (StatistiquesProduit), chargés par jointure avec la liste
+    list_select_related = ('categorie', 'statistiques', 'statistiques__dernier_fournisseur')
 
     # Utilisez le décorateur admin.display
     @admin.display(boolean=True, description="Stock faible")
@@ -27,6 +30,32 @@ class ProduitAdmin(admin.ModelAdmin):
     def est_en_rupture_display(self, obj):
         return obj.est_en_rupture
 
+    def _statistiques(self, obj):
+        try:
+            return obj.statistiques
+        except StatistiquesProduit.DoesNotExist:
+            return None
+
+    @admin.display(description="Total reçu", ordering='statistiques__total_entrees')
+    def total_entrees_display(self, obj):
+        statistiques = self._statistiques(obj)
+        return statistiques.total_entrees if statistiques else 0
+
+    @admin.display(description="Total sorti", ordering='statistiques__total_sorties')
+    def total_sorties_display(self, obj):
+        statistiques = self._statistiques(obj)
+        return statistiques.total_sorties if statistiques else 0
+
+    @admin.display(description="Dernier mouvement", ordering='statistiques__date_dernier_mouvement')
+    def dernier_mouvement_display(self, obj):
+        statistiques = self._statistiques(obj)
+        return statistiques.date_dernier_mouvement if statistiques else None
+
+    @admin.display(description="Dernier fournisseur")
+    def dernier_fournisseur_display(self, obj):
+        statistiques = self._statistiques(obj)
+        return statistiques.dernier_fournisseur if statistiques else None
+
 @admin.register(MouvementStock)
 class MouvementStockAdmin(admin.ModelAdmin):
     list_display = ('produit', 'type_mouvement', 'quantite', 'date_mouvement', 'utilisateur', 'fournisseur', 'raison_mouvement')
@@ -38,4 +67,14 @@ class MouvementStockAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if not obj.pk: # Si c'est un nouvel objet
             obj.utilisateur = request.user
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+@admin.register(AlerteStock)
+class AlerteStockAdmin(admin.ModelAdmin):
+    list_display = ('produit', 'etat', 'date_ouverture', 'date_fermeture')
+    list_filter = ('etat', ('date_fermeture', admin.EmptyFieldListFilter))
+    search_fields = ('produit__nom', 'produit__code_barre')
+    list_select_related = ('produit',)
+    date_hierarchy = 'date_ouverture'
+    # Tenue à jour par les mouvements ; utiliser manage.py repair_stock_alerts en cas d'écart
+    readonly_fields = ('produit', 'etat', 'date_ouverture', 'date_fermeture')
@@ -0,0 +1,19 @@
+# inventory/analyses.py
+"""
+Séries d'entrées et de sorties par jour ou par semaine, lues dans la table des cumuls (CumulMouvements).
+
+Chaque point est une ligne de cumul déjà calculée : une série de plusieurs années est un simple
+parcours de l'index (dimension, clé, période, date), sans toucher aux mouvements.
+"""
+
+from .models import CumulMouvements
+
+
+def serie(dimension, periode, cle=0, date_debut=None, date_fin=None):
+    cumuls = CumulMouvements.objects.filter(dimension=dimension, cle=cle, periode=periode)
+    if date_debut:
+        # Pour les semaines, on garde celle qui contient date_debut
+        cumuls = cumuls.filter(date_debut__gte=CumulMouvements.debuts_de_periode(date_debut)[periode])
+    if date_fin:
+        cumuls = cumuls.filter(date_debut__lte=date_fin)
+    return list(cumuls.order_by('date_debut').values('date_debut', 'entrees', 'sorties', 'nombre'))
@@ -0,0 +1,120 @@
+# inventory/api.py
+"""
+API JSON en lecture (v1) pour la synchronisation des clients mobiles et caisses : produits, catégories,
+fournisseurs et mouvements de stock.
+
+- Pagination par curseur : les lignes sont triées par clé primaire et ?curseur= reprend après la dernière
+  ligne reçue (pas d'OFFSET, pages stables pendant l'ajout de mouvements). ?taille= fixe la taille de la page.
+- Sélection des champs : ?champs=id,nom,quantite_actuelle (tous les champs publics par défaut).
+- Requêtes conditionnelles : l'ETag et la date Last-Modified viennent des versions du catalogue
+  (cache_catalogue), pas du contenu. Une page inchangée est renvoyée en 304 sans lire les tables du stock.
+  L'ETag est fort ; la compression gzip le rend faible, ce qui suffit à If-None-Match.
+"""
+
+import base64
+import binascii
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+from . import cache_catalogue
+from .models import Categorie, Fournisseur, MouvementStock, Produit
+
+VERSION = 'v1'
+
+TAILLE_PAGE = getattr(settings, 'API_TAILLE_PAGE', 100)
+TAILLE_PAGE_MAX = getattr(settings, 'API_TAILLE_PAGE_MAX', 1000)
+
+# Champs publics de chaque ressource (les clés étrangères sont renvoyées par identifiant),
+# versions du catalogue dont dépend son contenu et permission nécessaire pour la lire
+RESSOURCES = {
+    'produits': {
+        'modele': Produit,
+        'champs': ('id', 'nom', 'description', 'code_barre', 'prix_unitaire', 'quantite_actuelle', 'seuil_alerte_faible', 'categorie'),
+        'versions': ('produit', 'categorie'),
+        'permission': None,
+    },
+    'categories': {
+        'modele': Categorie,
+        'champs': ('id', 'nom'),
+        'versions': ('categorie',),
+        'permission': None,
+    },
+    'fournisseurs': {
+        'modele': Fournisseur,
+        'champs': ('id', 'nom', 'contact', 'adresse'),
+        'versions': ('fournisseur',),
+        'permission': None,
+    },
+    'mouvements': {
+        'modele': MouvementStock,
+        'champs': ('id', 'produit', 'type_mouvement', 'quantite', 'date_mouvement', 'utilisateur', 'raison_mouvement', 'fournisseur'),
+        'versions': ('mouvement', 'fournisseur'),
+        'permission': 'inventory.view_mouvementstock',
+    },
+}
+
+
+class ParametreInvalide(ValueError):
+    pass
+
+
+def encoder_curseur(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur):
+    try:
+        return int(base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ParametreInvalide(f"Curseur invalide '{curseur}'.")
+
+
+def parametres(request, ressource):
+    """
+    (champs, après la clé primaire, taille de page) demandés, ou ParametreInvalide.
+    """
+    publics = RESSOURCES[ressource]['champs']
+    valeur = request.GET.get('champs')
+    if valeur:
+        champs = tuple(dict.fromkeys(champ.strip() for champ in valeur.split(',') if champ.strip()))
+        inconnus = [champ for champ in champs if champ not in publics]
+        if inconnus or not champs:
+            raise ParametreInvalide(f"Champs inconnus : {', '.join(inconnus) or valeur}. Champs disponibles : {', '.join(publics)}.")
+    else:
+        champs = publics
+    curseur = request.GET.get('curseur')
+    apres = decoder_curseur(curseur) if curseur else None
+    try:
+        taille = int(request.GET.get('taille', TAILLE_PAGE))
+    except ValueError:
+        raise ParametreInvalide("La taille de page doit être un entier.")
+    return champs, apres, min(max(taille, 1), TAILLE_PAGE_MAX)
+
+
+def etag(request, ressource):
+    # Même version des tables et mêmes paramètres : même page
+    champs, apres, taille = parametres(request, ressource)
+    versions = cache_catalogue.versions(*RESSOURCES[ressource]['versions'])
+    empreinte = hashlib.md5(repr((VERSION, ressource, versions, champs, apres, taille)).encode()).hexdigest()
+    return f"{VERSION}-{ressource}-{empreinte}"
+
+
+def derniere_modification(request, ressource):
+    # À la seconde près : If-None-Match (ETag), prioritaire quand le client l'envoie, est exact
+    horodatage = cache_catalogue.derniere_modification(*RESSOURCES[ressource]['versions'])
+    return datetime.fromtimestamp(int(horodatage), tz=dt_timezone.utc)
+
+
+def page(ressource, champs, apres, taille):
+    """
+    Lignes de la page (dictionnaires limités aux `champs`) et curseur de la suivante (None en fin de liste).
+    """
+    requete = RESSOURCES[ressource]['modele'].objects.order_by('pk')
+    if apres is not None:
+        requete = requete.filter(pk__gt=apres)
+    # values_list() renvoie l'identifiant des clés étrangères, sans jointure
+    lignes = list(requete.values_list('pk', *champs)[:taille + 1])
+    suivant = encoder_curseur(lignes[taille - 1][0]) if len(lignes) > taille else None
+    return [dict(zip(champs, ligne[1:])) for ligne in lignes[:taille]], suivant
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        # Branche les récepteurs de signaux (invalidation des caches, réglages des connexions SQLite)
+        # et les vérifications de la configuration (manage.py check)
+        from . import checks, signals  # noqa: F401
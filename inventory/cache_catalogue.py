@@ -0,0 +1,158 @@
+# inventory/cache_catalogue.py
+"""
+Cache des fragments de gabarit des listes du catalogue (produits, catégories, fournisseurs).
+
+Chaque modèle a un numéro de version dans le cache partagé entre les processus (CACHES['partage']) ;
+les fragments restent dans le cache du processus. La clé d'un fragment contient les versions
+des modèles qu'il affiche, les paramètres de la page et la signature des droits de l'utilisateur
+(les colonnes d'actions réservées au personnel ne sont jamais servies à un autre profil).
+Tout enregistrement ou suppression change la version du modèle après validation de la transaction,
+y compris depuis une commande de gestion :
+les fragments précédents ne sont plus lus et expirent d'eux-mêmes (CATALOGUE_CACHE_TIMEOUT).
+Les mouvements de stock changent les quantités et totaux affichés : ils changent la version des produits.
+
+Les versions invalidées pendant une transaction sont écrites ensemble après sa validation, en une seule
+écriture dans le cache partagé ; un cache indisponible à ce moment est journalisé sans faire échouer
+la requête, dont l'écriture est déjà validée.
+
+Une version est l'horodatage (en nanosecondes) de la dernière modification du modèle : derniere_modification()
+en déduit l'entête Last-Modified de l'API JSON. Les versions de 'mouvement' servent à l'API des mouvements de stock.
+
+Les compteurs de succès et d'échecs sont propres au processus (voir statistiques()).
+"""
+
+import hashlib
+import threading
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import router, transaction
+
+DUREE_CACHE = getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 3600)
+ALIAS_PARTAGE = getattr(settings, 'CACHE_PARTAGE', 'partage')
+
+MODELES = ('produit', 'categorie', 'fournisseur')
+
+
+def partage():
+    # Cache commun à tous les processus (serveurs web et commandes de gestion)
+    return caches[ALIAS_PARTAGE]
+
+
+def _cle_version(modele):
+    return f"inventory:catalogue:version:{modele}"
+
+
+# Modèles invalidés dont la version n'est pas encore écrite, propres au thread (et donc à sa connexion)
+_en_attente = threading.local()
+
+
+def _modeles_en_attente():
+    if not hasattr(_en_attente, 'modeles'):
+        _en_attente.modeles = set()
+    return _en_attente.modeles
+
+
+def _nouvelle_version():
+    # Jamais réutilisée, même si la version est évincée du cache : un ancien fragment ne peut pas redevenir valide.
+    # Écrite sans lecture préalable : deux processus qui invalident en même temps ne se marchent pas dessus
+    return time.time_ns()
+
+
+def versions(*modeles):
+    cles = [_cle_version(modele) for modele in modeles]
+    trouvees = partage().get_many(cles)
+    for cle in cles:
+        if cle not in trouvees:
+            partage().add(cle, _nouvelle_version(), None)
+            trouvees[cle] = partage().get(cle)
+    return [trouvees[cle] for cle in cles]
+
+
+def _ecrire_versions():
+    # Le premier rappel de la transaction écrit toutes les versions en attente, les suivants n'ont plus rien à faire
+    modeles = _modeles_en_attente()
+    if not modeles:
+        return
+    version = _nouvelle_version()
+    cache_partage = partage()
+    # DatabaseCache : toutes les versions dans une seule transaction d'écriture
+    table = getattr(cache_partage, 'cache_model_class', None)
+    with transaction.atomic(using=router.db_for_write(table)) if table else nullcontext():
+        cache_partage.set_many({_cle_version(modele): version for modele in modeles}, None)
+    # En cas d'échec, les modèles restent en attente et sont écrits à la validation suivante
+    modeles.clear()
+
+
+def invalider(*modeles):
+    # Après validation : un lecteur concurrent ne peut pas remettre en cache un état déjà périmé
+    _modeles_en_attente().update(modeles)
+    transaction.on_commit(_ecrire_versions, robust=True)
+
+
+def derniere_modification(*modeles):
+    """
+    Date (timestamp) de la dernière invalidation parmi les `modeles`, à défaut celle de leur première lecture.
+    """
+    return max(versions(*modeles)) / 1e9
+
+
+def signature_droits(utilisateur, droits=()):
+    # Statut personnel et droits qui changent le rendu du fragment, ex. "s1:10"
+    return f"s{int(utilisateur.is_staff)}:" + ''.join(str(int(utilisateur.has_perm(droit))) for droit in droits)
+
+
+def cle(nom, modeles, utilisateur, droits=(), **parametres):
+    """
+    Clé du fragment `nom` affichant les `modeles`, pour cet utilisateur et ces paramètres de page.
+    """
+    empreinte = hashlib.md5(repr(sorted(parametres.items())).encode()).hexdigest()[:12]
+    numeros = '.'.join(str(version) for version in versions(*modeles))
+    return f"inventory:catalogue:{nom}:{numeros}:{signature_droits(utilisateur, droits)}:{empreinte}"
+
+
+class Compteurs:
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+
+    def compter(self, succes):
+        with self._verrou:
+            if succes:
+                self.succes += 1
+            else:
+                self.echecs += 1
+
+    def vider(self):
+        with self._verrou:
+            self.succes = self.echecs = 0
+
+    def statistiques(self):
+        with self._verrou:
+            total = self.succes + self.echecs
+            return {
+                'succes': self.succes,
+                'echecs': self.echecs,
+                'taux_succes': round(self.succes / total, 4) if total else None,
+            }
+
+
+compteurs = Compteurs()
+
+
+def lire(cle_fragment):
+    contenu = cache.get(cle_fragment)
+    compteurs.compter(contenu is not None)
+    return contenu
+
+
+def ecrire(cle_fragment, contenu):
+    cache.set(cle_fragment, contenu, DUREE_CACHE)
+
+
+def statistiques():
+    return {**compteurs.statistiques(), 'versions': dict(zip(MODELES, versions(*MODELES)))}
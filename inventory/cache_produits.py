@@ -0,0 +1,112 @@
+# inventory/cache_produits.py
+"""
+Cache LRU en mémoire du processus pour la recherche de produit par code-barres (douchettes).
+
+Le cache est borné (SCANNER_CACHE_TAILLE entrées) et chaque entrée expire après SCANNER_CACHE_TTL
+secondes. Il est invalidé par les signaux de Produit et MouvementStock et par l'import en masse,
+après validation de la transaction. L'invalidation ne concerne que le processus qui écrit :
+le TTL borne l'ancienneté des données vues par les autres processus.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Produit
+
+TAILLE = getattr(settings, 'SCANNER_CACHE_TAILLE', 10000)
+TTL = getattr(settings, 'SCANNER_CACHE_TTL', 30)
+
+
+class CacheLRU:
+
+    def __init__(self, taille=TAILLE, ttl=TTL):
+        self.taille = taille
+        self.ttl = ttl
+        self._entrees = OrderedDict()  # code_barre -> (expiration, résumé)
+        self._codes_par_produit = {}   # produit_id -> code_barre, pour invalider depuis un mouvement
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+
+    def lire(self, code_barre):
+        with self._verrou:
+            entree = self._entrees.get(code_barre)
+            if entree is not None and entree[0] > time.monotonic():
+                self._entrees.move_to_end(code_barre)
+                self.succes += 1
+                return entree[1]
+            self.echecs += 1
+            return None
+
+    def ecrire(self, code_barre, resume):
+        with self._verrou:
+            self._entrees[code_barre] = (time.monotonic() + self.ttl, resume)
+            self._entrees.move_to_end(code_barre)
+            self._codes_par_produit[resume['id']] = code_barre
+            while len(self._entrees) > self.taille:
+                _, (_, ancien) = self._entrees.popitem(last=False)
+                self._codes_par_produit.pop(ancien['id'], None)
+
+    def invalider_produit(self, produit_id):
+        with self._verrou:
+            code_barre = self._codes_par_produit.pop(produit_id, None)
+            if code_barre is not None:
+                self._entrees.pop(code_barre, None)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self._codes_par_produit.clear()
+            self.succes = self.echecs = 0
+
+    def statistiques(self):
+        with self._verrou:
+            total = self.succes + self.echecs
+            return {
+                'entrees': len(self._entrees),
+                'taille_max': self.taille,
+                'succes': self.succes,
+                'echecs': self.echecs,
+                'taux_succes': round(self.succes / total, 4) if total else None,
+            }
+
+
+cache = CacheLRU()
+
+
+def _resume(produit):
+    return {
+        'id': produit.pk,
+        'nom': produit.nom,
+        'code_barre': produit.code_barre,
+        'prix_unitaire': str(produit.prix_unitaire),
+        'quantite_actuelle': produit.quantite_actuelle,
+        'seuil_alerte_faible': produit.seuil_alerte_faible,
+        'categorie': produit.categorie.nom if produit.categorie else None,
+    }
+
+
+def rechercher(code_barre):
+    """
+    Résumé du produit portant `code_barre` (None s'il n'existe pas) et indicateur de succès du cache.
+    """
+    resume = cache.lire(code_barre)
+    if resume is not None:
+        return resume, True
+    produit = Produit.objects.select_related('categorie').filter(code_barre=code_barre).first()
+    if produit is None:
+        return None, False
+    resume = _resume(produit)
+    cache.ecrire(code_barre, resume)
+    return resume, False
+
+
+def invalider(*produit_ids):
+    def _invalider():
+        for produit_id in produit_ids:
+            cache.invalider_produit(produit_id)
+    transaction.on_commit(_invalider, robust=True)
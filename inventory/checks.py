@@ -0,0 +1,74 @@
+# inventory/checks.py
+"""
+Vérifications de la configuration, lancées par manage.py check et au démarrage du serveur.
+"""
+
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from .cache_catalogue import ALIAS_PARTAGE
+from .recherche import TABLE_FTS
+
+# Moteurs de session qui lisent les sessions dans le cache SESSION_CACHE_ALIAS
+SESSIONS_EN_CACHE = ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db')
+
+# Triggers qui tiennent l'index plein texte à jour (migration 0006)
+TRIGGERS_FTS = ('inventory_produit_fts_ai', 'inventory_produit_fts_ad', 'inventory_produit_fts_au')
+
+
+@register(Tags.caches)
+def verifier_cache_partage(app_configs, **kwargs):
+    """
+    Le cache partagé (versions du catalogue, droits, tableau de bord) et celui des sessions doivent être
+    communs à tous les processus : une invalidation faite par l'un doit être vue par les autres.
+    """
+    alias = {ALIAS_PARTAGE: "Le cache partagé"}
+    if settings.SESSION_ENGINE in SESSIONS_EN_CACHE:
+        alias.setdefault(settings.SESSION_CACHE_ALIAS, "Le cache des sessions")
+    erreurs = []
+    for nom, role in alias.items():
+        configuration = settings.CACHES.get(nom)
+        if configuration is None:
+            erreurs.append(Error(f"{role} '{nom}' n'est pas défini dans CACHES.", id='inventory.E001'))
+        elif issubclass(import_string(configuration['BACKEND']), (LocMemCache, DummyCache)):
+            erreurs.append(Error(
+                f"{role} '{nom}' est propre à chaque processus ({configuration['BACKEND']}).",
+                hint="Utiliser DatabaseCache, Redis ou Memcached.",
+                id='inventory.E001',
+            ))
+    return erreurs
+
+
+@register(Tags.database)
+def verifier_index_plein_texte(app_configs, databases=None, **kwargs):
+    """
+    SQLite reconstruit inventory_produit pour la plupart des ALTER TABLE et supprime au passage ses triggers :
+    l'index FTS5 cesserait alors silencieusement de suivre les produits.
+    """
+    erreurs = []
+    for alias in databases or ():
+        connexion = connections[alias]
+        if connexion.vendor != 'sqlite':
+            continue
+        with connexion.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (%s)" % ', '.join(['%s'] * (len(TRIGGERS_FTS) + 1)),
+                [TABLE_FTS, *TRIGGERS_FTS],
+            )
+            presents = {nom for nom, in cursor.fetchall()}
+        if TABLE_FTS not in presents:
+            # Migration 0006 pas encore appliquée
+            continue
+        manquants = [trigger for trigger in TRIGGERS_FTS if trigger not in presents]
+        if manquants:
+            erreurs.append(Error(
+                f"Trigger(s) de l'index plein texte absent(s) sur '{alias}' : {', '.join(manquants)}.",
+                hint="Recréer les triggers de la migration 0006 puis reconstruire l'index "
+                     f"(INSERT INTO {TABLE_FTS}({TABLE_FTS}) VALUES ('rebuild')).",
+                id='inventory.E002',
+            ))
+    return erreurs
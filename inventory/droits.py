@@ -0,0 +1,103 @@
+# inventory/droits.py
+"""
+Groupes et permissions des utilisateurs, conservés dans le cache partagé entre les processus
+(cache_catalogue.partage()) : une invalidation faite par un processus est vue par tous.
+
+Sans cache, chaque requête protégée relit les groupes (is_admin / is_employee) puis les permissions
+de l'utilisateur et de ses groupes (permission_required). Ici, ils sont lus en deux requêtes au plus
+une fois par utilisateur, puis servis depuis le cache (DROITS_CACHE_TIMEOUT) et mémorisés sur l'objet
+utilisateur pour le reste de la requête. BackendDroitsEnCache (AUTHENTICATION_BACKENDS) fait
+passer has_perm(), permission_required et {{ perms }} par ce cache. L'utilisateur lui-même est relu
+en base à chaque requête : un compte désactivé ou un mot de passe changé prend effet immédiatement.
+
+Chaque entrée porte la version commune avec laquelle elle a été calculée ; l'entrée et la version
+sont lues ensemble, en un seul aller-retour vers le cache.
+
+Invalidation (voir signals.py) : l'entrée d'un utilisateur est supprimée quand il est modifié ou quand
+ses groupes ou permissions changent ; une modification d'un groupe (nom, permissions, suppression)
+change la version commune et invalide tous les utilisateurs. La suppression est faite tout de suite
+et de nouveau après validation, pour qu'un lecteur concurrent ne remette pas en cache un état périmé.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+from django.db import transaction
+from django.db.models import Q
+
+from .cache_catalogue import partage
+
+DUREE_CACHE = getattr(settings, 'DROITS_CACHE_TIMEOUT', 300)
+
+GROUPE_ADMINISTRATEURS = 'Administrateurs'
+GROUPE_EMPLOYES = 'Employés'
+
+_CLE_VERSION = 'inventory:droits:version'
+
+
+def _cle(user_id):
+    return f"inventory:droits:{user_id}"
+
+
+def _calculer(utilisateur):
+    groupes = frozenset(utilisateur.groups.values_list('name', flat=True))
+    permissions = frozenset(
+        f"{app_label}.{codename}"
+        for app_label, codename in Permission.objects.filter(Q(user=utilisateur) | Q(group__user=utilisateur))
+        .values_list('content_type__app_label', 'codename').distinct()
+    )
+    return {'groupes': groupes, 'permissions': permissions}
+
+
+def droits(utilisateur):
+    """
+    {'groupes': noms des groupes, 'permissions': 'app_label.codename'} d'un utilisateur authentifié.
+    """
+    if not hasattr(utilisateur, '_droits_en_cache'):
+        cle = _cle(utilisateur.pk)
+        trouvees = partage().get_many([_CLE_VERSION, cle])
+        version = trouvees.get(_CLE_VERSION)
+        if version is None:
+            # Jamais réutilisée si la version est évincée du cache : une ancienne entrée ne peut pas redevenir valide
+            partage().add(_CLE_VERSION, time.time_ns(), None)
+            version = partage().get(_CLE_VERSION)
+        valeur = trouvees.get(cle)
+        if valeur is None or valeur['version'] != version:
+            valeur = {**_calculer(utilisateur), 'version': version}
+            partage().set(cle, valeur, DUREE_CACHE)
+        utilisateur._droits_en_cache = valeur
+    return utilisateur._droits_en_cache
+
+
+def groupes(utilisateur):
+    if not utilisateur.is_authenticated:
+        return frozenset()
+    return droits(utilisateur)['groupes']
+
+
+def invalider(*user_ids):
+    def _supprimer():
+        partage().delete_many([_cle(user_id) for user_id in user_ids])
+    _supprimer()
+    # robust : un cache indisponible n'annule pas une écriture déjà validée
+    transaction.on_commit(_supprimer, robust=True)
+
+
+def invalider_tout():
+    def _changer():
+        # Nouvelle valeur écrite sans lecture préalable, comme les versions du catalogue
+        partage().set(_CLE_VERSION, time.time_ns(), None)
+    _changer()
+    transaction.on_commit(_changer, robust=True)
+
+
+class BackendDroitsEnCache(ModelBackend):
+    """
+    ModelBackend dont les permissions sont lues dans le cache des droits.
+    """
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return droits(user_obj)['permissions']
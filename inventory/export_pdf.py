@@ -0,0 +1,190 @@
+# inventory/export_pdf.py
+"""
+Génération du rapport PDF des mouvements de stock.
+
+Les mouvements sont lus en base par lots et mis en page dans des tableaux de la taille d'une page
+(entête répétée), produits au fur et à mesure de la mise en page (_mettre_en_page, qui place chaque
+élément dans le cadre de la page courante par l'API publique de Frame) : la mise en page reste linéaire
+et seul le tableau en cours est en mémoire. Les textes saisis (noms de produits) sont échappés avant
+d'entrer dans le balisage des Paragraph. Le PDF est écrit dans un fichier
+temporaire. Au-delà de EXPORT_PDF_LIGNES_MAX lignes, le rapport passe en mode résumé
+(totaux par produit et par type).
+"""
+
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Frame, LayoutError, Table, TableStyle, Paragraph
+
+from .rapports import TYPES_MOUVEMENT, lignes_export
+
+LIGNES_MAX = getattr(settings, 'EXPORT_PDF_LIGNES_MAX', 20000)
+
+# Lignes par tableau : un tableau tient à peu près sur une page A4 en police 8
+LIGNES_PAR_TABLEAU = 36
+
+# Marges de la page (celles de SimpleDocTemplate)
+MARGE = inch
+
+ENTETE = ['Date', 'Produit', 'Type Mouvement', 'Quantité', 'Raison Mouvement', 'Utilisateur', 'Fournisseur']
+LARGEURS = [1.3*inch, 1.8*inch, 1*inch, 0.8*inch, 1.5*inch, 1*inch, 1*inch]
+
+ENTETE_RESUME = ['Produit', 'Code Barre', 'Type Mouvement', 'Nombre de mouvements', 'Quantité totale']
+LARGEURS_RESUME = [2.4*inch, 1.4*inch, 1.2*inch, 1.3*inch, 1.1*inch]
+
+STYLE_TABLEAU = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#343a40')), # Couleur de l'entête
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('LEFTPADDING', (0, 0), (-1, -1), 3),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+    ('FONTSIZE', (0,0), (-1,-1), 8), # Taille de police réduite
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+])
+
+
+def _cadre(pagesize=A4):
+    largeur, hauteur = pagesize
+    return Frame(MARGE, MARGE, largeur - 2 * MARGE, hauteur - 2 * MARGE, id='normal')
+
+
+def _mettre_en_page(fichier, elements, pagesize=A4):
+    """
+    Place les `elements` (itérable) page par page dans `fichier` et renvoie le nombre de pages.
+    Chaque élément est dessiné avant que le suivant soit demandé ; un tableau qui dépasse la place
+    restante est coupé (Frame.split, entête répétée) et sa suite passe sur la page suivante.
+    """
+    toile = canvas.Canvas(fichier, pagesize=pagesize)
+    cadre = _cadre(pagesize)
+    pages = 1
+    page_vide = True
+    for element in elements:
+        en_attente = [element]
+        while en_attente:
+            tete = en_attente.pop(0)
+            if cadre.add(tete, toile, trySplit=1):
+                page_vide = False
+                continue
+            morceaux = cadre.split(tete, toile)
+            if morceaux and cadre.add(morceaux[0], toile, trySplit=1):
+                page_vide = False
+                en_attente[:0] = morceaux[1:]
+                continue
+            if page_vide:
+                raise LayoutError(f"{tete.__class__.__name__} trop grand pour une page.")
+            toile.showPage()
+            pages += 1
+            cadre = _cadre(pagesize)
+            page_vide = True
+            en_attente.insert(0, tete)
+    toile.showPage()
+    toile.save()
+    return pages
+
+
+def _tableau(lignes, entete=ENTETE, largeurs=LARGEURS):
+    tableau = Table([entete] + lignes, colWidths=largeurs, repeatRows=1)
+    tableau.setStyle(STYLE_TABLEAU)
+    return tableau
+
+
+def _tableaux_detail(movements, taille_lot, sur_progression):
+    lignes = []
+    ecrites = 0
+    for date_mouvement, nom, code_barre, type_mouvement, quantite, raison, utilisateur, fournisseur in lignes_export(movements, taille_lot):
+        lignes.append([
+            date_mouvement.strftime('%Y-%m-%d %H:%M:%S'),
+            f"{nom} ({code_barre})",
+            TYPES_MOUVEMENT.get(type_mouvement, type_mouvement),
+            str(quantite),
+            raison or '',
+            utilisateur or 'N/A',
+            fournisseur or '',
+        ])
+        if len(lignes) == LIGNES_PAR_TABLEAU:
+            yield _tableau(lignes)
+            ecrites += len(lignes)
+            lignes = []
+            if sur_progression:
+                sur_progression(ecrites)
+    if lignes:
+        yield _tableau(lignes)
+    if sur_progression:
+        sur_progression(ecrites + len(lignes))
+
+
+def _tableaux_resume(movements):
+    totaux = (
+        movements.order_by()
+        .values('produit__nom', 'produit__code_barre', 'type_mouvement')
+        .annotate(nombre=Count('pk'), total=Sum('quantite'))
+        .order_by('produit__nom', 'type_mouvement')
+    )
+    lignes = []
+    for ligne in totaux.iterator():
+        lignes.append([
+            ligne['produit__nom'],
+            ligne['produit__code_barre'],
+            TYPES_MOUVEMENT.get(ligne['type_mouvement'], ligne['type_mouvement']),
+            str(ligne['nombre']),
+            str(ligne['total']),
+        ])
+        if len(lignes) == LIGNES_PAR_TABLEAU:
+            yield _tableau(lignes, ENTETE_RESUME, LARGEURS_RESUME)
+            lignes = []
+    if lignes:
+        yield _tableau(lignes, ENTETE_RESUME, LARGEURS_RESUME)
+
+
+def _elements(movements, criteres, resume, taille_lot, sur_progression):
+    styles = getSampleStyleSheet()
+
+    # Titre du rapport
+    title_style = styles['h1']
+    title_style.alignment = 1 # Centre
+    yield Paragraph("Rapport des Mouvements de Stock", title_style)
+    yield Paragraph("<br/><br/>", styles['Normal']) # Espace
+
+    date_debut = criteres.get('date_debut')
+    date_fin = criteres.get('date_fin')
+    produit = criteres.get('produit')
+    type_mouvement = criteres.get('type_mouvement')
+    if date_debut:
+        yield Paragraph(f"De: {date_debut.strftime('%d/%m/%Y')}", styles['Normal'])
+    if date_fin:
+        yield Paragraph(f"À: {date_fin.strftime('%d/%m/%Y')}", styles['Normal'])
+    if produit:
+        yield Paragraph(f"Produit: {escape(produit.nom)}", styles['Normal'])
+    if type_mouvement:
+        yield Paragraph(f"Type de Mouvement: {escape(TYPES_MOUVEMENT.get(type_mouvement, type_mouvement))}", styles['Normal'])
+
+    if resume:
+        yield Paragraph("Résumé par produit et par type de mouvement. Utilisez l'export CSV pour le détail.", styles['Normal'])
+        yield Paragraph("<br/>", styles['Normal']) # Espace
+        yield from _tableaux_resume(movements)
+    else:
+        yield Paragraph("<br/>", styles['Normal']) # Espace
+        yield from _tableaux_detail(movements, taille_lot, sur_progression)
+
+
+def ecrire_pdf(fichier, movements, criteres, resume=None, taille_lot=LIGNES_PAR_TABLEAU * 25, sur_progression=None):
+    """
+    Écrit le rapport dans `fichier` (chemin ou fichier binaire) et renvoie le nombre de pages.
+    Si `resume` n'est pas imposé, il est activé quand la sélection dépasse LIGNES_MAX lignes
+    (compté avec une limite, sans COUNT(*) sur toute la période).
+    En mode détail, `sur_progression` reçoit le nombre de lignes mises en page après chaque tableau.
+    """
+    if resume is None:
+        resume = movements.order_by()[:LIGNES_MAX + 1].count() > LIGNES_MAX
+    return _mettre_en_page(fichier, _elements(movements, criteres, resume, taille_lot, sur_progression))
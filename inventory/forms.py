@@ -1,6 +1,38 @@
 from django import forms
-from .models import Produit, MouvementStock, Categorie, Fournisseur # Assurez-vous que tous les modèles sont importés ici
-from django.forms.models import ModelChoiceField
+from django.urls import reverse
+from .models import Produit, MouvementStock, Categorie, Fournisseur, CumulMouvements # Assurez-vous que tous les modèles sont importés ici
+
+
+class ProduitAutocompleteWidget(forms.Select):
+    """
+    Sélecteur de produit chargé à la demande : seul le produit sélectionné est rendu côté serveur,
+    les autres options sont récupérées par l'endpoint d'autocomplétion pendant la saisie.
+    """
+    template_name = 'inventory/widgets/produit_autocomplete.html'
+
+    def __init__(self, attrs=None, limite=20):
+        super().__init__(attrs)
+        self.limite = limite
+
+    def optgroups(self, name, value, attrs=None):
+        # Ne pas parcourir self.choices : cela chargerait tout le catalogue
+        champ = getattr(self.choices, 'field', None)
+        options = []
+        if champ is not None and champ.empty_label is not None:
+            options.append(self.create_option(name, '', champ.empty_label, not any(value), 0, attrs=attrs))
+        pks = [v for v in value if str(v).isdigit()]
+        if pks:
+            for index, produit in enumerate(Produit.objects.filter(pk__in=pks), start=len(options)):
+                libelle = champ.label_from_instance(produit) if champ is not None else str(produit)
+                options.append(self.create_option(name, produit.pk, libelle, True, index, attrs=attrs))
+        return [(None, options, 0)]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url_autocompletion'] = reverse('product_autocomplete')
+        context['widget']['limite'] = self.limite
+        return context
+
 
 class ProduitForm(forms.ModelForm):
     class Meta:
@@ -33,18 +65,11 @@ class MouvementStockForm(forms.ModelForm):
             'fournisseur': 'Fournisseur (pour les entrées)',
         }
         widgets = {
+            # Options chargées à la demande ; à la validation, seul le produit choisi est lu (par clé primaire)
+            'produit': ProduitAutocompleteWidget(),
             'raison_mouvement': forms.Textarea(attrs={'rows': 2, 'placeholder': 'Ex: Vente, Casse, Consommation interne'}),
         }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Manière propre et qui plaît à Pylance de définir le queryset pour un ModelChoiceField
-        # Nous nous assurons que le champ 'produit' est bien un ModelChoiceField avant de modifier son queryset
-        if 'produit' in self.fields and isinstance(self.fields['produit'], ModelChoiceField):
-            self.fields['produit'].queryset = Produit.objects.all().order_by('nom')
-        # Vous pourriez ajouter une condition pour les formulaires d'entrée/sortie si vous voulez filtrer
-        # ex: self.fields['produit'].queryset = Produit.objects.filter(is_active=True).order_by('nom')
-
 # AJOUT DE LA CLASSE CATEGORIEFORM ICI
 class CategorieForm(forms.ModelForm):
     class Meta:
@@ -88,11 +113,11 @@ class RapportMouvementsForm(forms.Form):
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
     )
     produit = forms.ModelChoiceField(
-        queryset=Produit.objects.all().order_by('nom'), # Liste de tous les produits
+        queryset=Produit.objects.all(), # Seul le produit choisi est chargé (voir ProduitAutocompleteWidget)
         label="Produit (Optionnel)",
         required=False,
         empty_label="-- Tous les produits --", # Option pour ne pas filtrer par produit
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=ProduitAutocompleteWidget(attrs={'class': 'form-control'})
     )
     type_mouvement = forms.ChoiceField(
         choices=[('', '-- Tous les types --')] + MouvementStock.TYPE_MOUVEMENT_CHOICES, # Ajouter une option "Tous"
@@ -109,4 +134,73 @@ class RapportMouvementsForm(forms.Form):
 
         if date_debut and date_fin and date_debut > date_fin:
             self.add_error('date_fin', "La date de fin ne peut pas être antérieure à la date de début.")
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+class StockADateForm(forms.Form):
+    """
+    Formulaire de choix de la date pour la consultation du stock à une date passée.
+    """
+    date = forms.DateField(
+        label="Stock à la clôture du",
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+
+
+class AnalyseMouvementsForm(forms.Form):
+    """
+    Critères des analyses d'entrées / sorties : dimension, période et intervalle de dates.
+    """
+    dimension = forms.ChoiceField(
+        choices=CumulMouvements.DIMENSION_CHOICES,
+        label="Analyser",
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    periode = forms.ChoiceField(
+        choices=CumulMouvements.PERIODE_CHOICES,
+        label="Par",
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    produit = forms.ModelChoiceField(
+        queryset=Produit.objects.all(),
+        label="Produit",
+        required=False,
+        widget=ProduitAutocompleteWidget(attrs={'class': 'form-control'})
+    )
+    categorie = forms.ModelChoiceField(
+        queryset=Categorie.objects.all().order_by('nom'),
+        label="Catégorie",
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    fournisseur = forms.ModelChoiceField(
+        queryset=Fournisseur.objects.all().order_by('nom'),
+        label="Fournisseur",
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    date_debut = forms.DateField(
+        label="Date de Début",
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    date_fin = forms.DateField(
+        label="Date de Fin",
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        dimension = cleaned_data.get('dimension')
+        if dimension in ('produit', 'categorie', 'fournisseur') and not cleaned_data.get(dimension):
+            self.add_error(dimension, "Ce champ est obligatoire pour cette analyse.")
+        date_debut = cleaned_data.get('date_debut')
+        date_fin = cleaned_data.get('date_fin')
+        if date_debut and date_fin and date_debut > date_fin:
+            self.add_error('date_fin', "La date de fin ne peut pas être antérieure à la date de début.")
+        return cleaned_data
+
+    def cle(self):
+        # Identifiant recherché dans les cumuls (0 pour tout le stock)
+        objet = self.cleaned_data.get(self.cleaned_data['dimension'])
+        return objet.pk if objet is not None else 0
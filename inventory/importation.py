@@ -0,0 +1,240 @@
+# inventory/importation.py
+"""
+Import en masse de mouvements de stock (synchronisation caisse, réceptions entrepôt).
+
+Les lignes sont validées par lots : chaque lot résout ses produits et fournisseurs en une requête,
+insère ses mouvements avec bulk_create et applique une seule mise à jour de quantité par produit,
+le tout dans une transaction. Un lot invalide arrête l'import sans rien laisser de partiel.
+Les bons de réception ou de sortie multi-lignes (enregistrer_document) suivent le même chemin,
+avec un contrôle de stock groupé et un seul UPDATE pour tous les produits du document.
+"""
+
+import codecs
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache_catalogue, cache_produits, tableau_de_bord
+from .models import AlerteStock, CumulMouvements, Produit, StatistiquesProduit, Fournisseur, MouvementStock, StockInsuffisant, StockJournalier
+
+TAILLE_LOT = 1000
+
+TYPES_MOUVEMENT = dict(MouvementStock.TYPE_MOUVEMENT_CHOICES)
+
+
+class ErreurImport(Exception):
+    """
+    Ligne (ou lot) invalide. `lignes_importees` indique combien de lignes ont été validées avant l'erreur.
+    """
+    def __init__(self, ligne, message):
+        self.ligne = ligne
+        self.message = message
+        self.lignes_importees = 0
+        super().__init__(f"Ligne {ligne} : {message}")
+
+
+def lire_csv(flux):
+    # La ligne 1 est l'entête
+    for numero, ligne in enumerate(csv.DictReader(flux), start=2):
+        yield numero, ligne
+
+
+def lire_jsonl(flux):
+    for numero, texte in enumerate(flux, start=1):
+        if not texte.strip():
+            continue
+        try:
+            ligne = json.loads(texte)
+        except ValueError:
+            raise ErreurImport(numero, "JSON invalide.")
+        if not isinstance(ligne, dict):
+            raise ErreurImport(numero, "Un objet JSON est attendu.")
+        yield numero, ligne
+
+
+LECTEURS = {
+    'csv': lire_csv,
+    'jsonl': lire_jsonl,
+}
+
+
+def detecter_encodage(binaire, taille_bloc=1 << 16):
+    """
+    Renvoie 'utf-8-sig' si le flux binaire est de l'UTF-8 valide, sinon 'cp1252' (CSV enregistré par Excel).
+    Le flux est lu par blocs puis rembobiné : il doit permettre seek().
+    """
+    decodeur = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for bloc in iter(lambda: binaire.read(taille_bloc), b''):
+            decodeur.decode(bloc)
+        decodeur.decode(b'', final=True)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1252'
+    finally:
+        binaire.seek(0)
+
+
+def detecter_format(nom_fichier, defaut='csv'):
+    extension = Path(nom_fichier or '').suffix.lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    return defaut
+
+
+def _par_lots(lignes, taille):
+    lignes = iter(lignes)
+    while True:
+        lot = list(islice(lignes, taille))
+        if not lot:
+            return
+        yield lot
+
+
+def _texte(ligne, champ):
+    valeur = ligne.get(champ)
+    return str(valeur).strip() if valeur not in (None, '') else ''
+
+
+def preparer_lot(lot, utilisateur=None):
+    """
+    Valide un lot de lignes (numero, dict) et renvoie les mouvements à insérer
+    ainsi que la variation nette de stock par produit.
+    """
+    codes = {_texte(ligne, 'code_barre') for _, ligne in lot}
+    noms_fournisseurs = {_texte(ligne, 'fournisseur') for _, ligne in lot} - {''}
+    produits = dict(Produit.objects.filter(code_barre__in=codes).values_list('code_barre', 'id'))
+    fournisseurs = dict(Fournisseur.objects.filter(nom__in=noms_fournisseurs).values_list('nom', 'id')) if noms_fournisseurs else {}
+
+    mouvements = []
+    variations = defaultdict(int)
+    for numero, ligne in lot:
+        code_barre = _texte(ligne, 'code_barre')
+        if code_barre not in produits:
+            raise ErreurImport(numero, f"Produit inconnu '{code_barre}'.")
+        type_mouvement = _texte(ligne, 'type_mouvement')
+        if type_mouvement not in TYPES_MOUVEMENT:
+            raise ErreurImport(numero, f"Type de mouvement invalide '{type_mouvement}'.")
+        try:
+            quantite = int(_texte(ligne, 'quantite'))
+        except ValueError:
+            raise ErreurImport(numero, "Quantité invalide.")
+        if quantite <= 0:
+            raise ErreurImport(numero, "La quantité doit être positive.")
+        nom_fournisseur = _texte(ligne, 'fournisseur')
+        if nom_fournisseur and nom_fournisseur not in fournisseurs:
+            raise ErreurImport(numero, f"Fournisseur inconnu '{nom_fournisseur}'.")
+
+        produit_id = produits[code_barre]
+        mouvements.append(MouvementStock(
+            produit_id=produit_id,
+            type_mouvement=type_mouvement,
+            quantite=quantite,
+            raison_mouvement=_texte(ligne, 'raison_mouvement') or None,
+            fournisseur_id=fournisseurs.get(nom_fournisseur),
+            utilisateur=utilisateur,
+        ))
+        variations[produit_id] += MouvementStock.variation(type_mouvement, quantite)
+    return mouvements, variations
+
+
+def _inserer_mouvements(mouvements, variations):
+    MouvementStock.objects.bulk_create(mouvements)
+    # Les mouvements insérés sont datés du jour (auto_now_add)
+    jour = timezone.localdate()
+    for produit_id, variation in variations.items():
+        StockJournalier.decaler(produit_id, jour, variation)
+    AlerteStock.synchroniser(*variations)
+    StatistiquesProduit.enregistrer(mouvements)
+    CumulMouvements.ajouter(mouvements)
+    # bulk_create et update() n'émettent pas de signaux
+    tableau_de_bord.invalider()
+    cache_produits.invalider(*variations)
+    cache_catalogue.invalider('produit', 'mouvement')
+
+
+def enregistrer_lot(mouvements, variations):
+    # Une mise à jour conditionnelle par produit et un seul INSERT groupé, dans la même transaction
+    with transaction.atomic():
+        for produit_id, variation in variations.items():
+            if variation:
+                Produit.ajuster_stock(produit_id, variation)
+        _inserer_mouvements(mouvements, variations)
+
+
+def importer_mouvements(lignes, utilisateur=None, taille_lot=TAILLE_LOT):
+    """
+    Importe un itérable de lignes (numero, dict) lot par lot et renvoie le nombre de lignes importées.
+    Lève ErreurImport au premier lot invalide ; les lots précédents restent enregistrés.
+    """
+    total = 0
+    try:
+        for lot in _par_lots(lignes, taille_lot):
+            mouvements, variations = preparer_lot(lot, utilisateur)
+            try:
+                enregistrer_lot(mouvements, variations)
+            except StockInsuffisant as e:
+                raise ErreurImport(lot[0][0], f"Stock insuffisant pour le produit {e.produit_id} dans le lot commençant à cette ligne.")
+            total += len(mouvements)
+    except ErreurImport as e:
+        e.lignes_importees = total
+        raise
+    return total
+
+
+def enregistrer_document(type_mouvement, lignes, utilisateur=None, fournisseur='', raison_mouvement=None):
+    """
+    Enregistre un bon de réception ou de sortie multi-lignes en une transaction et renvoie le nombre de mouvements.
+    `lignes` est une liste de dicts {'code_barre', 'quantite'[, 'raison_mouvement']} numérotés à partir de 1 ;
+    le type, le fournisseur et la raison valent pour tout le document.
+    Lève ErreurImport sans rien enregistrer si une ligne est invalide ou si le stock ne couvre pas toutes les sorties.
+    """
+    if not lignes:
+        raise ErreurImport(0, "Le document ne contient aucune ligne.")
+    lot = []
+    for numero, ligne in enumerate(lignes, start=1):
+        if not isinstance(ligne, dict):
+            raise ErreurImport(numero, "Un objet JSON est attendu.")
+        lot.append((numero, {
+            **ligne,
+            'type_mouvement': type_mouvement,
+            'fournisseur': fournisseur or '',
+            'raison_mouvement': ligne.get('raison_mouvement') or raison_mouvement,
+        }))
+    mouvements, variations = preparer_lot(lot, utilisateur)
+
+    premieres_lignes = {}
+    for (numero, _), mouvement in zip(lot, mouvements):
+        premieres_lignes.setdefault(mouvement.produit_id, numero)
+
+    with transaction.atomic():
+        # Verrouille les produits du document en une requête et contrôle toutes les sorties d'un coup
+        produits = Produit.objects.select_for_update().only('nom', 'quantite_actuelle').in_bulk(list(variations))
+        # Un produit supprimé depuis la validation du lot n'est plus verrouillable
+        supprimes = sorted(premieres_lignes[produit_id] for produit_id in variations if produit_id not in produits)
+        if supprimes:
+            raise ErreurImport(supprimes[0], "Produit supprimé pendant l'enregistrement du document.")
+        manquants = sorted(
+            (premieres_lignes[produit_id], produits[produit_id], variation)
+            for produit_id, variation in variations.items()
+            if produits[produit_id].quantite_actuelle + variation < 0
+        )
+        if manquants:
+            raise ErreurImport(manquants[0][0], "Stock insuffisant : " + " ; ".join(
+                f"ligne {numero} '{produit.nom}' (disponible {produit.quantite_actuelle}, demandé {-variation})"
+                for numero, produit, variation in manquants
+            ) + ".")
+        try:
+            Produit.ajuster_stocks(variations)
+        except StockInsuffisant as e:
+            # Stock modifié entre le contrôle et la mise à jour (pas de verrou de ligne sous SQLite)
+            raise ErreurImport(premieres_lignes[e.produit_id], "Stock insuffisant.")
+        _inserer_mouvements(mouvements, variations)
+    return len(mouvements)
@@ -0,0 +1,144 @@
+# inventory/instrumentation.py
+"""
+Mesure des requêtes SQL et de la durée de chaque vue (middleware activé par INSTRUMENTATION_REQUETES).
+
+Pendant la requête, un execute_wrapper posé sur chaque connexion compte les requêtes, cumule leur durée
+et regroupe les SQL identiques ; les empreintes (SQL normalisé : littéraux et listes IN remplacés)
+ne sont calculées qu'une fois par SQL distinct, à la fin. Les mesures sont :
+- renvoyées dans l'entête Server-Timing (visible dans les outils de développement du navigateur) ;
+- journalisées en une ligne JSON par requête sur le logger 'inventory.instrumentation', au niveau
+  INFO, ou WARNING quand la vue dépasse INSTRUMENTATION_BUDGET_REQUETES ou INSTRUMENTATION_BUDGET_DUREE_MS.
+Une requête SQL répétée au moins INSTRUMENTATION_DOUBLONS_MIN fois (typiquement un N+1) est signalée.
+Pour les réponses en flux (export CSV), la ligne de journal est écrite à la fin du flux ;
+l'entête, envoyé avant, ne couvre que la vue.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Littéraux remplacés dans les empreintes : chaînes, nombres, listes IN (...)
+_CHAINES = re.compile(r"'(?:[^']|'')*'")
+_NOMBRES = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTES_IN = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+
+# Longueur du SQL recopié dans le journal pour chaque doublon
+LONGUEUR_SQL_JOURNAL = 200
+
+
+def normaliser(sql):
+    sql = _CHAINES.sub('?', sql)
+    sql = _NOMBRES.sub('?', sql)
+    return _LISTES_IN.sub('IN (...)', sql)
+
+
+def empreinte(sql):
+    return hashlib.md5(normaliser(sql).encode()).hexdigest()[:12]
+
+
+class MesureRequetes:
+    """
+    execute_wrapper : compte et chronomètre les requêtes de toutes les connexions pendant une requête HTTP.
+    """
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.nombre = 0
+        self.duree_sql = 0.0
+        self.sql = Counter()
+        self.connexions = []
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree_sql += time.perf_counter() - debut
+            self.nombre += 1
+            self.sql[sql] += 1
+
+    def demarrer(self):
+        for connexion in connections.all():
+            connexion.execute_wrappers.append(self)
+            self.connexions.append(connexion)
+
+    def arreter(self):
+        for connexion in self.connexions:
+            connexion.execute_wrappers.remove(self)
+        self.connexions = []
+
+    def doublons(self, minimum):
+        # Regroupe les SQL par empreinte (calculée une fois par SQL distinct)
+        groupes = {}
+        for sql, nombre in self.sql.items():
+            cle = empreinte(sql)
+            groupe = groupes.setdefault(cle, {'empreinte': cle, 'nombre': 0, 'sql': sql[:LONGUEUR_SQL_JOURNAL]})
+            groupe['nombre'] += nombre
+        return sorted((groupe for groupe in groupes.values() if groupe['nombre'] >= minimum), key=lambda groupe: -groupe['nombre'])
+
+
+class InstrumentationRequetesMiddleware:
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_REQUETES', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budget_requetes = getattr(settings, 'INSTRUMENTATION_BUDGET_REQUETES', 30)
+        self.budget_duree_ms = getattr(settings, 'INSTRUMENTATION_BUDGET_DUREE_MS', 500)
+        self.doublons_min = getattr(settings, 'INSTRUMENTATION_DOUBLONS_MIN', 3)
+
+    def __call__(self, request):
+        mesure = MesureRequetes()
+        mesure.demarrer()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            mesure.arreter()
+            raise
+        response['Server-Timing'] = (
+            f'sql;dur={mesure.duree_sql * 1000:.1f};desc="{mesure.nombre} requetes", '
+            f'vue;dur={(time.perf_counter() - mesure.debut) * 1000:.1f}'
+        )
+        if response.streaming:
+            response.streaming_content = self._suivre_flux(response.streaming_content, mesure, request, response)
+        else:
+            mesure.arreter()
+            self.journaliser(mesure, request, response)
+        return response
+
+    def _suivre_flux(self, contenu, mesure, request, response):
+        # Les requêtes du flux sont comptées jusqu'au dernier morceau envoyé
+        try:
+            yield from contenu
+        finally:
+            mesure.arreter()
+            self.journaliser(mesure, request, response)
+
+    def journaliser(self, mesure, request, response):
+        duree_ms = (time.perf_counter() - mesure.debut) * 1000
+        depassements = []
+        if mesure.nombre > self.budget_requetes:
+            depassements.append('requetes')
+        if duree_ms > self.budget_duree_ms:
+            depassements.append('duree')
+        resolution = request.resolver_match
+        ligne = {
+            'vue': resolution.view_name if resolution else None,
+            'methode': request.method,
+            'chemin': request.path,
+            'statut': response.status_code,
+            'requetes': mesure.nombre,
+            'duree_sql_ms': round(mesure.duree_sql * 1000, 1),
+            'duree_ms': round(duree_ms, 1),
+            'doublons': mesure.doublons(self.doublons_min),
+            'depassements': depassements,
+        }
+        logger.log(logging.WARNING if depassements else logging.INFO, json.dumps(ligne, ensure_ascii=False))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory import cache_catalogue
+from inventory.models import StockJournalier
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les points de contrôle journaliers du stock à partir de l'historique des mouvements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=5000, help="Nombre de points de contrôle insérés par requête.")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        with transaction.atomic():
+            total = StockJournalier.reconstruire(taille_lot=options['taille_lot'])
+            cache_catalogue.invalider('produit')
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(f"{total} points de contrôle reconstruits en {duree:.2f} s."))
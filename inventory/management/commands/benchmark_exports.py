@@ -0,0 +1,86 @@
+import resource
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory import export_pdf, rapports
+from inventory.models import Produit, Fournisseur, MouvementStock
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit des exports de mouvements. Avec --generer, des mouvements fictifs sont insérés "
+        "pour la mesure puis annulés (transaction rollback) : la base n'est pas modifiée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--generer', type=int, default=0, help="Nombre de mouvements fictifs à insérer avant la mesure (ex: 1000000).")
+        parser.add_argument('--taille-lot', type=int, default=rapports.TAILLE_LOT_EXPORT, help="Taille des lots de lecture de l'export.")
+        parser.add_argument('--format', choices=['csv', 'pdf', 'tous'], default='tous', help="Export(s) à mesurer.")
+        parser.add_argument('--resume', action='store_true', help="Mesurer le PDF en mode résumé plutôt qu'en détail.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['generer']:
+                self._generer(options['generer'])
+            if options['format'] in ('csv', 'tous'):
+                self._mesurer_csv(options['taille_lot'])
+            if options['format'] in ('pdf', 'tous'):
+                self._mesurer_pdf(options['taille_lot'], options['resume'])
+            transaction.set_rollback(True)
+
+    def _generer(self, total):
+        debut = time.perf_counter()
+        utilisateur = User.objects.create(username='benchmark-export')
+        fournisseur = Fournisseur.objects.create(nom='Fournisseur benchmark export')
+        produits = Produit.objects.bulk_create(
+            Produit(nom=f"Produit benchmark {i}", code_barre=f"BENCH-EXPORT-{i}", prix_unitaire=1) for i in range(100)
+        )
+        # Insertion directe du grand livre : seule la lecture est mesurée ici
+        for depart in range(0, total, 10000):
+            MouvementStock.objects.bulk_create(
+                MouvementStock(
+                    produit=produits[i % len(produits)],
+                    type_mouvement='entree' if i % 2 else 'sortie',
+                    quantite=1 + i % 7,
+                    utilisateur=utilisateur,
+                    fournisseur=fournisseur if i % 2 else None,
+                    raison_mouvement='Vente' if i % 2 == 0 else None,
+                )
+                for i in range(depart, min(depart + 10000, total))
+            )
+        self.stdout.write(f"{total} mouvements générés en {time.perf_counter() - debut:.1f} s.")
+
+    def _mesurer_csv(self, taille_lot):
+        rss_avant = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        debut = time.perf_counter()
+        lignes = -1  # sans l'entête
+        octets = 0
+        for morceau in rapports.flux_csv(rapports.mouvements_filtres({}), taille_lot=taille_lot):
+            lignes += morceau.count('\n')
+            octets += len(morceau)
+        duree = time.perf_counter() - debut
+        rss_apres = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        debit = lignes / duree if duree else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"CSV : {lignes} lignes, {octets / 1e6:.1f} Mo en {duree:.2f} s ({debit:.0f} lignes/s), "
+            f"RSS max {rss_avant / 1024:.0f} Mo -> {rss_apres / 1024:.0f} Mo."
+        ))
+
+    def _mesurer_pdf(self, taille_lot, resume):
+        rss_avant = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        debut = time.perf_counter()
+        with tempfile.TemporaryFile() as fichier:
+            # Mode détail imposé (sauf --resume) pour mesurer la mise en page au-delà du plafond de lignes
+            pages = export_pdf.ecrire_pdf(fichier, rapports.mouvements_filtres({}), {}, resume=resume, taille_lot=taille_lot)
+            octets = fichier.tell()
+        duree = time.perf_counter() - debut
+        rss_apres = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        debit = pages / duree if duree else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"PDF : {pages} pages, {octets / 1e6:.1f} Mo en {duree:.2f} s ({debit:.1f} pages/s), "
+            f"RSS max {rss_avant / 1024:.0f} Mo -> {rss_apres / 1024:.0f} Mo."
+        ))
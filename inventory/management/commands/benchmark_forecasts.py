@@ -0,0 +1,79 @@
+import resource
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from inventory import previsions
+from inventory.models import CumulMouvements, Produit
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le moteur de prévision sur un historique synthétique (par défaut 100 000 produits sur 2 ans). "
+        "Avec --base, l'historique est aussi inséré en base pour mesurer le cycle complet, puis annulé (rollback)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', type=int, default=100000, help="Nombre de produits simulés.")
+        parser.add_argument('--jours', type=int, default=730, help="Nombre de jours d'historique.")
+        parser.add_argument('--densite', type=float, default=0.2, help="Part des jours avec au moins une sortie, par produit.")
+        parser.add_argument('--base', action='store_true', help="Mesurer aussi lecture et écriture en base (insertion puis rollback).")
+        parser.add_argument('--graine', type=int, default=0)
+
+    def handle(self, *args, **options):
+        nombre, nb_jours = options['produits'], options['jours']
+        generateur = np.random.default_rng(options['graine'])
+
+        # Historique creux : chaque couple (produit, jour) a une sortie avec la probabilité `densite`
+        debut = time.perf_counter()
+        taille = int(nombre * nb_jours * options['densite'])
+        positions = np.unique(generateur.integers(0, nombre * nb_jours, size=taille))
+        indices, jours = np.divmod(positions, nb_jours)
+        sorties = generateur.poisson(3, size=len(positions)).astype(np.float64) + 1
+        quantites = generateur.integers(0, 500, size=nombre).astype(np.float64)
+        self.stdout.write(f"{len(positions)} jours de sorties générés en {time.perf_counter() - debut:.1f} s.")
+
+        rss_avant = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        debut = time.perf_counter()
+        resultats = previsions.calculer(np.arange(1, nombre + 1), quantites, indices + 1, jours, sorties, nb_jours)
+        duree = time.perf_counter() - debut
+        rss_apres = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(self.style.SUCCESS(
+            f"Calcul : {nombre} produits x {nb_jours} jours en {duree * 1000:.0f} ms "
+            f"({len(positions) / duree / 1e6:.1f} M points/s), RSS max {rss_avant / 1024:.0f} Mo -> {rss_apres / 1024:.0f} Mo. "
+            f"Point de commande moyen : {resultats['point_commande'].mean():.1f}."
+        ))
+
+        if options['base']:
+            self._mesurer_en_base(nombre, nb_jours, indices, jours, sorties)
+
+    def _mesurer_en_base(self, nombre, nb_jours, indices, jours, sorties):
+        with transaction.atomic():
+            debut = time.perf_counter()
+            produits = Produit.objects.bulk_create(
+                (Produit(nom=f"Produit prévision {i}", code_barre=f"BENCH-PREV-{i}", prix_unitaire=1) for i in range(nombre)),
+                batch_size=5000,
+            )
+            ids = np.array([produit.pk for produit in produits], dtype=np.int64)
+            jour_fin = timezone.localdate()
+            origine = jour_fin.toordinal() - (nb_jours - 1)
+            for depart in range(0, len(indices), 50000):
+                tranche = slice(depart, depart + 50000)
+                CumulMouvements.objects.bulk_create(
+                    CumulMouvements(
+                        dimension='produit', cle=cle, periode='jour', date_debut=jour_fin.fromordinal(origine + jour),
+                        sorties=quantite, nombre=1,
+                    )
+                    for cle, jour, quantite in zip(ids[indices[tranche]].tolist(), jours[tranche].tolist(), sorties[tranche].astype(int).tolist())
+                )
+            self.stdout.write(f"Historique inséré en {time.perf_counter() - debut:.1f} s.")
+
+            total, durees = previsions.calculer_previsions(jour_fin=jour_fin, nb_jours=nb_jours)
+            self.stdout.write(self.style.SUCCESS(
+                f"Cycle complet : {total} produits, lecture {durees['lecture']:.2f} s, calcul {durees['calcul']:.2f} s, "
+                f"écriture {durees['ecriture']:.2f} s."
+            ))
+            transaction.set_rollback(True)
@@ -0,0 +1,66 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from inventory import cache_produits
+from inventory.models import Produit
+from inventory.views import product_barcode_lookup_view
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la latence (p50/p99) de la recherche par code-barres, cache froid puis cache chaud. "
+        "Les produits fictifs sont créés dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', type=int, default=10000, help="Nombre de produits fictifs.")
+        parser.add_argument('--requetes', type=int, default=5000, help="Nombre de recherches par mesure.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            codes = self._generer(options['produits'])
+            utilisateur = User.objects.create(username='benchmark-scanner')
+            factory = RequestFactory()
+            rng = random.Random(0)
+            tirages = [rng.choice(codes) for _ in range(options['requetes'])]
+
+            def mesurer(vider_avant):
+                durees = []
+                for code in tirages:
+                    if vider_avant:
+                        cache_produits.cache.vider()
+                    requete = factory.get(f'/api/products/barcode/{code}/')
+                    requete.user = utilisateur
+                    debut = time.perf_counter()
+                    product_barcode_lookup_view(requete, code)
+                    durees.append((time.perf_counter() - debut) * 1000)
+                return durees
+
+            cache_produits.cache.vider()
+            self._afficher('Cache froid', mesurer(vider_avant=True))
+            cache_produits.cache.vider()
+            for code in codes:
+                cache_produits.rechercher(code)
+            self._afficher('Cache chaud', mesurer(vider_avant=False))
+            self.stdout.write(f"Statistiques du cache : {cache_produits.cache.statistiques()}")
+            transaction.set_rollback(True)
+        cache_produits.cache.vider()
+
+    def _generer(self, total):
+        produits = Produit.objects.bulk_create(
+            Produit(nom=f"Produit benchmark {i}", code_barre=f"BENCH-SCAN-{i:08d}", prix_unitaire=1, quantite_actuelle=i % 50)
+            for i in range(total)
+        )
+        return [p.code_barre for p in produits]
+
+    def _afficher(self, libelle, durees):
+        centiles = statistics.quantiles(durees, n=100)
+        self.stdout.write(self.style.SUCCESS(
+            f"{libelle} : p50 {centiles[49]:.3f} ms, p99 {centiles[98]:.3f} ms, max {max(durees):.3f} ms ({len(durees)} recherches)."
+        ))
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from inventory.importation import ErreurImport, enregistrer_document
+from inventory.models import AlerteStock, MouvementStock, Produit, StockInsuffisant
+
+# Réglages comparés : ceux de SQLite / Django par défaut, puis ceux du projet (settings)
+MODES = {
+    'defaut': ({'journal_mode': 'DELETE', 'synchronous': 'FULL'}, {}),
+    'optimise': (None, None),
+}
+
+
+def _configurer(chemin, mode):
+    pragmas, options = MODES[mode]
+    settings_dict = connections['default'].settings_dict
+    settings_dict['NAME'] = chemin
+    if pragmas is not None:
+        settings.SQLITE_PRAGMAS = pragmas
+        settings_dict['OPTIONS'] = options
+
+
+def _travailleur(chemin, mode, role, duree, produits, graine):
+    # Processus enfant (fork) : nouvelle connexion avec les réglages du mode mesuré
+    connections.close_all()
+    _configurer(chemin, mode)
+    hasard = random.Random(graine)
+    operations = verrous = 0
+    fin = time.perf_counter() + duree
+    while time.perf_counter() < fin:
+        produit_id, code_barre = hasard.choice(produits)
+        type_mouvement = 'entree' if hasard.random() < 0.6 else 'sortie'
+        try:
+            if role == 'ecriture' and hasard.random() < 0.5:
+                # Mouvement unitaire (douchette) : la transaction commence par une écriture
+                try:
+                    MouvementStock(produit_id=produit_id, type_mouvement=type_mouvement, quantite=1).save()
+                except StockInsuffisant:
+                    pass
+            elif role == 'ecriture':
+                # Bon multi-lignes : la transaction lit les produits avant d'écrire
+                lignes = [{'code_barre': code, 'quantite': 1} for _, code in hasard.sample(produits, min(3, len(produits)))]
+                try:
+                    enregistrer_document(type_mouvement, lignes)
+                except ErreurImport:
+                    pass
+            else:
+                Produit.objects.filter(pk=produit_id).values('quantite_actuelle').first()
+                AlerteStock.ouvertes().count()
+            operations += 1
+        except OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            verrous += 1
+    connections.close_all()
+    return role, operations, verrous
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit d'écritures et de lectures concurrentes (plusieurs processus) et les erreurs "
+        "« database is locked » avec les réglages SQLite par défaut puis ceux du projet. "
+        "La mesure porte sur une copie temporaire de la base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecrivains', type=int, default=4, help="Nombre de processus qui enregistrent des mouvements.")
+        parser.add_argument('--lecteurs', type=int, default=4, help="Nombre de processus qui lisent des produits.")
+        parser.add_argument('--duree', type=float, default=5.0, help="Durée (secondes) de chaque mesure.")
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES), help="Réglages à mesurer.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Cette mesure ne concerne que SQLite.")
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError("La mesure nécessite le démarrage de processus par fork.")
+        contexte = multiprocessing.get_context('fork')
+
+        with tempfile.TemporaryDirectory() as dossier:
+            for mode in options['modes']:
+                chemin = os.path.join(dossier, f'{mode}.sqlite3')
+                # Copie cohérente de la base (API de sauvegarde SQLite), la base réelle n'est pas modifiée
+                source = sqlite3.connect(str(connection.settings_dict['NAME']))
+                cible = sqlite3.connect(chemin)
+                source.backup(cible)
+                source.close()
+                cible.close()
+
+                connections.close_all()
+                nom_origine, options_origine = connection.settings_dict['NAME'], connection.settings_dict.get('OPTIONS', {})
+                pragmas_origine = getattr(settings, 'SQLITE_PRAGMAS', {})
+                try:
+                    _configurer(chemin, mode)
+                    call_command('migrate', verbosity=0)
+                    if Produit.objects.count() < 50:
+                        Produit.objects.bulk_create(
+                            Produit(nom=f"Produit benchmark {i}", code_barre=f"BENCH-SQLITE-{i}", prix_unitaire=1) for i in range(50)
+                        )
+                    produits = list(Produit.objects.values_list('pk', 'code_barre')[:200])
+                    connections.close_all()
+
+                    taches = (
+                        [(chemin, mode, 'ecriture', options['duree'], produits, i) for i in range(options['ecrivains'])]
+                        + [(chemin, mode, 'lecture', options['duree'], produits, 1000 + i) for i in range(options['lecteurs'])]
+                    )
+                    with contexte.Pool(len(taches)) as pool:
+                        resultats = pool.starmap(_travailleur, taches)
+                finally:
+                    connections.close_all()
+                    connection.settings_dict['NAME'] = nom_origine
+                    connection.settings_dict['OPTIONS'] = options_origine
+                    settings.SQLITE_PRAGMAS = pragmas_origine
+
+                for role in ('ecriture', 'lecture'):
+                    operations = sum(r[1] for r in resultats if r[0] == role)
+                    verrous = sum(r[2] for r in resultats if r[0] == role)
+                    self.stdout.write(
+                        f"{mode:9} {role:9} : {operations / options['duree']:8.0f} op/s, {verrous} erreur(s) de verrou"
+                    )
+        self.stdout.write(self.style.SUCCESS("Mesure terminée."))
@@ -0,0 +1,192 @@
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory import urls
+from inventory.instrumentation import MesureRequetes
+from inventory.models import Categorie, Fournisseur, Produit, TacheExport
+
+SEUIL_REGRESSION = getattr(settings, 'BENCHMARK_SEUIL_REGRESSION', 0.25)
+
+# En dessous de ces écarts, une hausse relative est du bruit de mesure
+ECART_MIN_MS = 5
+ECART_MIN_KIO = 256
+
+# Objet désigné par <pk>, selon le préfixe du nom de l'URL
+MODELES_PAR_PREFIXE = {
+    'product_': Produit,
+    'categorie_': Categorie,
+    'fournisseur_': Fournisseur,
+    'export_job_': TacheExport,
+}
+
+
+def _parametres_de_requete():
+    # Filtres des pages qui ne font un travail représentatif qu'avec des critères
+    aujourd_hui = timezone.localdate()
+    hier = (aujourd_hui - timedelta(days=1)).isoformat()
+    return {
+        'product_autocomplete': {'q': 'Ca'},
+        'report_generation': {'date_debut': (aujourd_hui - timedelta(days=7)).isoformat()},
+        'stock_at_date': {'date': aujourd_hui.isoformat()},
+        'export_movements_csv': {'date_debut': hier},
+        'export_movements_pdf': {'date_debut': hier},
+    }
+
+
+def _arguments(nom, convertisseurs):
+    arguments = {}
+    for argument in convertisseurs:
+        if argument == 'code_barre':
+            produit = Produit.objects.order_by('pk').first()
+            if produit is None:
+                return None
+            arguments[argument] = produit.code_barre
+        elif argument == 'pk':
+            modele = next((modele for prefixe, modele in MODELES_PAR_PREFIXE.items() if nom.startswith(prefixe)), None)
+            objet = modele.objects.order_by('pk').first() if modele else None
+            if objet is None:
+                return None
+            arguments[argument] = objet.pk
+        else:
+            return None
+    return arguments
+
+
+def _lire(response):
+    # Les réponses en flux (exports) ne sont produites qu'à la lecture ; le client de test les ferme à la fin
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque URL de inventory/urls.py avec le client de test (GET, superutilisateur) : latences "
+        "p50/p95/p99, nombre de requêtes SQL et pic mémoire. Écrit les mesures en JSON (--sortie) et échoue "
+        "si elles régressent par rapport à une référence (--comparer). Rien n'est enregistré en base (rollback)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repetitions', type=int, default=20, help="Requêtes mesurées par URL (au moins 2).")
+        parser.add_argument('--echauffement', type=int, default=2, help="Requêtes non mesurées avant la mesure (caches).")
+        parser.add_argument('--vues', nargs='+', help="Noms des URL à mesurer (toutes par défaut).")
+        parser.add_argument('--sortie', help="Fichier JSON où écrire les mesures (nouvelle référence).")
+        parser.add_argument('--comparer', help="Fichier JSON de référence auquel comparer les mesures.")
+        parser.add_argument('--seuil', type=float, default=SEUIL_REGRESSION, help="Hausse relative tolérée de p95 et du pic mémoire (0.25 = +25 %%).")
+
+    def handle(self, *args, **options):
+        if options['repetitions'] < 2:
+            raise CommandError("--repetitions doit valoir au moins 2.")
+        reference = None
+        if options['comparer']:
+            with open(options['comparer'], encoding='utf-8') as fichier:
+                reference = json.load(fichier)
+
+        # Réglages de production : pas de journal des requêtes SQL (DEBUG) qui fausserait temps et mémoire
+        with transaction.atomic(), override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            utilisateur = User.objects.create_superuser('benchmark-urls', password='benchmark-urls')
+            client = Client(raise_request_exception=False)
+            client.force_login(utilisateur)
+            mesures = self._mesurer(client, options)
+            transaction.set_rollback(True)
+
+        resultat = {
+            'date': timezone.now().isoformat(),
+            'repetitions': options['repetitions'],
+            'vues': mesures,
+        }
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                json.dump(resultat, fichier, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Mesures écrites dans {options['sortie']}.")
+        if reference is not None:
+            regressions = self._comparer(reference['vues'], mesures, options['seuil'])
+            if regressions:
+                raise CommandError(f"{len(regressions)} régression(s) :\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS(f"Aucune régression par rapport à {options['comparer']}."))
+
+    def _mesurer(self, client, options):
+        parametres = _parametres_de_requete()
+        mesures = {}
+        for motif in urls.urlpatterns:
+            nom = motif.name
+            if options['vues'] and nom not in options['vues']:
+                continue
+            arguments = _arguments(nom, motif.pattern.converters)
+            if arguments is None:
+                self.stdout.write(f"{nom:32} ignorée (aucun objet pour les paramètres de l'URL)")
+                continue
+            url = reverse(nom, kwargs=arguments)
+            donnees = parametres.get(nom, {})
+
+            for _ in range(options['echauffement']):
+                _lire(client.get(url, donnees))
+            durees = []
+            for _ in range(options['repetitions']):
+                mesure = MesureRequetes()
+                mesure.demarrer()
+                try:
+                    debut = time.perf_counter()
+                    response = client.get(url, donnees)
+                    _lire(response)
+                    durees.append((time.perf_counter() - debut) * 1000)
+                finally:
+                    mesure.arreter()
+            if response.status_code >= 400:
+                # Vue en POST seulement (405), en erreur (500)... : seul le statut est conservé
+                mesures[nom] = {'url': url, 'statut': response.status_code}
+                self.stdout.write(f"{nom:32} statut {response.status_code}, non mesurée")
+                continue
+
+            # Pic mémoire mesuré à part : tracemalloc ralentit l'exécution
+            tracemalloc.start()
+            try:
+                _lire(client.get(url, donnees))
+                pic = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+            centiles = statistics.quantiles(durees, n=100, method='inclusive')
+            mesures[nom] = {
+                'url': url,
+                'statut': response.status_code,
+                'p50_ms': round(centiles[49], 2),
+                'p95_ms': round(centiles[94], 2),
+                'p99_ms': round(centiles[98], 2),
+                'requetes': mesure.nombre,
+                'memoire_pic_kio': round(pic / 1024),
+            }
+            self.stdout.write(
+                f"{nom:32} p50 {centiles[49]:8.1f} ms  p95 {centiles[94]:8.1f} ms  p99 {centiles[98]:8.1f} ms  "
+                f"{mesure.nombre:4d} requêtes  {pic / 1024:8.0f} Kio"
+            )
+        return mesures
+
+    def _comparer(self, reference, mesures, seuil):
+        regressions = []
+        for nom, mesure in mesures.items():
+            base = reference.get(nom)
+            if base is None:
+                continue
+            if mesure['statut'] != base['statut']:
+                regressions.append(f"{nom} : statut {mesure['statut']} (référence {base['statut']})")
+            if 'requetes' not in mesure or 'requetes' not in base:
+                continue
+            if mesure['requetes'] > base['requetes']:
+                regressions.append(f"{nom} : {mesure['requetes']} requêtes SQL (référence {base['requetes']})")
+            if mesure['p95_ms'] > base['p95_ms'] * (1 + seuil) and mesure['p95_ms'] - base['p95_ms'] > ECART_MIN_MS:
+                regressions.append(f"{nom} : p95 {mesure['p95_ms']} ms (référence {base['p95_ms']} ms)")
+            if mesure['memoire_pic_kio'] > base['memoire_pic_kio'] * (1 + seuil) and mesure['memoire_pic_kio'] - base['memoire_pic_kio'] > ECART_MIN_KIO:
+                regressions.append(f"{nom} : pic mémoire {mesure['memoire_pic_kio']} Kio (référence {base['memoire_pic_kio']} Kio)")
+        return regressions
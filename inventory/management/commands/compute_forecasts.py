@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory import previsions
+
+
+class Command(BaseCommand):
+    help = "Recalcule la prévision de demande et le point de commande suggéré de tous les produits."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=previsions.HISTORIQUE_JOURS, help="Nombre de jours d'historique des sorties utilisés.")
+
+    def handle(self, *args, **options):
+        total, durees = previsions.calculer_previsions(nb_jours=options['jours'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} prévisions calculées (lecture {durees['lecture']:.2f} s, calcul {durees['calcul']:.2f} s, "
+            f"écriture {durees['ecriture']:.2f} s)."
+        ))
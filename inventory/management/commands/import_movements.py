@@ -0,0 +1,42 @@
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importation import LECTEURS, TAILLE_LOT, ErreurImport, detecter_format, importer_mouvements
+
+
+class Command(BaseCommand):
+    help = "Importe des mouvements de stock en masse depuis un fichier CSV ou JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Chemin du fichier à importer ('-' pour l'entrée standard).")
+        parser.add_argument('--format', choices=sorted(LECTEURS), help="Format du fichier (déduit de l'extension par défaut).")
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT, help="Nombre de lignes validées et enregistrées par transaction.")
+        parser.add_argument('--utilisateur', help="Nom de l'utilisateur auquel attribuer les mouvements.")
+
+    def handle(self, *args, **options):
+        utilisateur = None
+        if options['utilisateur']:
+            try:
+                utilisateur = User.objects.get(username=options['utilisateur'])
+            except User.DoesNotExist:
+                raise CommandError(f"Utilisateur '{options['utilisateur']}' introuvable.")
+
+        chemin = options['fichier']
+        lecteur = LECTEURS[options['format'] or detecter_format(chemin)]
+        flux = sys.stdin if chemin == '-' else open(chemin, newline='', encoding='utf-8')
+
+        debut = time.perf_counter()
+        try:
+            total = importer_mouvements(lecteur(flux), utilisateur=utilisateur, taille_lot=options['taille_lot'])
+        except ErreurImport as e:
+            raise CommandError(f"{e} Import arrêté après {e.lignes_importees} lignes enregistrées.")
+        finally:
+            if flux is not sys.stdin:
+                flux.close()
+        duree = time.perf_counter() - debut
+
+        debit = total / duree if duree else 0
+        self.stdout.write(self.style.SUCCESS(f"{total} mouvements importés en {duree:.2f} s ({debit:.0f} lignes/s)."))
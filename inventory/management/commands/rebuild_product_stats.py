@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventory import cache_catalogue
+from inventory.models import Produit, StatistiquesProduit
+
+CHAMPS = ['total_entrees', 'total_sorties', 'date_dernier_mouvement', 'dernier_fournisseur_id']
+
+
+class Command(BaseCommand):
+    help = "Reconstruit (ou vérifie avec --verifier) les agrégats de mouvements stockés pour chaque produit."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verifier', action='store_true', help="Compare les agrégats stockés au grand livre sans rien modifier.")
+        parser.add_argument('--taille-lot', type=int, default=1000, help="Nombre de lignes créées par requête.")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        if options['verifier']:
+            self._verifier()
+        else:
+            with transaction.atomic():
+                manquants = Produit.objects.filter(statistiques__isnull=True).values_list('pk', flat=True)
+                StatistiquesProduit.objects.bulk_create(
+                    [StatistiquesProduit(produit_id=pk) for pk in manquants.iterator()],
+                    batch_size=options['taille_lot'],
+                )
+                total = StatistiquesProduit.recalculer()
+                # Totaux affichés dans la liste des produits
+                cache_catalogue.invalider('produit')
+            duree = time.perf_counter() - debut
+            self.stdout.write(self.style.SUCCESS(f"{total} produits recalculés en {duree:.2f} s."))
+
+    def _verifier(self):
+        calculees = {f'calcule_{champ}': expression for champ, expression in StatistiquesProduit.valeurs_calculees().items()}
+        lignes = StatistiquesProduit.objects.annotate(**calculees).values('produit_id', *CHAMPS, *calculees)
+        ecarts = []
+        for ligne in lignes.iterator():
+            differences = [champ for champ in CHAMPS if ligne[champ] != ligne[f'calcule_{champ}']]
+            if differences:
+                ecarts.append((ligne['produit_id'], differences))
+        sans_ligne = Produit.objects.filter(statistiques__isnull=True).count()
+
+        for produit_id, differences in ecarts[:20]:
+            self.stdout.write(f"Produit {produit_id} : {', '.join(differences)}")
+        if ecarts or sans_ligne:
+            raise CommandError(f"{len(ecarts)} produit(s) incohérent(s), {sans_ligne} sans agrégats : lancez rebuild_product_stats.")
+        self.stdout.write(self.style.SUCCESS("Agrégats cohérents avec le grand livre."))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncWeek
+
+from inventory.models import CumulMouvements, MouvementStock
+
+# Champ regroupé pour chaque dimension (aucun pour le total du stock)
+SOURCES = {
+    'tout': None,
+    'produit': 'produit_id',
+    'categorie': 'produit__categorie_id',
+    'fournisseur': 'fournisseur_id',
+}
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les cumuls journaliers et hebdomadaires des mouvements (analyses) à partir du grand livre."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=5000, help="Nombre de cumuls insérés par requête.")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        troncatures = {
+            'jour': TruncDate('date_mouvement'),
+            'semaine': TruncWeek('date_mouvement', output_field=DateField()),
+        }
+        total = 0
+        with transaction.atomic():
+            CumulMouvements.objects.all().delete()
+            for periode, troncature in troncatures.items():
+                for dimension, champ in SOURCES.items():
+                    # Un agrégat groupé par la base pour chaque couple période / dimension
+                    mouvements = MouvementStock.objects.annotate(date_debut=troncature)
+                    if dimension == 'fournisseur':
+                        mouvements = mouvements.filter(fournisseur__isnull=False)
+                    lignes = (
+                        mouvements.values('date_debut', *([champ] if champ else []))
+                        .annotate(
+                            entrees=Coalesce(Sum('quantite', filter=Q(type_mouvement='entree')), 0),
+                            sorties=Coalesce(Sum('quantite', filter=Q(type_mouvement='sortie')), 0),
+                            nombre=Count('pk'),
+                        )
+                        .order_by()
+                    )
+                    lot = []
+                    for ligne in lignes.iterator():
+                        lot.append(CumulMouvements(
+                            dimension=dimension,
+                            cle=(ligne[champ] or 0) if champ else 0,
+                            periode=periode,
+                            date_debut=ligne['date_debut'],
+                            entrees=ligne['entrees'],
+                            sorties=ligne['sorties'],
+                            nombre=ligne['nombre'],
+                        ))
+                        if len(lot) >= options['taille_lot']:
+                            CumulMouvements.objects.bulk_create(lot)
+                            total += len(lot)
+                            lot = []
+                    CumulMouvements.objects.bulk_create(lot)
+                    total += len(lot)
+
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(f"{total} cumuls reconstruits en {duree:.2f} s."))
@@ -0,0 +1,100 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from inventory import cache_catalogue, cache_produits, tableau_de_bord
+from inventory.models import AlerteStock, MouvementStock, Produit, StatistiquesProduit, StockJournalier
+
+# Effet signé d'un mouvement, comme MouvementStock.variation() mais calculé par la base
+VARIATION = Case(
+    When(type_mouvement='entree', then=F('quantite')),
+    When(type_mouvement='sortie', then=-F('quantite')),
+    default=Value(0),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la quantité de chaque produit au solde de ses mouvements et, avec --reparer, corrige les écarts "
+        "puis reconstruit les points de contrôle journaliers des produits corrigés et les cumuls des mouvements."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=10000, help="Nombre d'identifiants de produits traités par tranche.")
+        parser.add_argument('--reparer', action='store_true', help="Recale les produits en écart sur le solde du grand livre.")
+        parser.add_argument('--lot-reparation', type=int, default=500, help="Nombre de produits corrigés par transaction.")
+        parser.add_argument('--limite-rapport', type=int, default=50, help="Nombre maximal d'écarts détaillés dans le rapport.")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        taille = max(1, options['taille_lot'])
+        ecarts = []
+        verifies = 0
+
+        # Tranches d'identifiants : chaque tranche coûte un agrégat groupé sur l'index (produit, date)
+        dernier = Produit.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for borne in range(0, dernier + 1, taille):
+            debut_tranche = time.perf_counter()
+            quantites = dict(Produit.objects.filter(pk__gte=borne, pk__lt=borne + taille).values_list('pk', 'quantite_actuelle'))
+            if not quantites:
+                continue
+            soldes = dict(
+                MouvementStock.objects.filter(produit_id__gte=borne, produit_id__lt=borne + taille)
+                .order_by().values('produit_id').annotate(solde=Sum(VARIATION)).values_list('produit_id', 'solde')
+            )
+            for produit_id, quantite in quantites.items():
+                solde = soldes.get(produit_id, 0)
+                if quantite != solde:
+                    ecarts.append((produit_id, quantite, solde))
+            verifies += len(quantites)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"Tranche {borne}-{borne + taille - 1} : {len(quantites)} produits en {time.perf_counter() - debut_tranche:.3f} s")
+        duree_controle = time.perf_counter() - debut
+
+        for produit_id, quantite, solde in ecarts[:options['limite_rapport']]:
+            self.stdout.write(f"Produit {produit_id} : quantité {quantite}, grand livre {solde} (écart {quantite - solde:+d})")
+        if len(ecarts) > options['limite_rapport']:
+            self.stdout.write(f"... et {len(ecarts) - options['limite_rapport']} autre(s).")
+        message = f"{verifies} produits vérifiés, {len(ecarts)} en écart ({duree_controle:.2f} s)."
+        self.stdout.write(self.style.SUCCESS(message) if not ecarts else self.style.WARNING(message))
+
+        if options['reparer'] and ecarts:
+            self._reparer([produit_id for produit_id, _, solde in ecarts if solde >= 0], max(1, options['lot_reparation']))
+            negatifs = [produit_id for produit_id, _, solde in ecarts if solde < 0]
+            if negatifs:
+                self.stdout.write(self.style.ERROR(
+                    f"{len(negatifs)} produit(s) non corrigé(s) : solde du grand livre négatif ({', '.join(map(str, negatifs[:20]))})."
+                ))
+
+    def _reparer(self, produit_ids, taille_lot):
+        debut = time.perf_counter()
+        # Le solde est recalculé dans l'UPDATE lui-même : un mouvement enregistré depuis le contrôle est pris en compte
+        solde = Coalesce(
+            Subquery(
+                MouvementStock.objects.filter(produit=OuterRef('pk')).order_by()
+                .values('produit').annotate(solde=Sum(VARIATION)).values('solde')
+            ),
+            0,
+        )
+        corriges = 0
+        for i in range(0, len(produit_ids), taille_lot):
+            lot = produit_ids[i:i + taille_lot]
+            with transaction.atomic():
+                corriges += Produit.objects.filter(pk__in=lot).update(quantite_actuelle=solde)
+                AlerteStock.synchroniser(*lot)
+                StatistiquesProduit.recalculer(*lot)
+                # Les points de contrôle sont déduits de la quantité actuelle : ils sont faux tant qu'elle l'était
+                StockJournalier.reconstruire(lot)
+                # update() n'émet pas de signaux
+                tableau_de_bord.invalider()
+                cache_produits.invalider(*lot)
+                cache_catalogue.invalider('produit')
+        message = f"{corriges} produit(s) corrigé(s) en {time.perf_counter() - debut:.2f} s."
+        self.stdout.write(self.style.SUCCESS(message))
+        # Un écart vient d'un grand livre modifié sans passer par les signaux (suppression ou mise à jour en masse) :
+        # les cumuls par catégorie, fournisseur et du stock entier, partagés entre produits, sont reconstruits en entier
+        call_command('rebuild_rollups', stdout=self.stdout)
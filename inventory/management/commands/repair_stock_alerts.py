@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory import cache_catalogue, tableau_de_bord
+from inventory.models import AlerteStock
+
+
+class Command(BaseCommand):
+    help = "Remet la table des alertes de stock en accord avec les quantités et seuils actuels des produits."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reinitialiser', action='store_true', help="Supprime aussi l'historique des alertes fermées avant la reconstruction.")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        with transaction.atomic():
+            if options['reinitialiser']:
+                AlerteStock.objects.all().delete()
+            fermees, ouvertes = AlerteStock.synchroniser()
+            tableau_de_bord.invalider()
+            cache_catalogue.invalider('produit')
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{fermees} alerte(s) fermée(s), {ouvertes} alerte(s) ouverte(s), "
+            f"{AlerteStock.ouvertes().count()} en cours ({duree:.2f} s)."
+        ))
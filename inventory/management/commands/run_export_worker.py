@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from inventory.models import TacheExport
+from inventory.taches import executer_tache, initialiser_processus, purger
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches d'export en attente dans un pool de processus locaux."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processus', type=int, default=2, help="Nombre de processus d'export en parallèle.")
+        parser.add_argument('--intervalle', type=float, default=2.0, help="Délai (secondes) entre deux recherches de tâches.")
+        parser.add_argument('--une-fois', action='store_true', help="Traiter les tâches en attente puis s'arrêter.")
+        parser.add_argument(
+            '--delai-abandon', type=float, default=300.0,
+            help="Secondes sans signe de vie au-delà desquelles la tâche en cours d'un autre worker est relancée.",
+        )
+
+    def handle(self, *args, **options):
+        nombre = max(1, options['processus'])
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.delai_abandon = timedelta(seconds=options['delai_abandon'])
+
+        # fork : les processus héritent de la configuration Django déjà chargée
+        self.contexte = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        self._maintenance()
+        derniere_maintenance = time.monotonic()
+        connections.close_all()
+        en_cours = {}
+        pool = self._pool(nombre)
+        try:
+            while True:
+                if time.monotonic() - derniere_maintenance >= self.delai_abandon.total_seconds():
+                    self._maintenance()
+                    derniere_maintenance = time.monotonic()
+                for pk in TacheExport.reclamer(nombre - len(en_cours), worker=self.worker):
+                    en_cours[pool.submit(executer_tache, pk)] = pk
+                    self.stdout.write(f"Tâche {pk} démarrée.")
+                if en_cours:
+                    TacheExport.pulser(self.worker)
+                connections.close_all()
+
+                if not en_cours:
+                    if options['une_fois']:
+                        break
+                    time.sleep(options['intervalle'])
+                    continue
+
+                terminees, _ = wait(en_cours, timeout=options['intervalle'], return_when=FIRST_COMPLETED)
+                pool_casse = False
+                for future in terminees:
+                    pk = en_cours.pop(future)
+                    try:
+                        future.result()
+                    except BrokenProcessPool:
+                        # Un processus du pool s'est arrêté brutalement : toutes ses tâches en cours sont perdues
+                        pool_casse = True
+                        TacheExport.objects.filter(pk=pk, statut='en_cours').update(
+                            statut='echec', erreur="Processus d'export interrompu.", date_fin=timezone.now(),
+                        )
+                        self.stderr.write(f"Tâche {pk} interrompue : processus d'export arrêté.")
+                    else:
+                        self.stdout.write(f"Tâche {pk} terminée.")
+                if pool_casse:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._pool(nombre)
+                connections.close_all()
+        finally:
+            pool.shutdown()
+
+    def _pool(self, nombre):
+        return ProcessPoolExecutor(max_workers=nombre, mp_context=self.contexte, initializer=initialiser_processus)
+
+    def _maintenance(self):
+        # Tâches des workers sans signe de vie (arrêtés en cours d'export) et exports périmés
+        relancees = TacheExport.relancer_abandonnees(self.delai_abandon)
+        if relancees:
+            self.stdout.write(f"{relancees} tâche(s) abandonnée(s) remise(s) en attente.")
+        purgees = purger()
+        if purgees:
+            self.stdout.write(f"{purgees} export(s) périmé(s) supprimé(s).")
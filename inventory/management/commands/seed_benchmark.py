@@ -0,0 +1,139 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventory import cache_catalogue, tableau_de_bord
+from inventory.models import Categorie, Fournisseur, MouvementStock, Produit
+
+PREFIXE = 'SEED-'
+
+FAMILLES = ['Cahier', 'Stylo', 'Câble', 'Chargeur', 'Savon', 'Café', 'Riz', 'Huile', 'Lampe', 'Classeur', 'Gobelet', 'Piles']
+VARIANTES = ['standard', 'premium', 'éco', 'lot de 3', 'grand format', 'rouge', 'bleu', 'noir', '500 g', '1 L']
+RAISONS_SORTIE = ['Vente'] * 8 + ['Casse', 'Retour fournisseur']
+
+
+class Command(BaseCommand):
+    help = (
+        "Remplit la base avec un jeu de données de benchmark (par défaut 100 000 produits, 1 000 fournisseurs, "
+        "5 000 000 de mouvements sur un an) par insertions groupées, puis reconstruit les tables dérivées. "
+        "Les données sont réellement enregistrées : à lancer sur une base dédiée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', type=int, default=100000)
+        parser.add_argument('--fournisseurs', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=200)
+        parser.add_argument('--mouvements', type=int, default=5000000)
+        parser.add_argument('--jours', type=int, default=365, help="Période couverte par les mouvements, jusqu'à maintenant.")
+        parser.add_argument('--taille-lot', type=int, default=10000, help="Nombre de lignes insérées par requête.")
+        parser.add_argument('--graine', type=int, default=0)
+        parser.add_argument('--sans-derives', action='store_true', help="Ne pas reconstruire points de contrôle, statistiques, alertes et cumuls.")
+
+    def handle(self, *args, **options):
+        if Produit.objects.filter(code_barre__startswith=PREFIXE).exists():
+            raise CommandError(f"La base contient déjà des produits '{PREFIXE}...' d'un précédent remplissage.")
+        hasard = random.Random(options['graine'])
+        taille_lot = options['taille_lot']
+
+        with transaction.atomic():
+            debut = time.perf_counter()
+            utilisateur, _ = User.objects.get_or_create(username='seed-benchmark')
+            categories = Categorie.objects.bulk_create(
+                (Categorie(nom=f"Catégorie seed {i}") for i in range(options['categories'])), batch_size=taille_lot,
+            )
+            fournisseurs = Fournisseur.objects.bulk_create(
+                (Fournisseur(nom=f"Fournisseur seed {i}", contact=f"contact{i}@exemple.test") for i in range(options['fournisseurs'])),
+                batch_size=taille_lot,
+            )
+            produits = Produit.objects.bulk_create(
+                (
+                    Produit(
+                        nom=f"{hasard.choice(FAMILLES)} {hasard.choice(VARIANTES)} {i}",
+                        code_barre=f"{PREFIXE}{i:07d}",
+                        prix_unitaire=Decimal(hasard.randint(50, 50000)) / 100,
+                        seuil_alerte_faible=hasard.randint(5, 30),
+                        categorie=hasard.choice(categories) if categories and hasard.random() < 0.9 else None,
+                    )
+                    for i in range(options['produits'])
+                ),
+                batch_size=taille_lot,
+            )
+            self.stdout.write(f"{len(produits)} produits, {len(fournisseurs)} fournisseurs, {len(categories)} catégories en {time.perf_counter() - debut:.1f} s.")
+
+            debut = time.perf_counter()
+            quantites = self._mouvements(hasard, produits, fournisseurs, utilisateur, options)
+            self.stdout.write(f"{options['mouvements']} mouvements en {time.perf_counter() - debut:.1f} s.")
+
+            # Quantités finales = solde du grand livre généré
+            table = connection.ops.quote_name(Produit._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"UPDATE {table} SET quantite_actuelle = %s WHERE id = %s",
+                    [(quantite, produit.pk) for produit, quantite in zip(produits, quantites) if quantite],
+                )
+            # Insertions groupées et SQL direct n'émettent pas de signaux
+            tableau_de_bord.invalider()
+            cache_catalogue.invalider(*cache_catalogue.MODELES, 'mouvement')
+
+        if not options['sans_derives']:
+            for commande, arguments in [
+                ('backfill_stock_journalier', []),
+                ('rebuild_product_stats', []),
+                ('repair_stock_alerts', ['--reinitialiser']),
+                ('rebuild_rollups', []),
+            ]:
+                call_command(commande, *arguments, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Jeu de données de benchmark prêt."))
+
+    def _mouvements(self, hasard, produits, fournisseurs, utilisateur, options):
+        """
+        Insère les mouvements dans l'ordre chronologique par executemany (date_mouvement est en auto_now_add,
+        que bulk_create écraserait) et renvoie le stock final de chaque produit.
+        Les produits sont tirés selon une loi de popularité décroissante ; une sortie n'est générée
+        que si le stock la couvre, sinon le produit est réapprovisionné.
+        """
+        total = options['mouvements']
+        quantites = [0] * len(produits)
+        if not total or not produits:
+            return quantites
+        poids = list(range(1, len(produits) + 1))
+        poids_cumules = []
+        cumul = 0.0
+        for rang in poids:
+            cumul += 1 / rang ** 0.8
+            poids_cumules.append(cumul)
+        indices = list(range(len(produits)))
+
+        fin = timezone.now()
+        origine = fin - timedelta(days=options['jours'])
+        pas = (fin - origine) / total
+        adapter = connection.ops.adapt_datetimefield_value
+        table = connection.ops.quote_name(MouvementStock._meta.db_table)
+        sql = (
+            f"INSERT INTO {table} (produit_id, type_mouvement, quantite, date_mouvement, utilisateur_id, raison_mouvement, fournisseur_id) "
+            f"VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        )
+        with connection.cursor() as cursor:
+            for depart in range(0, total, options['taille_lot']):
+                nombre = min(options['taille_lot'], total - depart)
+                lignes = []
+                for numero, indice in enumerate(hasard.choices(indices, cum_weights=poids_cumules, k=nombre), start=depart):
+                    date_mouvement = adapter(origine + pas * numero)
+                    sortie = hasard.randint(1, 10)
+                    if quantites[indice] >= sortie and hasard.random() < 0.9:
+                        quantites[indice] -= sortie
+                        lignes.append((produits[indice].pk, 'sortie', sortie, date_mouvement, utilisateur.pk, hasard.choice(RAISONS_SORTIE), None))
+                    else:
+                        entree = hasard.randint(10, 100)
+                        quantites[indice] += entree
+                        fournisseur = hasard.choice(fournisseurs).pk if fournisseurs else None
+                        lignes.append((produits[indice].pk, 'entree', entree, date_mouvement, utilisateur.pk, 'Réception', fournisseur))
+                cursor.executemany(sql, lignes)
+        return quantites
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from inventory.routeurs import BASE_LECTURE
+
+
+class Command(BaseCommand):
+    help = (
+        "Copie la base principale dans la copie en lecture seule lue par les rapports et les exports "
+        "(RAPPORTS_BASE_LECTURE). À planifier (cron) plus souvent que RAPPORTS_REPLIQUE_AGE_MAX."
+    )
+
+    def handle(self, *args, **options):
+        if BASE_LECTURE not in settings.DATABASES:
+            raise CommandError(f"La base '{BASE_LECTURE}' n'est pas configurée dans DATABASES.")
+        principale = connections[DEFAULT_DB_ALIAS]
+        replique = connections[BASE_LECTURE]
+        if principale.vendor != 'sqlite' or replique.vendor != 'sqlite':
+            raise CommandError("La copie des rapports n'est gérée que pour SQLite.")
+        cible = os.path.abspath(replique.settings_dict['NAME'])
+        if cible == os.path.abspath(principale.settings_dict['NAME']):
+            raise CommandError("La copie des rapports désigne le même fichier que la base principale.")
+
+        debut = time.perf_counter()
+        # Copie écrite à côté puis renommée : les lecteurs voient l'ancienne copie ou la nouvelle, jamais une copie partielle
+        partiel = cible + '.part'
+        if os.path.exists(partiel):
+            os.remove(partiel)
+        principale.ensure_connection()
+        destination = sqlite3.connect(partiel)
+        try:
+            # Une seule étape : en WAL, la lecture de la base principale ne bloque pas les écritures,
+            # et une copie par étapes recommencerait à chaque écriture concurrente
+            principale.connection.backup(destination)
+            # La copie n'est jamais écrite : journal classique, sans fichiers -wal / -shm
+            destination.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            destination.close()
+        os.replace(partiel, cible)
+        replique.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Copie des rapports mise à jour : {os.path.getsize(cible) / 1e6:.1f} Mo en {time.perf_counter() - debut:.2f} s."
+        ))
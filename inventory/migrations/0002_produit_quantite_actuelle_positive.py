@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='produit',
+            constraint=models.CheckConstraint(condition=models.Q(('quantite_actuelle__gte', 0)), name='produit_quantite_actuelle_positive'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_produit_quantite_actuelle_positive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockJournalier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantite_cloture', models.IntegerField()),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stocks_journaliers', to='inventory.produit')),
+            ],
+            options={
+                'verbose_name_plural': 'Stocks journaliers',
+                'constraints': [models.UniqueConstraint(fields=('produit', 'date'), name='stock_journalier_produit_date_unique')],
+            },
+        ),
+    ]
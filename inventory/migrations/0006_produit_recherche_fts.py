@@ -0,0 +1,60 @@
+# Index plein texte FTS5 (SQLite) sur le nom, la description et le code-barres des produits.
+# Table à contenu externe synchronisée par triggers : toute écriture sur inventory_produit
+# (save, bulk_create, update) met l'index à jour. Ignorée sur les autres bases.
+# Attention : SQLite applique la plupart des AlterField/RemoveField en reconstruisant inventory_produit,
+# ce qui supprime ces triggers. Une migration future qui modifie la table doit les recréer
+# (voir CREATION) ; la vérification inventory.E002 signale leur absence.
+
+from django.db import migrations
+
+
+CREATION = [
+    """CREATE VIRTUAL TABLE inventory_produit_fts USING fts5(
+        nom, description, code_barre,
+        content='inventory_produit', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER inventory_produit_fts_ai AFTER INSERT ON inventory_produit BEGIN
+        INSERT INTO inventory_produit_fts(rowid, nom, description, code_barre)
+        VALUES (new.id, new.nom, new.description, new.code_barre);
+    END""",
+    """CREATE TRIGGER inventory_produit_fts_ad AFTER DELETE ON inventory_produit BEGIN
+        INSERT INTO inventory_produit_fts(inventory_produit_fts, rowid, nom, description, code_barre)
+        VALUES ('delete', old.id, old.nom, old.description, old.code_barre);
+    END""",
+    # Seules les colonnes indexées déclenchent la mise à jour (pas quantite_actuelle, modifiée à chaque mouvement)
+    """CREATE TRIGGER inventory_produit_fts_au AFTER UPDATE OF nom, description, code_barre ON inventory_produit BEGIN
+        INSERT INTO inventory_produit_fts(inventory_produit_fts, rowid, nom, description, code_barre)
+        VALUES ('delete', old.id, old.nom, old.description, old.code_barre);
+        INSERT INTO inventory_produit_fts(rowid, nom, description, code_barre)
+        VALUES (new.id, new.nom, new.description, new.code_barre);
+    END""",
+    "INSERT INTO inventory_produit_fts(inventory_produit_fts) VALUES ('rebuild')",
+]
+
+SUPPRESSION = [
+    "DROP TRIGGER IF EXISTS inventory_produit_fts_au",
+    "DROP TRIGGER IF EXISTS inventory_produit_fts_ad",
+    "DROP TRIGGER IF EXISTS inventory_produit_fts_ai",
+    "DROP TABLE IF EXISTS inventory_produit_fts",
+]
+
+
+def executer(requetes):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for requete in requetes:
+            schema_editor.execute(requete)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_tacheexport'),
+    ]
+
+    operations = [
+        migrations.RunPython(executer(CREATION), executer(SUPPRESSION)),
+    ]
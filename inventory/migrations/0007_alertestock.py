@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def ouvrir_alertes_existantes(apps, schema_editor):
+    # État initial : une alerte ouverte par produit déjà sous son seuil
+    Produit = apps.get_model('inventory', 'Produit')
+    AlerteStock = apps.get_model('inventory', 'AlerteStock')
+    maintenant = timezone.now()
+    en_alerte = Produit.objects.filter(
+        models.Q(quantite_actuelle=0) | models.Q(quantite_actuelle__lte=models.F('seuil_alerte_faible'))
+    ).values_list('id', 'quantite_actuelle')
+    AlerteStock.objects.bulk_create(
+        [
+            AlerteStock(produit_id=produit_id, etat='rupture' if quantite == 0 else 'faible', date_ouverture=maintenant)
+            for produit_id, quantite in en_alerte.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_produit_recherche_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlerteStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etat', models.CharField(choices=[('faible', 'Stock faible'), ('rupture', 'Rupture de stock')], max_length=7)),
+                ('date_ouverture', models.DateTimeField()),
+                ('date_fermeture', models.DateTimeField(blank=True, null=True)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertes', to='inventory.produit')),
+            ],
+            options={
+                'verbose_name_plural': 'Alertes de stock',
+                'indexes': [models.Index(condition=models.Q(('date_fermeture__isnull', True)), fields=['etat'], name='alerte_stock_ouverte_etat_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('date_fermeture__isnull', True)), fields=('produit',), name='alerte_stock_ouverte_unique')],
+            },
+        ),
+        migrations.RunPython(ouvrir_alertes_existantes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def calculer_statistiques(apps, schema_editor):
+    # Une ligne par produit, puis les agrégats recalculés depuis le grand livre (comme rebuild_product_stats)
+    Produit = apps.get_model('inventory', 'Produit')
+    MouvementStock = apps.get_model('inventory', 'MouvementStock')
+    StatistiquesProduit = apps.get_model('inventory', 'StatistiquesProduit')
+    StatistiquesProduit.objects.bulk_create(
+        [StatistiquesProduit(produit_id=pk) for pk in Produit.objects.values_list('pk', flat=True).iterator()],
+        batch_size=1000,
+    )
+    mouvements = MouvementStock.objects.filter(produit=models.OuterRef('produit_id')).order_by()
+
+    def total(type_mouvement):
+        return Coalesce(models.Subquery(
+            mouvements.filter(type_mouvement=type_mouvement).values('produit').annotate(total=models.Sum('quantite')).values('total')
+        ), 0)
+
+    StatistiquesProduit.objects.update(
+        total_entrees=total('entree'),
+        total_sorties=total('sortie'),
+        date_dernier_mouvement=models.Subquery(mouvements.order_by('-date_mouvement').values('date_mouvement')[:1]),
+        dernier_fournisseur_id=models.Subquery(
+            mouvements.filter(fournisseur__isnull=False).order_by('-date_mouvement', '-pk').values('fournisseur_id')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_alertestock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiquesProduit',
+            fields=[
+                ('produit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistiques', serialize=False, to='inventory.produit')),
+                ('total_entrees', models.IntegerField(default=0)),
+                ('total_sorties', models.IntegerField(default=0)),
+                ('date_dernier_mouvement', models.DateTimeField(blank=True, null=True)),
+                ('dernier_fournisseur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.fournisseur')),
+            ],
+            options={
+                'verbose_name_plural': 'Statistiques des produits',
+            },
+        ),
+        migrations.RunPython(calculer_statistiques, migrations.RunPython.noop),
+    ]
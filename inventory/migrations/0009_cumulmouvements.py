@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_statistiquesproduit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CumulMouvements',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('tout', 'Tout le stock'), ('produit', 'Produit'), ('categorie', 'Catégorie'), ('fournisseur', 'Fournisseur')], max_length=11)),
+                ('cle', models.BigIntegerField(default=0)),
+                ('periode', models.CharField(choices=[('jour', 'Jour'), ('semaine', 'Semaine')], max_length=7)),
+                ('date_debut', models.DateField()),
+                ('entrees', models.IntegerField(default=0)),
+                ('sorties', models.IntegerField(default=0)),
+                ('nombre', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Cumuls de mouvements',
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'cle', 'periode', 'date_debut'), name='cumul_mouvements_unique')],
+            },
+        ),
+    ]
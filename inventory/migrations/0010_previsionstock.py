@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_cumulmouvements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrevisionStock',
+            fields=[
+                ('produit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='prevision', serialize=False, to='inventory.produit')),
+                ('demande_moyenne', models.FloatField()),
+                ('demande_lissee', models.FloatField()),
+                ('ecart_type', models.FloatField()),
+                ('jours_couverture', models.FloatField(blank=True, null=True)),
+                ('point_commande', models.IntegerField()),
+                ('date_calcul', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Prévisions de stock',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Table du cache partagé entre les processus (CACHES['partage'], DatabaseCache) : versions du catalogue,
+# droits et sessions. migrate n'appelle pas createcachetable de lui-même ; sans cette migration,
+# la première écriture dans le cache (création d'un utilisateur, connexion) échoue en "no such table".
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.db import migrations
+
+
+def creer(apps, schema_editor):
+    # Crée la table de chaque cache DatabaseCache absente de la base ; sans effet pour Redis ou Memcached
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+def supprimer(apps, schema_editor):
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        if isinstance(cache, DatabaseCache):
+            schema_editor.execute(f"DROP TABLE IF EXISTS {schema_editor.quote_name(cache._table)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_previsionstock'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer, supprimer),
+    ]
@@ -1,5 +1,22 @@
-from django.db import models
+import hashlib
+import json
+from datetime import timedelta
+
+from django.db import models, transaction, connection, IntegrityError
 from django.contrib.auth.models import User
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+
+class StockInsuffisant(Exception):
+    """
+    Levée lorsqu'un mouvement ferait passer le stock d'un produit sous zéro.
+    """
+    def __init__(self, produit_id, variation):
+        self.produit_id = produit_id
+        self.variation = variation
+        super().__init__(f"Stock insuffisant pour le produit {produit_id} (variation demandée : {variation}).")
+
 
 class Categorie(models.Model):
     nom = models.CharField(max_length=100, unique=True)
@@ -33,10 +50,79 @@ class Produit(models.Model):
 
     class Meta:
         verbose_name_plural = "Produits"
+        constraints = [
+            # Dernier rempart : la base refuse tout stock négatif, quel que soit le chemin d'écriture
+            models.CheckConstraint(condition=models.Q(quantite_actuelle__gte=0), name='produit_quantite_actuelle_positive'),
+        ]
+        indexes = [
+            # Ruptures de stock (quantite_actuelle = 0)
+            models.Index(fields=['quantite_actuelle'], name='produit_quantite_idx'),
+            # Index partiel sur les seuls produits en alerte, trié par nom comme les listes d'alertes
+            # (ignoré par les bases qui ne gèrent pas les index partiels)
+            models.Index(fields=['nom'], condition=models.Q(quantite_actuelle__lte=models.F('seuil_alerte_faible')), name='produit_stock_faible_idx'),
+        ]
 
     def __str__(self):
         return self.nom
 
+    def save(self, *args, **kwargs):
+        # La quantité n'est modifiée que par ajuster_stock() : une modification du produit
+        # (formulaire, admin) ne doit pas écraser une valeur mise à jour entre-temps par un mouvement.
+        if not self._state.adding and self.pk is not None and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'quantite_actuelle'
+            ]
+        creation = self._state.adding
+        with transaction.atomic():
+            ancienne_categorie = self.categorie_id
+            if not creation and 'categorie' in (kwargs.get('update_fields') or ['categorie']):
+                ancienne_categorie = Produit.objects.filter(pk=self.pk).values_list('categorie_id', flat=True).first()
+            super().save(*args, **kwargs)
+            if creation:
+                StatistiquesProduit.objects.create(produit=self)
+            elif ancienne_categorie != self.categorie_id:
+                CumulMouvements.changer_categorie(self.pk, ancienne_categorie, self.categorie_id)
+            # Création ou changement de seuil : l'état d'alerte peut avoir changé
+            AlerteStock.synchroniser(self.pk)
+
+    @staticmethod
+    def ajuster_stock(produit_id, variation):
+        """
+        Applique `variation` à la quantité du produit en un seul UPDATE conditionnel.
+        Une sortie qui rendrait le stock négatif ne touche aucune ligne et lève StockInsuffisant.
+        """
+        produits = Produit.objects.filter(pk=produit_id)
+        if variation < 0:
+            produits = produits.filter(quantite_actuelle__gte=-variation)
+        if produits.update(quantite_actuelle=models.F('quantite_actuelle') + variation) == 0:
+            if variation < 0:
+                raise StockInsuffisant(produit_id, variation)
+            raise Produit.DoesNotExist(f"Produit {produit_id} introuvable.")
+
+    @staticmethod
+    def ajuster_stocks(variations):
+        """
+        Applique plusieurs variations {produit_id: variation} en un seul UPDATE conditionnel (CASE par produit).
+        Si l'une des sorties rendrait un stock négatif, rien n'est modifié et StockInsuffisant est levée.
+        """
+        variations = {produit_id: variation for produit_id, variation in variations.items() if variation}
+        if not variations:
+            return
+        ecart = models.Case(
+            *[models.When(pk=produit_id, then=models.Value(variation)) for produit_id, variation in variations.items()],
+            default=models.Value(0),
+            output_field=models.IntegerField(),
+        )
+        produits = Produit.objects.filter(pk__in=variations).alias(quantite_apres=models.F('quantite_actuelle') + ecart)
+        with transaction.atomic():
+            if produits.filter(quantite_apres__gte=0).update(quantite_actuelle=models.F('quantite_actuelle') + ecart) != len(variations):
+                # Les produits en défaut n'ont pas été modifiés : on les retrouve avant d'annuler le reste
+                produit_id = produits.filter(quantite_apres__lt=0).values_list('pk', flat=True).first()
+                if produit_id is None:
+                    raise Produit.DoesNotExist("Produit introuvable.")
+                raise StockInsuffisant(produit_id, variations[produit_id])
+
     @property
     def est_stock_faible(self):
         return self.quantite_actuelle <= self.seuil_alerte_faible and self.quantite_actuelle > 0 # Ajouté > 0 pour ne pas alerter si stock vide et non géré
@@ -64,29 +150,584 @@ class MouvementStock(models.Model):
     class Meta:
         ordering = ['-date_mouvement'] # Tri par date la plus récente
         verbose_name_plural = "Mouvements de Stock"
+        indexes = [
+            # Tri par défaut et filtres de période sans autre critère
+            models.Index(fields=['date_mouvement'], name='mouvement_date_idx'),
+            # Totaux par type sur une période (accueil, rapports filtrés par type)
+            models.Index(fields=['type_mouvement', 'date_mouvement'], name='mouvement_type_date_idx'),
+            # Historique d'un produit sur une période (rapports filtrés par produit)
+            models.Index(fields=['produit', 'date_mouvement'], name='mouvement_produit_date_idx'),
+        ]
 
 
     def __str__(self):
         return f"{self.type_mouvement.capitalize()} de {self.quantite} {self.produit.nom} le {self.date_mouvement.strftime('%Y-%m-%d %H:%M')}"
 
-    # Logique pour mettre à jour la quantité du produit lors de la sauvegarde du mouvement
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs) # Sauvegarde d'abord le mouvement
+    @staticmethod
+    def variation(type_mouvement, quantite):
+        # Effet signé d'un mouvement sur le stock du produit
+        if type_mouvement == 'entree':
+            return quantite
+        if type_mouvement == 'sortie':
+            return -quantite
+        return 0
 
-        # Met à jour la quantité actuelle du produit
-        produit = self.produit
-        if self.type_mouvement == 'entree':
-            produit.quantite_actuelle += self.quantite
-        elif self.type_mouvement == 'sortie':
-            produit.quantite_actuelle -= self.quantite
-        produit.save() # Sauvegarde le produit mis à jour
+    # Le mouvement et la mise à jour de la quantité du produit sont écrits dans la même transaction :
+    # soit les deux sont enregistrés, soit aucun (ex: sortie refusée pour stock insuffisant).
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            produits_touches = {self.produit_id}
+            if not self._state.adding and self.pk is not None:
+                # Modification d'un mouvement existant (admin) : on annule d'abord son ancien effet
+                ancien = MouvementStock.objects.filter(pk=self.pk).values('produit_id', 'type_mouvement', 'quantite', 'date_mouvement', 'fournisseur_id').first()
+                if ancien is not None:
+                    variation_ancienne = -self.variation(ancien['type_mouvement'], ancien['quantite'])
+                    Produit.ajuster_stock(ancien['produit_id'], variation_ancienne)
+                    StockJournalier.decaler(ancien['produit_id'], timezone.localdate(ancien['date_mouvement']), variation_ancienne)
+                    produits_touches.add(ancien['produit_id'])
+                    CumulMouvements.ajouter([MouvementStock(**ancien)], signe=-1)
+            variation = self.variation(self.type_mouvement, self.quantite)
+            Produit.ajuster_stock(self.produit_id, variation)
+            creation = self._state.adding
+            super().save(*args, **kwargs)
+            StockJournalier.decaler(self.produit_id, timezone.localdate(self.date_mouvement), variation)
+            AlerteStock.synchroniser(*produits_touches)
+            CumulMouvements.ajouter([self])
+            if creation:
+                StatistiquesProduit.enregistrer([self])
+            else:
+                StatistiquesProduit.recalculer(*produits_touches)
 
     # Logique pour annuler la mise à jour de la quantité si le mouvement est supprimé
     def delete(self, *args, **kwargs):
-        produit = self.produit
-        if self.type_mouvement == 'entree':
-            produit.quantite_actuelle -= self.quantite
-        elif self.type_mouvement == 'sortie':
-            produit.quantite_actuelle += self.quantite
-        produit.save()
-        return super().delete(*args, **kwargs)
\ No newline at end of file
+        with transaction.atomic():
+            variation = -self.variation(self.type_mouvement, self.quantite)
+            Produit.ajuster_stock(self.produit_id, variation)
+            StockJournalier.decaler(self.produit_id, timezone.localdate(self.date_mouvement), variation)
+            AlerteStock.synchroniser(self.produit_id)
+            CumulMouvements.ajouter([self], signe=-1)
+            resultat = super().delete(*args, **kwargs)
+            StatistiquesProduit.recalculer(self.produit_id)
+            return resultat
+
+
+class StockJournalier(models.Model):
+    """
+    Point de contrôle : quantité d'un produit à la clôture d'un jour où il a eu des mouvements.
+    Le stock à une date se lit dans le dernier point de contrôle antérieur, sans rejouer le grand livre.
+    """
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='stocks_journaliers')
+    date = models.DateField()
+    quantite_cloture = models.IntegerField()
+
+    class Meta:
+        verbose_name_plural = "Stocks journaliers"
+        constraints = [
+            models.UniqueConstraint(fields=['produit', 'date'], name='stock_journalier_produit_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.produit_id} au {self.date} : {self.quantite_cloture}"
+
+    @classmethod
+    def decaler(cls, produit_id, jour, variation):
+        """
+        Répercute `variation` sur la clôture de `jour` et de tous les jours suivants du produit.
+        Si `jour` n'a pas encore de point de contrôle, il est créé à partir du précédent.
+        """
+        if not variation:
+            return
+        cls.objects.filter(produit_id=produit_id, date__gte=jour).update(quantite_cloture=models.F('quantite_cloture') + variation)
+        # INSERT ... SELECT : la clôture précédente est lue par la base, sans aller-retour Python
+        # (le WHERE évite l'ambiguïté d'analyse de SQLite entre ON CONFLICT et une jointure)
+        table = connection.ops.quote_name(cls._meta.db_table)
+        jour = connection.ops.adapt_datefield_value(jour)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (produit_id, date, quantite_cloture) "
+                f"SELECT %s, %s, COALESCE((SELECT quantite_cloture FROM {table} WHERE produit_id = %s AND date < %s ORDER BY date DESC LIMIT 1), 0) + %s "
+                f"WHERE 1 = 1 ON CONFLICT (produit_id, date) DO NOTHING",
+                [produit_id, jour, produit_id, jour, variation],
+            )
+
+    @classmethod
+    def reconstruire(cls, produit_ids=None, taille_lot=5000):
+        """
+        Recrée les points de contrôle de tous les produits (ou des seuls `produit_ids`) à partir du grand livre,
+        en remontant le temps depuis la quantité actuelle. Renvoie le nombre de points de contrôle créés.
+        """
+        produits = Produit.objects.all()
+        mouvements = MouvementStock.objects.all()
+        points = cls.objects.all()
+        if produit_ids is not None:
+            produits = produits.filter(pk__in=produit_ids)
+            mouvements = mouvements.filter(produit_id__in=produit_ids)
+            points = points.filter(produit_id__in=produit_ids)
+        quantites = dict(produits.values_list('id', 'quantite_actuelle'))
+
+        # Variation nette par produit et par jour, du plus récent au plus ancien
+        variations = (
+            mouvements
+            .annotate(jour=TruncDate('date_mouvement'))
+            .values('produit_id', 'jour')
+            .annotate(variation=models.Sum(models.Case(models.When(type_mouvement='sortie', then=-models.F('quantite')), default=models.F('quantite'))))
+            .order_by('produit_id', '-jour')
+        )
+
+        total = 0
+        lot = []
+        with transaction.atomic():
+            points.delete()
+            produit_courant = None
+            cloture = 0
+            for ligne in variations.iterator():
+                # On remonte le temps depuis la quantité actuelle : clôture(J-1) = clôture(J) - variation(J)
+                if ligne['produit_id'] != produit_courant:
+                    produit_courant = ligne['produit_id']
+                    cloture = quantites.get(produit_courant, 0)
+                lot.append(cls(produit_id=produit_courant, date=ligne['jour'], quantite_cloture=cloture))
+                cloture -= ligne['variation']
+                if len(lot) >= taille_lot:
+                    cls.objects.bulk_create(lot)
+                    total += len(lot)
+                    lot = []
+            cls.objects.bulk_create(lot)
+            total += len(lot)
+        return total
+
+    @classmethod
+    def sous_requete_quantite(cls, jour, produit=models.OuterRef('pk')):
+        # Clôture du dernier point de contrôle <= jour, à utiliser dans un annotate() sur Produit
+        return Coalesce(
+            models.Subquery(
+                cls.objects.filter(produit=produit, date__lte=jour).order_by('-date').values('quantite_cloture')[:1]
+            ),
+            0,
+        )
+
+    @classmethod
+    def quantite_au(cls, produit_id, jour, using=None):
+        return cls.objects.using(using).filter(produit_id=produit_id, date__lte=jour).order_by('-date').values_list('quantite_cloture', flat=True).first() or 0
+
+
+class StatistiquesProduit(models.Model):
+    """
+    Agrégats des mouvements d'un produit (totaux reçus et sortis, dernier mouvement, dernier fournisseur),
+    tenus à jour dans la transaction de chaque mouvement pour être affichés sans réagréger le grand livre.
+    """
+    produit = models.OneToOneField(Produit, on_delete=models.CASCADE, primary_key=True, related_name='statistiques')
+    total_entrees = models.IntegerField(default=0)
+    total_sorties = models.IntegerField(default=0)
+    date_dernier_mouvement = models.DateTimeField(null=True, blank=True)
+    dernier_fournisseur = models.ForeignKey(Fournisseur, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        verbose_name_plural = "Statistiques des produits"
+
+    def __str__(self):
+        return f"{self.produit_id} : +{self.total_entrees} / -{self.total_sorties}"
+
+    @classmethod
+    def enregistrer(cls, mouvements):
+        """
+        Ajoute des mouvements qui viennent d'être insérés : une ligne par produit, insérée ou cumulée
+        par un INSERT ... ON CONFLICT DO UPDATE (sans lecture préalable).
+        """
+        par_produit = {}
+        for mouvement in mouvements:
+            entrees, sorties, date_mouvement, fournisseur_id = par_produit.get(mouvement.produit_id, (0, 0, None, None))
+            if mouvement.type_mouvement == 'entree':
+                entrees += mouvement.quantite
+            elif mouvement.type_mouvement == 'sortie':
+                sorties += mouvement.quantite
+            if date_mouvement is None or mouvement.date_mouvement >= date_mouvement:
+                date_mouvement = mouvement.date_mouvement
+                fournisseur_id = mouvement.fournisseur_id or fournisseur_id
+            par_produit[mouvement.produit_id] = (entrees, sorties, date_mouvement, fournisseur_id)
+        if not par_produit:
+            return
+
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (produit_id, total_entrees, total_sorties, date_dernier_mouvement, dernier_fournisseur_id) "
+                f"VALUES (%s, %s, %s, %s, %s) "
+                f"ON CONFLICT (produit_id) DO UPDATE SET "
+                f"total_entrees = {table}.total_entrees + excluded.total_entrees, "
+                f"total_sorties = {table}.total_sorties + excluded.total_sorties, "
+                f"dernier_fournisseur_id = CASE WHEN excluded.dernier_fournisseur_id IS NOT NULL "
+                f"AND ({table}.date_dernier_mouvement IS NULL OR excluded.date_dernier_mouvement >= {table}.date_dernier_mouvement) "
+                f"THEN excluded.dernier_fournisseur_id ELSE {table}.dernier_fournisseur_id END, "
+                f"date_dernier_mouvement = CASE WHEN {table}.date_dernier_mouvement IS NULL "
+                f"OR excluded.date_dernier_mouvement > {table}.date_dernier_mouvement "
+                f"THEN excluded.date_dernier_mouvement ELSE {table}.date_dernier_mouvement END",
+                [
+                    (produit_id, entrees, sorties, connection.ops.adapt_datetimefield_value(date_mouvement), fournisseur_id)
+                    for produit_id, (entrees, sorties, date_mouvement, fournisseur_id) in par_produit.items()
+                ],
+            )
+
+    @staticmethod
+    def valeurs_calculees(produit=models.OuterRef('produit_id')):
+        # Agrégats recalculés depuis le grand livre (sous-requêtes sur l'index produit + date)
+        mouvements = MouvementStock.objects.filter(produit=produit).order_by()
+
+        def total(type_mouvement):
+            return Coalesce(
+                models.Subquery(
+                    mouvements.filter(type_mouvement=type_mouvement).values('produit')
+                    .annotate(total=models.Sum('quantite')).values('total')
+                ),
+                0,
+            )
+
+        return {
+            'total_entrees': total('entree'),
+            'total_sorties': total('sortie'),
+            'date_dernier_mouvement': models.Subquery(
+                mouvements.order_by('-date_mouvement').values('date_mouvement')[:1]
+            ),
+            'dernier_fournisseur_id': models.Subquery(
+                mouvements.filter(fournisseur__isnull=False).order_by('-date_mouvement', '-pk').values('fournisseur_id')[:1]
+            ),
+        }
+
+    @classmethod
+    def recalculer(cls, *produit_ids):
+        """
+        Recalcule les agrégats depuis le grand livre (suppression ou modification d'un mouvement, reconstruction).
+        Sans argument, tous les produits sont traités.
+        """
+        lignes = cls.objects.all()
+        if produit_ids:
+            lignes = lignes.filter(produit_id__in=produit_ids)
+        return lignes.update(**cls.valeurs_calculees())
+
+
+class CumulMouvements(models.Model):
+    """
+    Totaux d'entrées et de sorties par jour et par semaine (lundi), pour l'ensemble du stock ('tout'),
+    par produit, par catégorie et par fournisseur. Tenu à jour par chaque mouvement (ajouter()),
+    reconstruit au besoin par manage.py rebuild_rollups ; les analyses ne lisent que cette table.
+    Comme dans la reconstruction, tout l'historique d'un produit compte pour sa catégorie actuelle :
+    un changement de catégorie y déplace ses cumuls (changer_categorie(), retirer_categorie()).
+    """
+    PERIODE_CHOICES = [
+        ('jour', 'Jour'),
+        ('semaine', 'Semaine'),
+    ]
+    DIMENSION_CHOICES = [
+        ('tout', 'Tout le stock'),
+        ('produit', 'Produit'),
+        ('categorie', 'Catégorie'),
+        ('fournisseur', 'Fournisseur'),
+    ]
+
+    dimension = models.CharField(max_length=11, choices=DIMENSION_CHOICES)
+    cle = models.BigIntegerField(default=0) # Identifiant du produit / de la catégorie / du fournisseur, 0 pour 'tout' ou sans catégorie
+    periode = models.CharField(max_length=7, choices=PERIODE_CHOICES)
+    date_debut = models.DateField()
+    entrees = models.IntegerField(default=0)
+    sorties = models.IntegerField(default=0)
+    nombre = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Cumuls de mouvements"
+        constraints = [
+            # Sert aussi d'index pour les séries : dimension + clé + période, parcourues par date
+            models.UniqueConstraint(fields=['dimension', 'cle', 'periode', 'date_debut'], name='cumul_mouvements_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.cle} {self.periode} {self.date_debut} : +{self.entrees} / -{self.sorties}"
+
+    @staticmethod
+    def debuts_de_periode(jour):
+        # Premier jour de chaque période contenant `jour` (semaines commençant le lundi, comme TruncWeek)
+        return {'jour': jour, 'semaine': jour - timedelta(days=jour.weekday())}
+
+    @classmethod
+    def ajouter(cls, mouvements, signe=1):
+        """
+        Cumule (signe=1) ou retire (signe=-1) des mouvements dans les totaux de leurs périodes.
+        Les lignes sont regroupées en Python puis écrites par INSERT ... ON CONFLICT DO UPDATE ;
+        la catégorie est lue par la base dans le même ordre SQL : c'est la catégorie actuelle du produit,
+        celle où changer_categorie() a déplacé tout son historique.
+        """
+        cumuls = {}
+        for mouvement in mouvements:
+            entrees = mouvement.quantite if mouvement.type_mouvement == 'entree' else 0
+            sorties = mouvement.quantite if mouvement.type_mouvement == 'sortie' else 0
+            sources = [('tout', 0), ('produit', mouvement.produit_id), ('categorie', mouvement.produit_id)]
+            if mouvement.fournisseur_id:
+                sources.append(('fournisseur', mouvement.fournisseur_id))
+            for periode, date_debut in cls.debuts_de_periode(timezone.localdate(mouvement.date_mouvement)).items():
+                for dimension, source in sources:
+                    cle = (dimension, source, mouvement.produit_id, periode, date_debut)
+                    total = cumuls.get(cle, (0, 0, 0))
+                    cumuls[cle] = (total[0] + signe * entrees, total[1] + signe * sorties, total[2] + signe)
+        if not cumuls:
+            return
+
+        table = connection.ops.quote_name(cls._meta.db_table)
+        table_produit = connection.ops.quote_name(Produit._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (dimension, cle, periode, date_debut, entrees, sorties, nombre) "
+                f"SELECT %s, CASE WHEN %s = 'categorie' THEN COALESCE(p.categorie_id, 0) ELSE %s END, %s, %s, %s, %s, %s "
+                f"FROM {table_produit} p WHERE p.id = %s "
+                f"ON CONFLICT (dimension, cle, periode, date_debut) DO UPDATE SET "
+                f"entrees = {table}.entrees + excluded.entrees, "
+                f"sorties = {table}.sorties + excluded.sorties, "
+                f"nombre = {table}.nombre + excluded.nombre",
+                [
+                    (dimension, dimension, source, periode, connection.ops.adapt_datefield_value(date_debut), entrees, sorties, nombre, produit_id)
+                    for (dimension, source, produit_id, periode, date_debut), (entrees, sorties, nombre) in cumuls.items()
+                ],
+            )
+
+
+    @classmethod
+    def changer_categorie(cls, produit_id, ancienne, nouvelle):
+        """
+        Déplace les cumuls d'un produit de la catégorie `ancienne` vers `nouvelle` (None : sans catégorie),
+        d'après ses propres cumuls (dimension 'produit') : deux INSERT ... SELECT, sans lire les mouvements.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            for cle, signe in ((ancienne or 0, -1), (nouvelle or 0, 1)):
+                cursor.execute(
+                    f"INSERT INTO {table} (dimension, cle, periode, date_debut, entrees, sorties, nombre) "
+                    f"SELECT 'categorie', %s, periode, date_debut, %s * entrees, %s * sorties, %s * nombre "
+                    f"FROM {table} WHERE dimension = 'produit' AND cle = %s "
+                    f"ON CONFLICT (dimension, cle, periode, date_debut) DO UPDATE SET "
+                    f"entrees = {table}.entrees + excluded.entrees, "
+                    f"sorties = {table}.sorties + excluded.sorties, "
+                    f"nombre = {table}.nombre + excluded.nombre",
+                    [cle, signe, signe, signe, produit_id],
+                )
+
+    @classmethod
+    def retirer_categorie(cls, categorie_id):
+        """
+        Avant la suppression d'une catégorie (ses produits passent sans catégorie par SET_NULL, sans signal) :
+        ses cumuls rejoignent ceux des produits sans catégorie (clé 0).
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (dimension, cle, periode, date_debut, entrees, sorties, nombre) "
+                f"SELECT 'categorie', 0, periode, date_debut, entrees, sorties, nombre "
+                f"FROM {table} WHERE dimension = 'categorie' AND cle = %s "
+                f"ON CONFLICT (dimension, cle, periode, date_debut) DO UPDATE SET "
+                f"entrees = {table}.entrees + excluded.entrees, "
+                f"sorties = {table}.sorties + excluded.sorties, "
+                f"nombre = {table}.nombre + excluded.nombre",
+                [categorie_id],
+            )
+        cls.objects.filter(dimension='categorie', cle=categorie_id).delete()
+
+
+class PrevisionStock(models.Model):
+    """
+    Dernière prévision de demande d'un produit et point de commande suggéré (voir previsions.py).
+    Le seuil d'alerte du produit n'est modifié que lorsqu'une suggestion est appliquée.
+    """
+    produit = models.OneToOneField(Produit, on_delete=models.CASCADE, primary_key=True, related_name='prevision')
+    demande_moyenne = models.FloatField()  # Sorties par jour, moyenne mobile
+    demande_lissee = models.FloatField()   # Sorties par jour, lissage exponentiel
+    ecart_type = models.FloatField()
+    jours_couverture = models.FloatField(null=True, blank=True) # Vide quand le produit n'a pas de demande
+    point_commande = models.IntegerField()
+    date_calcul = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = "Prévisions de stock"
+
+    def __str__(self):
+        return f"{self.produit_id} : point de commande {self.point_commande}"
+
+
+class AlerteStock(models.Model):
+    """
+    Alerte de stock faible ou de rupture, ouverte quand un produit franchit son seuil et fermée quand il en sort.
+    Tenue à jour par synchroniser() aux mêmes endroits que la quantité, pour que les pages d'alerte
+    lisent cette petite table au lieu de parcourir les produits.
+    """
+    ETAT_CHOICES = [
+        ('faible', 'Stock faible'),
+        ('rupture', 'Rupture de stock'),
+    ]
+
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='alertes')
+    etat = models.CharField(max_length=7, choices=ETAT_CHOICES)
+    date_ouverture = models.DateTimeField()
+    date_fermeture = models.DateTimeField(null=True, blank=True) # Vide tant que l'alerte est ouverte
+
+    class Meta:
+        verbose_name_plural = "Alertes de stock"
+        constraints = [
+            # Au plus une alerte ouverte par produit
+            models.UniqueConstraint(fields=['produit'], condition=models.Q(date_fermeture__isnull=True), name='alerte_stock_ouverte_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['etat'], condition=models.Q(date_fermeture__isnull=True), name='alerte_stock_ouverte_etat_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_etat_display()} : {self.produit_id} depuis le {self.date_ouverture:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def ouvertes(cls):
+        return cls.objects.filter(date_fermeture__isnull=True)
+
+    @staticmethod
+    def etat_attendu():
+        # Même règle que Produit.est_en_rupture / est_stock_faible ; '' quand le produit n'est pas en alerte
+        return models.Case(
+            models.When(quantite_actuelle=0, then=models.Value('rupture')),
+            models.When(quantite_actuelle__lte=models.F('seuil_alerte_faible'), then=models.Value('faible')),
+            default=models.Value(''),
+            output_field=models.CharField(),
+        )
+
+    @classmethod
+    def synchroniser(cls, *produit_ids):
+        """
+        Ferme les alertes ouvertes qui ne correspondent plus au stock des produits et ouvre celles qui manquent.
+        Deux requêtes sans aller-retour Python, qui ne modifient des lignes que si un seuil a été franchi.
+        Sans argument, tous les produits sont traités (réparation). Renvoie (fermees, ouvertes).
+        """
+        maintenant = timezone.now()
+        alertes = cls.ouvertes()
+        if produit_ids:
+            alertes = alertes.filter(produit_id__in=produit_ids)
+        etat_du_produit = models.Subquery(
+            Produit.objects.filter(pk=models.OuterRef('produit_id')).annotate(etat=cls.etat_attendu()).values('etat')
+        )
+        fermees = alertes.exclude(etat=etat_du_produit).update(date_fermeture=maintenant)
+
+        # INSERT ... SELECT : l'état est calculé par la base, comme pour StockJournalier.decaler()
+        table = connection.ops.quote_name(cls._meta.db_table)
+        table_produit = connection.ops.quote_name(Produit._meta.db_table)
+        parametres = [connection.ops.adapt_datetimefield_value(maintenant)]
+        filtre_produits = ''
+        if produit_ids:
+            filtre_produits = f"AND p.id IN ({', '.join(['%s'] * len(produit_ids))}) "
+            parametres.extend(produit_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (produit_id, etat, date_ouverture) "
+                f"SELECT p.id, CASE WHEN p.quantite_actuelle = 0 THEN 'rupture' ELSE 'faible' END, %s "
+                f"FROM {table_produit} p "
+                f"WHERE (p.quantite_actuelle = 0 OR p.quantite_actuelle <= p.seuil_alerte_faible) {filtre_produits}"
+                f"AND NOT EXISTS (SELECT 1 FROM {table} a WHERE a.produit_id = p.id AND a.date_fermeture IS NULL)",
+                parametres,
+            )
+            ouvertes = cursor.rowcount
+        return fermees, ouvertes
+
+
+class TacheExport(models.Model):
+    """
+    Export CSV/PDF de mouvements exécuté hors requête par le worker (manage.py run_export_worker).
+    Deux demandes identiques en attente ou en cours partagent la même tâche (voir soumettre()).
+    Une tâche en cours appartient au worker qui l'a réclamée et qui signale régulièrement qu'il est
+    vivant (date_pulsation) ; seules les tâches sans signe de vie sont relancées par un autre worker.
+    """
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('pdf', 'PDF'),
+    ]
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('terminee', 'Terminée'),
+        ('echec', 'Échec'),
+    ]
+    STATUTS_ACTIFS = ['en_attente', 'en_cours']
+
+    format = models.CharField(max_length=3, choices=FORMAT_CHOICES)
+    criteres = models.JSONField(default=dict) # Données du RapportMouvementsForm, revalidées par le worker
+    empreinte = models.CharField(max_length=64)
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='en_attente')
+    lignes_total = models.IntegerField(null=True, blank=True)
+    lignes_traitees = models.IntegerField(default=0)
+    fichier = models.CharField(max_length=500, blank=True)
+    erreur = models.TextField(blank=True)
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True) # Worker qui exécute la tâche (machine:pid)
+    date_pulsation = models.DateTimeField(null=True, blank=True) # Dernier signe de vie de ce worker
+
+    class Meta:
+        verbose_name_plural = "Tâches d'export"
+        constraints = [
+            # Une seule tâche active par demande : la base arbitre les soumissions concurrentes
+            models.UniqueConstraint(fields=['empreinte'], condition=models.Q(statut__in=['en_attente', 'en_cours']), name='tache_export_active_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['statut', 'date_creation'], name='tache_export_statut_idx'),
+        ]
+
+    def __str__(self):
+        return f"Export {self.format} #{self.pk} ({self.get_statut_display()})"
+
+    @property
+    def progression(self):
+        if not self.lignes_total:
+            return 100 if self.statut == 'terminee' else 0
+        return min(100, round(100 * self.lignes_traitees / self.lignes_total))
+
+    @staticmethod
+    def calculer_empreinte(format, criteres):
+        return hashlib.sha256(json.dumps([format, criteres], sort_keys=True).encode()).hexdigest()
+
+    @classmethod
+    def soumettre(cls, format, criteres, utilisateur=None):
+        """
+        Renvoie (tâche, créée) : la tâche active identique si elle existe, sinon une nouvelle tâche.
+        """
+        empreinte = cls.calculer_empreinte(format, criteres)
+        for _ in range(3):
+            existante = cls.objects.filter(empreinte=empreinte, statut__in=cls.STATUTS_ACTIFS).first()
+            if existante is not None:
+                return existante, False
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(format=format, criteres=criteres, empreinte=empreinte, utilisateur=utilisateur), True
+            except IntegrityError:
+                # Une demande identique vient d'être créée par une requête concurrente
+                continue
+        raise IntegrityError("Impossible de soumettre la tâche d'export.")
+
+    @classmethod
+    def reclamer(cls, nombre, worker=''):
+        """
+        Passe jusqu'à `nombre` tâches en attente à 'en_cours' pour `worker` et renvoie leurs identifiants.
+        Le passage est conditionnel : une tâche n'est réclamée que par un seul worker.
+        """
+        reclamees = []
+        for pk in cls.objects.filter(statut='en_attente').order_by('date_creation').values_list('pk', flat=True)[:nombre]:
+            if cls.objects.filter(pk=pk, statut='en_attente').update(statut='en_cours', worker=worker, date_pulsation=timezone.now()) == 1:
+                reclamees.append(pk)
+        return reclamees
+
+    @classmethod
+    def pulser(cls, worker):
+        # Signe de vie du worker pour toutes ses tâches en cours
+        return cls.objects.filter(statut='en_cours', worker=worker).update(date_pulsation=timezone.now())
+
+    @classmethod
+    def relancer_abandonnees(cls, delai):
+        """
+        Remet en attente les tâches en cours dont le worker n'a pas donné signe de vie depuis `delai`
+        (timedelta) ; celles des workers actifs ne sont pas touchées. Renvoie leur nombre.
+        """
+        limite = timezone.now() - delai
+        return (
+            cls.objects.filter(statut='en_cours')
+            .filter(models.Q(date_pulsation__lt=limite) | models.Q(date_pulsation__isnull=True))
+            .update(statut='en_attente', worker='', date_pulsation=None)
+        )
@@ -0,0 +1,195 @@
+# inventory/previsions.py
+"""
+Prévision de la demande et points de commande suggérés, calculés pour tous les produits à la fois.
+
+L'historique des sorties journalières est lu en une requête dans les cumuls (CumulMouvements), sous
+forme de tableaux creux (produit, jour, quantité). Les calculs sont faits par NumPy sur ces tableaux
+(np.bincount par produit), sans boucle Python par produit ni matrice produits × jours :
+- moyenne mobile et écart-type de la demande sur PREVISION_FENETRE_JOURS ;
+- lissage exponentiel (forme fermée : somme pondérée par alpha * (1 - alpha) ** âge) ;
+- jours de couverture du stock actuel et point de commande
+  = demande lissée * délai + coefficient de sécurité * écart-type * racine(délai), jamais sous PREVISION_SEUIL_MINIMUM.
+Les résultats sont écrits en masse dans PrevisionStock ; appliquer_suggestions() reporte les points
+de commande retenus sur le seuil d'alerte des produits. Un produit sans sortie sur la fenêtre n'a pas
+de suggestion : son seuil actuel est conservé.
+
+NumPy (pip install numpy) n'est importé que par les fonctions de calcul, appelées par
+manage.py compute_forecasts : les vues (suggestions, application) fonctionnent sans.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from . import cache_catalogue, cache_produits, tableau_de_bord
+from .models import AlerteStock, CumulMouvements, PrevisionStock, Produit
+
+HISTORIQUE_JOURS = getattr(settings, 'PREVISION_HISTORIQUE_JOURS', 90)
+FENETRE_JOURS = getattr(settings, 'PREVISION_FENETRE_JOURS', 28)
+ALPHA = getattr(settings, 'PREVISION_ALPHA', 0.3)
+DELAI_REAPPRO_JOURS = getattr(settings, 'PREVISION_DELAI_REAPPRO_JOURS', 7)
+COEFFICIENT_SECURITE = getattr(settings, 'PREVISION_COEFFICIENT_SECURITE', 1.65)
+SEUIL_MINIMUM = getattr(settings, 'PREVISION_SEUIL_MINIMUM', 1)
+
+# Produits par UPDATE lors de l'application des suggestions (SQLite limite le nombre de paramètres d'une requête)
+TAILLE_LOT_APPLICATION = 500
+
+
+def charger_produits():
+    import numpy as np
+
+    # Identifiants (triés) et quantités actuelles de tous les produits
+    lignes = list(Produit.objects.order_by('pk').values_list('pk', 'quantite_actuelle'))
+    produit_ids = np.fromiter((pk for pk, _ in lignes), dtype=np.int64, count=len(lignes))
+    quantites = np.fromiter((quantite for _, quantite in lignes), dtype=np.float64, count=len(lignes))
+    return produit_ids, quantites
+
+
+def charger_historique(jour_fin, nb_jours):
+    """
+    Sorties journalières des `nb_jours` jours se terminant à `jour_fin`, en une requête sur les cumuls.
+    Renvoie trois tableaux alignés : identifiant produit, indice du jour (0 = le plus ancien), quantité.
+    """
+    import numpy as np
+
+    jour_debut = jour_fin - timedelta(days=nb_jours - 1)
+    lignes = list(
+        CumulMouvements.objects.filter(
+            dimension='produit', periode='jour', date_debut__range=(jour_debut, jour_fin), sorties__gt=0,
+        ).values_list('cle', 'date_debut', 'sorties')
+    )
+    origine = jour_debut.toordinal()
+    cles = np.fromiter((cle for cle, _, _ in lignes), dtype=np.int64, count=len(lignes))
+    jours = np.fromiter((jour.toordinal() - origine for _, jour, _ in lignes), dtype=np.int64, count=len(lignes))
+    sorties = np.fromiter((quantite for _, _, quantite in lignes), dtype=np.float64, count=len(lignes))
+    return cles, jours, sorties
+
+
+def calculer(produit_ids, quantites, cles, jours, sorties, nb_jours, fenetre=FENETRE_JOURS, alpha=ALPHA,
+             delai=DELAI_REAPPRO_JOURS, coefficient=COEFFICIENT_SECURITE, seuil_minimum=SEUIL_MINIMUM):
+    """
+    Indicateurs par produit (tableaux alignés sur `produit_ids`, qui doit être trié).
+    Les jours sans sortie ne figurent pas dans l'historique et comptent pour une demande nulle.
+    """
+    import numpy as np
+
+    nombre = len(produit_ids)
+    indices = np.searchsorted(produit_ids, cles)
+    # Cumuls de produits supprimés depuis : ignorés
+    connus = indices < nombre
+    connus[connus] = produit_ids[indices[connus]] == cles[connus]
+    indices, jours, sorties = indices[connus], jours[connus], sorties[connus]
+
+    fenetre = min(fenetre, nb_jours)
+    recents = jours >= nb_jours - fenetre
+    somme = np.bincount(indices[recents], weights=sorties[recents], minlength=nombre)
+    somme_carres = np.bincount(indices[recents], weights=sorties[recents] ** 2, minlength=nombre)
+    demande_moyenne = somme / fenetre
+    ecart_type = np.sqrt(np.maximum(somme_carres / fenetre - demande_moyenne ** 2, 0))
+
+    # Poids calculé une fois par jour puis indexé : alpha * (1 - alpha) ** âge
+    poids = alpha * (1 - alpha) ** np.arange(nb_jours - 1, -1, -1, dtype=np.float64)
+    demande_lissee = np.bincount(indices, weights=sorties * poids[jours], minlength=nombre)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jours_couverture = np.where(demande_lissee > 0, quantites / demande_lissee, np.nan)
+    point_commande = np.maximum(np.ceil(demande_lissee * delai + coefficient * ecart_type * np.sqrt(delai)), seuil_minimum).astype(np.int64)
+
+    return {
+        'demande_moyenne': demande_moyenne,
+        'demande_lissee': demande_lissee,
+        'ecart_type': ecart_type,
+        'jours_couverture': jours_couverture,
+        'point_commande': point_commande,
+    }
+
+
+def enregistrer(produit_ids, resultats, taille_lot=2000):
+    # Écriture en masse : INSERT ... ON CONFLICT DO UPDATE par lots
+    maintenant = timezone.now()
+    colonnes = zip(
+        produit_ids.tolist(),
+        resultats['demande_moyenne'].tolist(),
+        resultats['demande_lissee'].tolist(),
+        resultats['ecart_type'].tolist(),
+        resultats['jours_couverture'].tolist(),
+        resultats['point_commande'].tolist(),
+    )
+    PrevisionStock.objects.bulk_create(
+        [
+            PrevisionStock(
+                produit_id=produit_id,
+                demande_moyenne=moyenne,
+                demande_lissee=lissee,
+                ecart_type=ecart,
+                jours_couverture=None if couverture != couverture else couverture, # NaN : pas de demande
+                point_commande=point,
+                date_calcul=maintenant,
+            )
+            for produit_id, moyenne, lissee, ecart, couverture, point in colonnes
+        ],
+        batch_size=taille_lot,
+        update_conflicts=True,
+        unique_fields=['produit'],
+        update_fields=['demande_moyenne', 'demande_lissee', 'ecart_type', 'jours_couverture', 'point_commande', 'date_calcul'],
+    )
+
+
+def calculer_previsions(jour_fin=None, nb_jours=HISTORIQUE_JOURS):
+    """
+    Recalcule et enregistre les prévisions de tous les produits.
+    Renvoie le nombre de produits et la durée (secondes) de chaque étape.
+    """
+    jour_fin = jour_fin or timezone.localdate()
+    durees = {}
+    debut = time.perf_counter()
+    produit_ids, quantites = charger_produits()
+    cles, jours, sorties = charger_historique(jour_fin, nb_jours)
+    durees['lecture'] = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    resultats = calculer(produit_ids, quantites, cles, jours, sorties, nb_jours)
+    durees['calcul'] = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    enregistrer(produit_ids, resultats)
+    durees['ecriture'] = time.perf_counter() - debut
+    return len(produit_ids), durees
+
+
+def suggestions():
+    # Prévisions dont le point de commande diffère du seuil actuel, les stocks les plus courts d'abord.
+    # Sans demande sur la fenêtre, pas de suggestion : le seuil du produit est conservé
+    return (
+        PrevisionStock.objects.select_related('produit')
+        .filter(demande_moyenne__gt=0)
+        .exclude(point_commande=F('produit__seuil_alerte_faible'))
+        .order_by(F('jours_couverture').asc(nulls_last=True), 'produit__nom')
+    )
+
+
+def appliquer_suggestions(produit_ids=None, taille_lot=TAILLE_LOT_APPLICATION):
+    """
+    Remplace le seuil d'alerte des produits par leur point de commande suggéré, un UPDATE par lot
+    de `taille_lot` produits. Sans `produit_ids`, toutes les suggestions sont appliquées ; les produits
+    sans demande sur la fenêtre sont ignorés.
+    Renvoie le nombre de produits modifiés.
+    """
+    point_commande = Subquery(PrevisionStock.objects.filter(produit=OuterRef('pk')).values('point_commande')[:1])
+    modifies = 0
+    with transaction.atomic():
+        if produit_ids is None:
+            produit_ids = list(suggestions().order_by().values_list('produit_id', flat=True))
+        for debut in range(0, len(produit_ids), taille_lot):
+            lot = produit_ids[debut:debut + taille_lot]
+            modifies += Produit.objects.filter(pk__in=lot, prevision__demande_moyenne__gt=0).update(seuil_alerte_faible=point_commande)
+            AlerteStock.synchroniser(*lot)
+        # update() n'émet pas de signaux
+        tableau_de_bord.invalider()
+        cache_produits.invalider(*produit_ids)
+        cache_catalogue.invalider('produit')
+    return modifies
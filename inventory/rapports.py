@@ -0,0 +1,177 @@
+# inventory/rapports.py
+"""
+Sélection et pagination des mouvements de stock pour les rapports.
+
+La pagination se fait par curseur (keyset) sur (date_mouvement, id) : chaque page repart de la
+dernière ligne affichée via l'index sur la date, sans OFFSET ni COUNT(*) sur toute la période.
+
+Les rapports et exports lisent la copie en lecture seule de la base (RAPPORTS_BASE_LECTURE) quand
+elle est disponible : leurs longues lectures ne retiennent ni les connexions ni le journal WAL
+de la base principale, où se font les entrées et sorties de stock.
+"""
+
+import base64
+import binascii
+import csv
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import MouvementStock
+from .routeurs import BASE_LECTURE
+
+TAILLE_PAGE = getattr(settings, 'RAPPORT_TAILLE_PAGE', 100)
+TAILLE_PAGE_MAX = getattr(settings, 'RAPPORT_TAILLE_PAGE_MAX', 1000)
+
+REPLIQUE_AGE_MAX = getattr(settings, 'RAPPORTS_REPLIQUE_AGE_MAX', 15 * 60)
+
+# Nombre de lignes lues en base (et écrites dans la réponse) à la fois lors des exports
+TAILLE_LOT_EXPORT = 2000
+
+ENTETE_CSV = ['Date', 'Produit', 'Code Barre', 'Type Mouvement', 'Quantite', 'Raison Mouvement', 'Utilisateur', 'Fournisseur']
+
+TYPES_MOUVEMENT = dict(MouvementStock.TYPE_MOUVEMENT_CHOICES)
+
+
+def age_replique():
+    # Secondes écoulées depuis la dernière copie (None si la copie n'est pas configurée ou n'existe pas)
+    if BASE_LECTURE not in settings.DATABASES:
+        return None
+    try:
+        return time.time() - os.path.getmtime(connections[BASE_LECTURE].settings_dict['NAME'])
+    except (OSError, TypeError):
+        return None
+
+
+def base_de_lecture():
+    """
+    Alias de base à lire pour les rapports : la copie si elle date de moins de REPLIQUE_AGE_MAX secondes,
+    sinon 'default'. Dans une transaction ouverte sur 'default', on y reste pour voir ses propres écritures.
+    """
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    age = age_replique()
+    if age is None or age > REPLIQUE_AGE_MAX:
+        return DEFAULT_DB_ALIAS
+    return BASE_LECTURE
+
+
+def mouvements_filtres(criteres, using=None):
+    """
+    Mouvements correspondant aux critères validés d'un RapportMouvementsForm,
+    lus dans `using` (par défaut base_de_lecture()).
+    """
+    movements = MouvementStock.objects.using(using or base_de_lecture()).select_related('produit', 'utilisateur', 'fournisseur')
+
+    date_debut = criteres.get('date_debut')
+    date_fin = criteres.get('date_fin')
+    produit = criteres.get('produit')
+    type_mouvement = criteres.get('type_mouvement')
+
+    if date_debut:
+        movements = movements.filter(date_mouvement__gte=date_debut)
+    if date_fin:
+        movements = movements.filter(date_mouvement__lt=date_fin + timedelta(days=1))
+    if produit:
+        movements = movements.filter(produit=produit)
+    if type_mouvement:
+        movements = movements.filter(type_mouvement=type_mouvement)
+    return movements
+
+
+def encoder_curseur(mouvement):
+    valeur = f"{mouvement.date_mouvement.isoformat()}|{mouvement.pk}"
+    return base64.urlsafe_b64encode(valeur.encode()).decode()
+
+
+def decoder_curseur(curseur):
+    # Un curseur illisible est ignoré : on repart de la première page
+    try:
+        date_texte, pk = base64.urlsafe_b64decode(curseur.encode()).decode().split('|')
+        return datetime.fromisoformat(date_texte), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def taille_de_page(valeur):
+    try:
+        taille = int(valeur)
+    except (TypeError, ValueError):
+        return TAILLE_PAGE
+    return max(1, min(taille, TAILLE_PAGE_MAX))
+
+
+def page_de_mouvements(movements, apres=None, avant=None, taille=TAILLE_PAGE):
+    """
+    Renvoie (mouvements de la page, curseur de la page précédente, curseur de la page suivante),
+    du plus récent au plus ancien. `apres` et `avant` sont des curseurs déjà décodés.
+    Une ligne de plus que la page est lue pour savoir s'il existe une page au-delà.
+    """
+    if avant:
+        date_mouvement, pk = avant
+        lignes = list(
+            movements.filter(date_mouvement__gte=date_mouvement)
+            .exclude(date_mouvement=date_mouvement, pk__lte=pk)
+            .order_by('date_mouvement', 'pk')[:taille + 1]
+        )
+        encore = len(lignes) > taille
+        lignes = lignes[:taille][::-1]
+        precedent = encoder_curseur(lignes[0]) if encore and lignes else None
+        suivant = encoder_curseur(lignes[-1]) if lignes else None
+        return lignes, precedent, suivant
+
+    if apres:
+        date_mouvement, pk = apres
+        movements = movements.filter(date_mouvement__lte=date_mouvement).exclude(date_mouvement=date_mouvement, pk__gte=pk)
+    lignes = list(movements.order_by('-date_mouvement', '-pk')[:taille + 1])
+    encore = len(lignes) > taille
+    lignes = lignes[:taille]
+    precedent = encoder_curseur(lignes[0]) if apres and lignes else None
+    suivant = encoder_curseur(lignes[-1]) if encore else None
+    return lignes, precedent, suivant
+
+
+def lignes_export(movements, taille_lot=TAILLE_LOT_EXPORT):
+    """
+    Tuples (date, produit, code barre, type, quantité, raison, utilisateur, fournisseur) lus par lots,
+    jointures comprises, sans mettre les instances en cache.
+    """
+    return movements.order_by('-date_mouvement', '-pk').values_list(
+        'date_mouvement', 'produit__nom', 'produit__code_barre', 'type_mouvement', 'quantite',
+        'raison_mouvement', 'utilisateur__username', 'fournisseur__nom',
+    ).iterator(chunk_size=taille_lot)
+
+
+def flux_csv(movements, taille_lot=TAILLE_LOT_EXPORT, sur_progression=None):
+    """
+    Génère le CSV par morceaux de `taille_lot` lignes : la mémoire utilisée ne dépend pas du volume exporté.
+    `sur_progression`, s'il est fourni, reçoit le nombre de lignes écrites après chaque morceau.
+    """
+    numero = 0
+    tampon = io.StringIO()
+    writer = csv.writer(tampon)
+    writer.writerow(ENTETE_CSV)
+    for numero, (date_mouvement, nom, code_barre, type_mouvement, quantite, raison, utilisateur, fournisseur) in enumerate(lignes_export(movements, taille_lot), start=1):
+        writer.writerow([
+            date_mouvement.strftime('%Y-%m-%d %H:%M:%S'),
+            nom,
+            code_barre,
+            TYPES_MOUVEMENT.get(type_mouvement, type_mouvement),
+            quantite,
+            raison or '',
+            utilisateur or 'N/A',
+            fournisseur or '',
+        ])
+        if numero % taille_lot == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate(0)
+            if sur_progression:
+                sur_progression(numero)
+    yield tampon.getvalue()
+    if sur_progression:
+        sur_progression(numero)
@@ -0,0 +1,87 @@
+# inventory/recherche.py
+"""
+Recherche de produits.
+
+Sur SQLite, la recherche passe par l'index plein texte FTS5 inventory_produit_fts (migration 0006) :
+résultats classés par pertinence (bm25) et paginés dans l'index, puis chargés par clé primaire avec
+leur catégorie. Un code-barres exact est servi directement par l'index unique, sans FTS.
+Sur les autres bases, on revient à une recherche icontains.
+"""
+
+import re
+
+from django.db import connection, models
+
+from .models import Produit
+
+TABLE_FTS = 'inventory_produit_fts'
+
+
+def _expression_fts(query):
+    # Chaque mot devient un préfixe entre guillemets : pas d'injection de syntaxe FTS5
+    mots = re.findall(r'\w+', query)
+    return ' '.join(f'"{mot}"*' for mot in mots)
+
+
+class ResultatsFts:
+    """
+    Séquence paresseuse compatible avec Paginator : count() et le découpage interrogent l'index FTS.
+    """
+    def __init__(self, expression):
+        self.expression = expression
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s", [self.expression])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, tranche):
+        if not isinstance(tranche, slice):
+            return self[tranche:tranche + 1][0]
+        debut = tranche.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s ORDER BY bm25({TABLE_FTS}) LIMIT %s OFFSET %s",
+                [self.expression, tranche.stop - debut, debut],
+            )
+            ids = [ligne[0] for ligne in cursor.fetchall()]
+        produits = Produit.objects.select_related('categorie', 'statistiques').in_bulk(ids)
+        return [produits[pk] for pk in ids if pk in produits]
+
+
+def rechercher_produits(query):
+    """
+    Produits correspondant à `query`, sous une forme paginable (QuerySet, liste ou ResultatsFts).
+    """
+    produits = Produit.objects.select_related('categorie', 'statistiques')
+    query = (query or '').strip()
+    if not query:
+        return produits.order_by('nom')
+
+    # Chemin rapide : code-barres exact (lecteur de codes-barres)
+    exact = list(produits.filter(code_barre=query))
+    if exact:
+        return exact
+
+    if connection.vendor == 'sqlite':
+        expression = _expression_fts(query)
+        if not expression:
+            return produits.none()
+        return ResultatsFts(expression)
+
+    return produits.filter(
+        models.Q(nom__icontains=query) |
+        models.Q(code_barre__icontains=query)
+    ).order_by('nom')
+
+
+def autocompleter(query, limite):
+    """
+    Au plus `limite` produits pour un sélecteur à la demande (préfixe de nom, description ou code-barres).
+    """
+    if not (query or '').strip():
+        return []
+    return list(rechercher_produits(query)[:limite])
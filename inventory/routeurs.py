@@ -0,0 +1,34 @@
+# inventory/routeurs.py
+"""
+Routage des bases de données : 'default' reçoit toutes les écritures, la copie des rapports
+(RAPPORTS_BASE_LECTURE) n'est lue que par les requêtes qui la demandent avec using()
+(voir rapports.base_de_lecture()). Elle est produite par sync_report_replica, jamais migrée.
+"""
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+BASE_LECTURE = getattr(settings, 'RAPPORTS_BASE_LECTURE', 'rapports')
+
+
+class RouteurRapports:
+
+    def db_for_read(self, model, **hints):
+        # Pas d'avis : la base de l'instance liée, sinon 'default'
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Même une instance lue dans la copie est enregistrée dans la base principale
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les deux bases contiennent les mêmes lignes
+        bases = {DEFAULT_DB_ALIAS, BASE_LECTURE}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == BASE_LECTURE:
+            return False
+        return None
@@ -0,0 +1,95 @@
+# inventory/signals.py
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import cache_catalogue, cache_produits, droits
+from .models import Categorie, CumulMouvements, Fournisseur, Produit, MouvementStock
+
+
+@receiver([post_save, post_delete], sender=Produit)
+def invalider_cache_produit(sender, instance, **kwargs):
+    cache_produits.invalider(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=MouvementStock)
+def invalider_cache_produit_du_mouvement(sender, instance, **kwargs):
+    cache_produits.invalider(instance.produit_id)
+
+
+@receiver([post_save, post_delete], sender=Produit)
+def invalider_catalogue_produits(sender, **kwargs):
+    cache_catalogue.invalider('produit')
+
+
+@receiver([post_save, post_delete], sender=MouvementStock)
+def invalider_catalogue_mouvements(sender, **kwargs):
+    # Les mouvements changent les quantités et totaux affichés dans la liste des produits ;
+    # ces deux versions invalident aussi le tableau de bord (voir tableau_de_bord.py)
+    cache_catalogue.invalider('produit', 'mouvement')
+
+
+@receiver([post_save, post_delete], sender=Categorie)
+def invalider_catalogue_categories(sender, **kwargs):
+    cache_catalogue.invalider('categorie')
+
+
+@receiver(pre_delete, sender=Categorie)
+def retirer_cumuls_categorie(sender, instance, **kwargs):
+    # Ses produits passent sans catégorie par SET_NULL, qui n'appelle pas Produit.save()
+    CumulMouvements.retirer_categorie(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Fournisseur)
+def invalider_catalogue_fournisseurs(sender, **kwargs):
+    cache_catalogue.invalider('fournisseur')
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalider_droits_utilisateur(sender, instance, **kwargs):
+    droits.invalider(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalider_catalogue_utilisateur(sender, **kwargs):
+    # Ses mouvements passent sans utilisateur par SET_NULL, qui n'émet pas de signal
+    cache_catalogue.invalider('mouvement')
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalider_droits_membres(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        droits.invalider(instance.pk)
+    elif pk_set:
+        # group.user_set.add(...) : pk_set contient les utilisateurs concernés
+        droits.invalider(*pk_set)
+    else:
+        # Vidage depuis le groupe ou la permission : utilisateurs concernés inconnus
+        droits.invalider_tout()
+
+
+@receiver([post_save, post_delete], sender=Group)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalider_droits_groupes(sender, action=None, **kwargs):
+    # Nom, permissions ou suppression d'un groupe : tous ses membres sont concernés
+    if action in (None, 'post_add', 'post_remove', 'post_clear'):
+        droits.invalider_tout()
+
+
+@receiver(connection_created)
+def configurer_sqlite(sender, connection, **kwargs):
+    # Réglages de chaque connexion SQLite (WAL, attente des verrous, ...), lus dans SQLITE_PRAGMAS,
+    # ou dans SQLITE_PRAGMAS_RAPPORTS pour la copie en lecture seule des rapports
+    if connection.vendor != 'sqlite':
+        return
+    if connection.alias == getattr(settings, 'RAPPORTS_BASE_LECTURE', None):
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS_RAPPORTS', {})
+    else:
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    for nom, valeur in pragmas.items():
+        connection.connection.execute(f"PRAGMA {nom} = {valeur}")
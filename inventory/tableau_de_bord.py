@@ -0,0 +1,65 @@
+# inventory/tableau_de_bord.py
+"""
+Indicateurs de la page d'accueil, calculés par quelques requêtes agrégées et conservés en cache.
+Les compteurs d'alertes viennent de la table des alertes ouvertes (AlerteStock).
+
+Les indicateurs sont gardés dans le cache du processus, sous une clé qui contient les versions partagées
+des produits et des mouvements (cache_catalogue) : toute écriture sur les produits ou les mouvements,
+y compris depuis une commande de gestion, les invalide dans tous les processus sans rien écrire de plus.
+La clé contient aussi la date du jour pour que la fenêtre "dernier mois" reste juste.
+"""
+
+from datetime import datetime, time
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import cache_catalogue
+from .models import AlerteStock, Produit, MouvementStock
+
+DUREE_CACHE = getattr(settings, 'TABLEAU_DE_BORD_CACHE_TIMEOUT', 300)
+
+# Versions du catalogue dont dépendent les indicateurs (les alertes suivent les produits)
+VERSIONS = ('produit', 'mouvement')
+
+
+def _cle_cache():
+    versions = '.'.join(str(version) for version in cache_catalogue.versions(*VERSIONS))
+    return f"inventory:tableau_de_bord:{timezone.localdate().isoformat()}:{versions}"
+
+
+def calculer():
+    compteurs = {'total_products': Produit.objects.count()}
+    # Compteurs d'alertes lus dans la table des alertes ouvertes, sans parcourir les produits
+    compteurs.update(AlerteStock.ouvertes().aggregate(
+        total_low_stock_products=Count('pk', filter=Q(etat='faible')),
+        total_out_of_stock_products=Count('pk', filter=Q(etat='rupture')),
+    ))
+
+    one_month_ago = timezone.make_aware(datetime.combine(timezone.localdate() - relativedelta(months=1), time.min))
+    compteurs.update(MouvementStock.objects.filter(date_mouvement__gte=one_month_ago).aggregate(
+        total_in_last_month=Coalesce(Sum('quantite', filter=Q(type_mouvement='entree')), 0),
+        total_out_last_month=Coalesce(Sum('quantite', filter=Q(type_mouvement='sortie')), 0),
+    ))
+
+    compteurs['low_stock_products'] = list(
+        Produit.objects.filter(alertes__date_fermeture__isnull=True, alertes__etat='faible')
+        .only('nom', 'quantite_actuelle', 'seuil_alerte_faible').order_by('nom')
+    )
+    compteurs['recent_movements'] = list(
+        MouvementStock.objects.select_related('produit', 'utilisateur').order_by('-date_mouvement')[:5]
+    )
+    return compteurs
+
+
+def obtenir():
+    return cache.get_or_set(_cle_cache(), calculer, DUREE_CACHE)
+
+
+def invalider():
+    # Pour les écritures qui n'émettent pas de signaux (update(), SQL direct) ; regroupé avec les autres versions
+    cache_catalogue.invalider(*VERSIONS)
@@ -0,0 +1,114 @@
+# inventory/taches.py
+"""
+Exécution des tâches d'export (TacheExport) hors du cycle requête/réponse.
+
+Les vues créent les tâches, la commande run_export_worker les réclame et les confie à un pool de
+processus. Chaque tâche écrit son fichier dans EXPORTS_DIR et enregistre sa progression.
+Les tâches terminées ou en échec depuis plus de EXPORTS_RETENTION_JOURS sont supprimées avec leur
+fichier (purger()), à chaque passage de maintenance du worker.
+"""
+
+import logging
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import export_pdf, rapports
+from .forms import RapportMouvementsForm
+from .models import TacheExport
+
+DOSSIER_EXPORTS = Path(getattr(settings, 'EXPORTS_DIR', settings.BASE_DIR / 'exports'))
+RETENTION = timedelta(days=getattr(settings, 'EXPORTS_RETENTION_JOURS', 7))
+
+# Délai minimal (secondes) entre deux enregistrements de la progression d'une tâche
+INTERVALLE_PROGRESSION = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+def criteres_de_requete(form, mode=''):
+    """
+    Critères validés d'un RapportMouvementsForm sous forme JSON stable (stockage et déduplication).
+    """
+    data = form.cleaned_data
+    return {
+        'date_debut': data['date_debut'].isoformat() if data.get('date_debut') else '',
+        'date_fin': data['date_fin'].isoformat() if data.get('date_fin') else '',
+        'produit': data['produit'].pk if data.get('produit') else '',
+        'type_mouvement': data.get('type_mouvement') or '',
+        'mode': mode,
+    }
+
+
+class _SuiviProgression:
+
+    def __init__(self, pk):
+        self.pk = pk
+        self.dernier_enregistrement = 0
+
+    def __call__(self, lignes):
+        maintenant = time.monotonic()
+        if maintenant - self.dernier_enregistrement >= INTERVALLE_PROGRESSION:
+            TacheExport.objects.filter(pk=self.pk).update(lignes_traitees=lignes)
+            self.dernier_enregistrement = maintenant
+
+
+def purger(retention=RETENTION):
+    """
+    Supprime les tâches terminées ou en échec depuis plus de `retention`, leur fichier et les fichiers
+    partiels abandonnés. Renvoie le nombre de tâches supprimées.
+    """
+    limite = timezone.now() - retention
+    anciennes = TacheExport.objects.filter(statut__in=['terminee', 'echec'], date_fin__lt=limite)
+    for chemin in anciennes.exclude(fichier='').values_list('fichier', flat=True):
+        Path(chemin).unlink(missing_ok=True)
+    if DOSSIER_EXPORTS.is_dir():
+        for partiel in DOSSIER_EXPORTS.glob('*.part'):
+            if partiel.stat().st_mtime < limite.timestamp():
+                partiel.unlink(missing_ok=True)
+    return anciennes.delete()[0]
+
+
+def initialiser_processus():
+    # Les connexions héritées du processus parent ne doivent pas être partagées
+    connections.close_all()
+
+
+def executer_tache(pk):
+    tache = TacheExport.objects.get(pk=pk)
+    try:
+        form = RapportMouvementsForm(tache.criteres)
+        if not form.is_valid():
+            raise ValueError(form.errors.as_text())
+        movements = rapports.mouvements_filtres(form.cleaned_data)
+        lignes_total = movements.order_by().count()
+        TacheExport.objects.filter(pk=pk).update(lignes_total=lignes_total)
+
+        DOSSIER_EXPORTS.mkdir(parents=True, exist_ok=True)
+        chemin = DOSSIER_EXPORTS / f"rapport_mouvements_{tache.pk}.{tache.format}"
+        # Écriture dans un fichier partiel renommé à la fin : un fichier présent est toujours complet
+        partiel = chemin.with_name(chemin.name + '.part')
+        suivi = _SuiviProgression(pk)
+        if tache.format == 'csv':
+            with open(partiel, 'w', newline='', encoding='utf-8') as fichier:
+                for morceau in rapports.flux_csv(movements, sur_progression=suivi):
+                    fichier.write(morceau)
+        else:
+            resume = True if tache.criteres.get('mode') == 'resume' else None
+            export_pdf.ecrire_pdf(str(partiel), movements, form.cleaned_data, resume=resume, sur_progression=suivi)
+        os.replace(partiel, chemin)
+
+        TacheExport.objects.filter(pk=pk).update(
+            statut='terminee', fichier=str(chemin), lignes_traitees=lignes_total, date_fin=timezone.now(),
+        )
+    except Exception as e:
+        logger.exception("Échec de la tâche d'export %s", pk)
+        TacheExport.objects.filter(pk=pk).update(statut='echec', erreur=str(e), date_fin=timezone.now())
+    finally:
+        connections.close_all()
+    return pk
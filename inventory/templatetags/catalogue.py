@@ -0,0 +1,37 @@
+from django import template
+
+from inventory import cache_catalogue
+
+register = template.Library()
+
+
+class FragmentCatalogueNode(template.Node):
+
+    def __init__(self, nodelist, cle):
+        self.nodelist = nodelist
+        self.cle = cle
+
+    def render(self, context):
+        cle = self.cle.resolve(context)
+        # Sans clé (vue qui ne la fournit pas), le fragment est rendu normalement
+        if not cle:
+            return self.nodelist.render(context)
+        contenu = cache_catalogue.lire(cle)
+        if contenu is None:
+            contenu = self.nodelist.render(context)
+            cache_catalogue.ecrire(cle, contenu)
+        return contenu
+
+
+@register.tag
+def fragment_catalogue(parser, token):
+    """
+    {% fragment_catalogue cle %} ... {% endfragment_catalogue %} : le contenu est servi depuis le cache
+    sous la clé calculée par la vue avec cache_catalogue.cle() (versions des modèles, droits, page).
+    """
+    morceaux = token.split_contents()
+    if len(morceaux) != 2:
+        raise template.TemplateSyntaxError(f"'{morceaux[0]}' attend un seul argument : la clé du fragment.")
+    nodelist = parser.parse(('endfragment_catalogue',))
+    parser.delete_first_token()
+    return FragmentCatalogueNode(nodelist, parser.compile_filter(morceaux[1]))
@@ -1,3 +1,1482 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import AnonymousUser, Group, Permission, User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.db.models import F, Q, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .forms import MouvementStockForm
+from .models import AlerteStock, Categorie, CumulMouvements, Fournisseur, PrevisionStock, Produit, MouvementStock, StatistiquesProduit, StockInsuffisant, StockJournalier, TacheExport
+from . import cache_catalogue, cache_produits, checks, droits, export_pdf, importation, instrumentation, previsions, rapports, tableau_de_bord, taches, views
+from .importation import importer_mouvements, lire_csv
+
+
+def creer_produit(code_barre='0001', quantite=0, nom_produit=None, **kwargs):
+    produit = Produit.objects.create(nom=nom_produit or f"Produit {code_barre}", code_barre=code_barre, prix_unitaire='1.00', **kwargs)
+    if quantite:
+        MouvementStock.objects.create(produit=produit, type_mouvement='entree', quantite=quantite)
+        produit.refresh_from_db()
+    return produit
+
+
+def executer_ou_planter(pk):
+    # Tâche d'export dont le processus s'arrête brutalement pour les PDF (worker d'export)
+    if TacheExport.objects.get(pk=pk).format == 'pdf':
+        os._exit(1)
+    return taches.executer_tache(pk)
+
+
+def solde_du_grand_livre(produit):
+    totaux = {
+        row['type_mouvement']: row['total']
+        for row in MouvementStock.objects.filter(produit=produit).values('type_mouvement').annotate(total=Sum('quantite'))
+    }
+    return totaux.get('entree', 0) - totaux.get('sortie', 0)
+
+
+class MouvementStockTests(TestCase):
+
+    def test_entree_et_sortie_mettent_a_jour_la_quantite(self):
+        produit = creer_produit(quantite=10)
+        MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=4)
+        produit.refresh_from_db()
+        self.assertEqual(produit.quantite_actuelle, 6)
+
+    def test_sortie_superieure_au_stock_est_refusee(self):
+        produit = creer_produit(quantite=3)
+        with self.assertRaises(StockInsuffisant):
+            MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=4)
+        produit.refresh_from_db()
+        self.assertEqual(produit.quantite_actuelle, 3)
+        self.assertEqual(MouvementStock.objects.filter(type_mouvement='sortie').count(), 0)
+
+    def test_base_refuse_un_stock_negatif(self):
+        produit = creer_produit()
+        with self.assertRaises(IntegrityError):
+            Produit.objects.filter(pk=produit.pk).update(quantite_actuelle=-1)
+
+    def test_enregistrement_sans_select_ni_sauvegarde_complete(self):
+        produit = creer_produit(quantite=5)
+        # Un UPDATE conditionnel sur le produit et un INSERT du mouvement, sans SELECT ni sauvegarde complète
+        with CaptureQueriesContext(connection) as requetes:
+            MouvementStock(produit_id=produit.pk, type_mouvement='sortie', quantite=1).save()
+        sql = [q['sql'] for q in requetes.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertTrue(sql[0].startswith('UPDATE "inventory_produit" SET "quantite_actuelle"'))
+        self.assertTrue(sql[1].startswith('INSERT INTO "inventory_mouvementstock"'))
+        self.assertFalse([q for q in sql if q.startswith('SELECT')])
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "inventory_produit"')]), 1)
+
+    def test_suppression_annule_le_mouvement(self):
+        produit = creer_produit(quantite=5)
+        mouvement = MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=2)
+        mouvement.delete()
+        produit.refresh_from_db()
+        self.assertEqual(produit.quantite_actuelle, 5)
+
+    def test_modification_du_produit_ne_touche_pas_la_quantite(self):
+        produit = creer_produit(quantite=5)
+        obsolete = Produit.objects.get(pk=produit.pk)
+        MouvementStock.objects.create(produit=produit, type_mouvement='entree', quantite=7)
+        obsolete.nom = "Renommé"
+        obsolete.save()
+        produit.refresh_from_db()
+        self.assertEqual(produit.quantite_actuelle, 12)
+
+    def test_vue_sortie_refuse_stock_insuffisant(self):
+        produit = creer_produit(quantite=2)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        response = self.client.post(reverse('stock_out'), {'produit': produit.pk, 'quantite': 5})
+        self.assertEqual(response.status_code, 200)
+        produit.refresh_from_db()
+        self.assertEqual(produit.quantite_actuelle, 2)
+
+
+class ImportMouvementsTests(TestCase):
+
+    def setUp(self):
+        self.produit_a = creer_produit('A')
+        self.produit_b = creer_produit('B')
+
+    def _fichier(self, contenu, suffixe):
+        fichier = tempfile.NamedTemporaryFile('w', suffix=suffixe, delete=False, encoding='utf-8')
+        fichier.write(contenu)
+        fichier.close()
+        self.addCleanup(os.remove, fichier.name)
+        return fichier.name
+
+    def test_commande_importe_un_csv_par_lots(self):
+        chemin = self._fichier(
+            "code_barre,type_mouvement,quantite,raison_mouvement\n"
+            "A,entree,10,Réception\nB,entree,5,\nA,sortie,3,Vente\n", '.csv')
+        call_command('import_movements', chemin, '--taille-lot', '2', stdout=io.StringIO())
+        self.produit_a.refresh_from_db()
+        self.produit_b.refresh_from_db()
+        self.assertEqual(self.produit_a.quantite_actuelle, 7)
+        self.assertEqual(self.produit_b.quantite_actuelle, 5)
+        self.assertEqual(MouvementStock.objects.count(), 3)
+
+    def test_lot_invalide_arrete_l_import_sans_total_partiel(self):
+        chemin = self._fichier(
+            '{"code_barre": "A", "type_mouvement": "entree", "quantite": 4}\n'
+            '{"code_barre": "A", "type_mouvement": "entree", "quantite": 6}\n'
+            '{"code_barre": "B", "type_mouvement": "entree", "quantite": 2}\n'
+            '{"code_barre": "B", "type_mouvement": "sortie", "quantite": 9}\n', '.jsonl')
+        with self.assertRaises(CommandError):
+            call_command('import_movements', chemin, '--taille-lot', '2', stdout=io.StringIO())
+        for produit in (self.produit_a, self.produit_b):
+            produit.refresh_from_db()
+            self.assertEqual(produit.quantite_actuelle, solde_du_grand_livre(produit))
+        self.assertEqual(self.produit_a.quantite_actuelle, 10)
+        self.assertEqual(self.produit_b.quantite_actuelle, 0)
+
+    def test_une_mise_a_jour_par_produit_et_par_lot(self):
+        lignes = lire_csv(io.StringIO("code_barre,type_mouvement,quantite\n" + "A,entree,1\nB,entree,2\n" * 50))
+        with CaptureQueriesContext(connection) as requetes:
+            importer_mouvements(lignes)
+        updates = [q for q in requetes.captured_queries if q['sql'].startswith('UPDATE "inventory_produit"')]
+        self.assertEqual(len(updates), 2)
+        self.produit_b.refresh_from_db()
+        self.assertEqual(self.produit_b.quantite_actuelle, 100)
+
+    def test_endpoint_jsonl(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        corps = '{"code_barre": "B", "type_mouvement": "entree", "quantite": 8}\n'
+        response = self.client.post(reverse('import_movements'), corps, content_type='application/x-ndjson')
+        self.assertEqual(response.json(), {'lignes_importees': 1})
+        response = self.client.post(reverse('import_movements'), '{"code_barre": "Z"}', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['ligne'], 1)
+
+
+    def test_endpoint_csv_windows_1252(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        contenu = "code_barre,type_mouvement,quantite,raison_mouvement\nB,entree,4,Réception été\n".encode('cp1252')
+        fichier = SimpleUploadedFile('export_excel.csv', contenu, content_type='text/csv')
+        response = self.client.post(reverse('import_movements'), {'fichier': fichier})
+        self.assertEqual(response.json(), {'lignes_importees': 1})
+        self.assertEqual(MouvementStock.objects.get(produit=self.produit_b).raison_mouvement, "Réception été")
+
+    def test_endpoint_encodage_inconnu(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        corps = b'code_barre,type_mouvement,quantite\nB,entree,\x81\n'
+        response = self.client.post(reverse('import_movements'), corps, content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Encodage', response.json()['erreur'])
+
+class DocumentStockTests(TestCase):
+
+    def setUp(self):
+        self.produits = [creer_produit(f'D{i:03d}', quantite=5) for i in range(40)]
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+
+    def _poster(self, document):
+        return self.client.post(reverse('stock_document'), document, content_type='application/json')
+
+    def test_reception_multi_lignes_en_requetes_constantes(self):
+        lignes = [{'code_barre': p.code_barre, 'quantite': 2} for p in self.produits]
+        with CaptureQueriesContext(connection) as requetes:
+            response = self._poster({'type_mouvement': 'entree', 'lignes': lignes})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'mouvements_enregistres': 40})
+        sql = [q['sql'] for q in requetes.captured_queries]
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "inventory_produit"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "inventory_mouvementstock"')]), 1)
+        for produit in Produit.objects.filter(code_barre__startswith='D'):
+            self.assertEqual(produit.quantite_actuelle, 7)
+            self.assertEqual(produit.quantite_actuelle, solde_du_grand_livre(produit))
+
+    def test_sortie_insuffisante_refuse_tout_le_document(self):
+        lignes = [
+            {'code_barre': 'D000', 'quantite': 3},
+            {'code_barre': 'D001', 'quantite': 6},
+            {'code_barre': 'D000', 'quantite': 3},
+        ]
+        response = self._poster({'type_mouvement': 'sortie', 'lignes': lignes})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['ligne'], 1)
+        self.assertIn('ligne 2', response.json()['erreur'])
+        self.assertEqual(MouvementStock.objects.filter(type_mouvement='sortie').count(), 0)
+        self.assertEqual(set(Produit.objects.values_list('quantite_actuelle', flat=True)), {5})
+
+    def test_produit_supprime_apres_validation(self):
+        preparer_lot = importation.preparer_lot
+
+        def preparer_puis_supprimer(*args, **kwargs):
+            resultat = preparer_lot(*args, **kwargs)
+            Produit.objects.filter(code_barre='D001').delete()
+            return resultat
+
+        lignes = [{'code_barre': 'D000', 'quantite': 1}, {'code_barre': 'D001', 'quantite': 1}]
+        with mock.patch.object(importation, 'preparer_lot', preparer_puis_supprimer):
+            response = self._poster({'type_mouvement': 'sortie', 'lignes': lignes})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['ligne'], 2)
+        self.assertEqual(MouvementStock.objects.filter(type_mouvement='sortie').count(), 0)
+
+    def test_ajuster_stocks_n_applique_rien_si_un_produit_manque(self):
+        a, b = self.produits[:2]
+        with self.assertRaises(StockInsuffisant) as contexte:
+            Produit.ajuster_stocks({a.pk: 4, b.pk: -9})
+        self.assertEqual(contexte.exception.produit_id, b.pk)
+        a.refresh_from_db()
+        self.assertEqual(a.quantite_actuelle, 5)
+
+
+class StockJournalierTests(TestCase):
+
+    def setUp(self):
+        self.produit = creer_produit()
+        self.aujourd_hui = timezone.localdate()
+
+    def _mouvement(self, type_mouvement, quantite, jours_avant):
+        mouvement = MouvementStock.objects.create(produit=self.produit, type_mouvement=type_mouvement, quantite=quantite)
+        MouvementStock.objects.filter(pk=mouvement.pk).update(date_mouvement=timezone.now() - timedelta(days=jours_avant))
+        mouvement.refresh_from_db()
+        return mouvement
+
+    def _points_de_controle(self):
+        return list(StockJournalier.objects.filter(produit=self.produit).order_by('date').values_list('date', 'quantite_cloture'))
+
+    def test_mise_a_jour_incrementale_identique_a_la_reconstruction(self):
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=10)
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=3)
+        incremental = self._points_de_controle()
+        self.assertEqual(incremental, [(self.aujourd_hui, 7)])
+        call_command('backfill_stock_journalier', stdout=io.StringIO())
+        self.assertEqual(self._points_de_controle(), incremental)
+
+    def test_stock_a_date_apres_reconstruction(self):
+        self._mouvement('entree', 10, jours_avant=5)
+        self._mouvement('sortie', 4, jours_avant=3)
+        self._mouvement('entree', 2, jours_avant=1)
+        call_command('backfill_stock_journalier', stdout=io.StringIO())
+        self.assertEqual(StockJournalier.quantite_au(self.produit.pk, self.aujourd_hui - timedelta(days=6)), 0)
+        self.assertEqual(StockJournalier.quantite_au(self.produit.pk, self.aujourd_hui - timedelta(days=4)), 10)
+        self.assertEqual(StockJournalier.quantite_au(self.produit.pk, self.aujourd_hui - timedelta(days=2)), 6)
+        self.assertEqual(StockJournalier.quantite_au(self.produit.pk, self.aujourd_hui), 8)
+
+    def test_suppression_d_un_ancien_mouvement_decale_les_clotures_suivantes(self):
+        self._mouvement('entree', 10, jours_avant=5)
+        sortie = self._mouvement('sortie', 4, jours_avant=3)
+        call_command('backfill_stock_journalier', stdout=io.StringIO())
+        sortie.delete()
+        self.assertEqual(StockJournalier.quantite_au(self.produit.pk, self.aujourd_hui - timedelta(days=4)), 10)
+        self.assertEqual(StockJournalier.quantite_au(self.produit.pk, self.aujourd_hui - timedelta(days=2)), 10)
+
+    def test_vue_stock_a_date(self):
+        self._mouvement('entree', 10, jours_avant=5)
+        call_command('backfill_stock_journalier', stdout=io.StringIO())
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=1)
+        self.client.force_login(User.objects.create_user('employe', password='x'))
+        jour = self.aujourd_hui - timedelta(days=2)
+        response = self.client.get(reverse('stock_at_date'), {'date': jour.isoformat()})
+        self.assertEqual([p.quantite_a_date for p in response.context['products']], [10])
+
+    def test_vue_stock_a_date_paginee(self):
+        for i in range(2):
+            creer_produit(f'PAGE{i}', nom_produit=f'Zz {i}')
+        self.client.force_login(User.objects.create_user('employe', password='x'))
+        with mock.patch.object(views, 'PRODUITS_PAR_PAGE', 2):
+            response = self.client.get(reverse('stock_at_date'), {'date': self.aujourd_hui.isoformat(), 'page': 2})
+        self.assertEqual([p.nom for p in response.context['products']], ['Zz 1'])
+        self.assertContains(response, f'?date={self.aujourd_hui.isoformat()}&page=1')
+
+
+class PlansDeRequeteTests(TestCase):
+    """
+    Les requêtes fréquentes sur le grand livre et les alertes doivent passer par un index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        produit = creer_produit(quantite=5)
+        MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=1)
+        cls.produit = produit
+        cls.depuis = timezone.now() - timedelta(days=30)
+
+    def _plan(self, queryset):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Analyse de plan écrite pour SQLite.")
+        plan = queryset.explain()
+        table = queryset.model._meta.db_table
+        return plan, table, re.findall(rf'^.*\bSCAN {table}\b.*$', plan, re.MULTILINE)
+
+    def assertUtiliseUnIndex(self, queryset, index):
+        # Recherche dans l'index attendu ; tout SCAN, même 'USING INDEX' (index parcouru en entier), est refusé
+        plan, table, parcours = self._plan(queryset)
+        self.assertEqual(parcours, [], f"Parcours détecté :\n{plan}")
+        self.assertRegex(plan, rf'SEARCH {table} USING (COVERING )?INDEX {index}\b', f"Index {index} non utilisé :\n{plan}")
+
+    def assertParcourtUnIndexBorne(self, queryset, index):
+        # Seul parcours accepté : celui d'un index partiel (limité aux lignes cherchées) ou arrêté par un LIMIT
+        partiel = any(i.name == index and i.condition is not None for i in queryset.model._meta.indexes)
+        self.assertTrue(partiel or queryset.query.high_mark is not None, f"Parcours de {index} non borné.")
+        plan, table, parcours = self._plan(queryset)
+        self.assertEqual(len(parcours), 1, f"Parcours détecté :\n{plan}")
+        self.assertRegex(parcours[0], rf'SCAN {table} USING (COVERING )?INDEX {index}$', plan)
+
+    def test_parcours_d_index_refuse(self):
+        with self.assertRaises(AssertionError):
+            self.assertUtiliseUnIndex(MouvementStock.objects.filter(quantite=3), 'mouvement_date_idx')
+        with self.assertRaises(AssertionError):
+            self.assertUtiliseUnIndex(MouvementStock.objects.order_by('-date_mouvement'), 'mouvement_date_idx')
+        with self.assertRaises(AssertionError):
+            self.assertParcourtUnIndexBorne(MouvementStock.objects.order_by('-date_mouvement'), 'mouvement_date_idx')
+
+    def test_totaux_mensuels_par_type(self):
+        self.assertUtiliseUnIndex(
+            MouvementStock.objects.filter(date_mouvement__gte=self.depuis, type_mouvement='entree').values_list('quantite'),
+            'mouvement_type_date_idx',
+        )
+
+    def test_mouvements_recents(self):
+        self.assertParcourtUnIndexBorne(MouvementStock.objects.order_by('-date_mouvement')[:5], 'mouvement_date_idx')
+
+    def test_rapport_par_periode(self):
+        self.assertUtiliseUnIndex(
+            MouvementStock.objects.filter(date_mouvement__gte=self.depuis, date_mouvement__lt=timezone.now()).order_by('-date_mouvement'),
+            'mouvement_date_idx',
+        )
+
+    def test_rapport_par_produit(self):
+        self.assertUtiliseUnIndex(
+            MouvementStock.objects.filter(produit=self.produit, date_mouvement__gte=self.depuis).order_by('-date_mouvement'),
+            'mouvement_produit_date_idx',
+        )
+
+    def test_rapport_par_type(self):
+        self.assertUtiliseUnIndex(MouvementStock.objects.filter(type_mouvement='sortie').order_by('-date_mouvement'), 'mouvement_type_date_idx')
+
+    def test_page_suivante_du_rapport(self):
+        maintenant = timezone.now()
+        self.assertUtiliseUnIndex(
+            MouvementStock.objects.filter(date_mouvement__lte=maintenant).exclude(date_mouvement=maintenant, pk__gte=10)
+            .order_by('-date_mouvement', '-pk')[:101],
+            'mouvement_date_idx',
+        )
+
+    def test_produits_en_alerte(self):
+        # La condition compare deux colonnes : l'index partiel ne contient que les produits en alerte
+        self.assertParcourtUnIndexBorne(Produit.objects.filter(quantite_actuelle__lte=F('seuil_alerte_faible')).order_by('nom'), 'produit_stock_faible_idx')
+        self.assertParcourtUnIndexBorne(
+            Produit.objects.filter(quantite_actuelle__lte=F('seuil_alerte_faible'), quantite_actuelle__gt=0).order_by('nom'),
+            'produit_stock_faible_idx',
+        )
+
+    def test_produits_en_rupture(self):
+        self.assertUtiliseUnIndex(Produit.objects.filter(quantite_actuelle=0), 'produit_quantite_idx')
+
+
+class TableauDeBordTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('employe', password='x'))
+
+    def test_compteurs_et_totaux_du_mois(self):
+        creer_produit('A', quantite=5)
+        creer_produit('B')
+        produit = creer_produit('C', quantite=50)
+        MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=8)
+        context = self.client.get(reverse('home')).context
+        self.assertEqual(context['total_products'], 3)
+        self.assertEqual(context['total_low_stock_products'], 1)
+        self.assertEqual(context['total_out_of_stock_products'], 1)
+        self.assertEqual(context['total_in_last_month'], 55)
+        self.assertEqual(context['total_out_last_month'], 8)
+
+    def test_page_servie_depuis_le_cache(self):
+        produit = creer_produit(quantite=5)
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get(reverse('home'))
+        self.assertFalse([q for q in requetes.captured_queries if 'inventory_' in q['sql']])
+        # Gardé dans le cache du processus : rien n'est écrit dans le cache partagé
+        self.assertFalse([q for q in requetes.captured_queries if 'cache_partage' in q['sql'] and 'SELECT' not in q['sql']])
+        self.assertIsNotNone(cache.get(tableau_de_bord._cle_cache()))
+
+        # Une écriture sur le grand livre invalide le cache
+        with self.captureOnCommitCallbacks(execute=True):
+            MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=5)
+        context = self.client.get(reverse('home')).context
+        self.assertEqual(context['total_out_of_stock_products'], 1)
+        self.assertEqual(context['total_out_last_month'], 5)
+
+
+class PaginationRapportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.produit = creer_produit(quantite=100)
+        for _ in range(11):
+            MouvementStock.objects.create(produit=cls.produit, type_mouvement='sortie', quantite=1)
+        # Dates identiques pour vérifier le départage par id
+        MouvementStock.objects.update(date_mouvement=timezone.now())
+        cls.admin = User.objects.create_superuser('admin', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _page(self, url='', **parametres):
+        return self.client.get(reverse('report_generation') + url, {'taille': 5, **parametres} if not url else None).context
+
+    def test_parcours_complet_sans_doublon_et_retour(self):
+        attendus = list(MouvementStock.objects.order_by('-date_mouvement', '-pk').values_list('pk', flat=True))
+        vus = []
+        context = self._page(type_mouvement='')
+        pages = [context]
+        while True:
+            vus += [m.pk for m in context['movements']]
+            if not context['page_suivante_url']:
+                break
+            context = self._page(context['page_suivante_url'])
+            pages.append(context)
+        self.assertEqual(vus, attendus)
+
+        # La page précédente de la dernière page redonne l'avant-dernière
+        precedente = self._page(pages[-1]['page_precedente_url'])
+        self.assertEqual([m.pk for m in precedente['movements']], [m.pk for m in pages[-2]['movements']])
+
+    def test_cout_constant_sans_offset_ni_count(self):
+        premiere = self._page(type_mouvement='sortie')
+        with CaptureQueriesContext(connection) as requetes:
+            self._page(premiere['page_suivante_url'])
+        sql = [q['sql'] for q in requetes.captured_queries if 'inventory_mouvementstock' in q['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn('OFFSET', sql[0])
+        self.assertNotIn('COUNT(', sql[0])
+
+
+class ExportCsvTests(TestCase):
+
+    def test_export_en_flux_en_une_requete(self):
+        admin = User.objects.create_superuser('admin', password='x')
+        produit = creer_produit(quantite=10)
+        for _ in range(5):
+            MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=1, utilisateur=admin)
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('export_movements_csv'), {'type_mouvement': 'sortie'})
+            contenu = b''.join(response.streaming_content).decode()
+        self.assertTrue(response.streaming)
+        self.assertEqual(len([q for q in requetes.captured_queries if 'inventory_mouvementstock' in q['sql']]), 1)
+        lignes = contenu.splitlines()
+        self.assertEqual(lignes[0], 'Date,Produit,Code Barre,Type Mouvement,Quantite,Raison Mouvement,Utilisateur,Fournisseur')
+        self.assertEqual(len(lignes), 6)
+        self.assertTrue(lignes[1].endswith(',Produit 0001,0001,sortie,1,,admin,'))
+
+
+class ExportPdfTests(TestCase):
+
+    def setUp(self):
+        produit = creer_produit(quantite=100)
+        for _ in range(80):
+            MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=1)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+
+    def _pdf(self, **parametres):
+        response = self.client.get(reverse('export_movements_pdf'), parametres)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        return b''.join(response.streaming_content)
+
+    def test_detail_sur_plusieurs_pages(self):
+        contenu = self._pdf()
+        self.assertTrue(contenu.startswith(b'%PDF'))
+        self.assertGreaterEqual(contenu.count(b'/Type /Page\n'), 3)
+
+    def test_tableaux_produits_au_fil_de_la_mise_en_page(self):
+        mis_en_page = []
+        progression = []
+        ajouter = export_pdf.Frame.add
+
+        def compter(cadre, flowable, toile, trySplit=0):
+            place = ajouter(cadre, flowable, toile, trySplit=trySplit)
+            if place:
+                mis_en_page.append(flowable)
+            return place
+
+        with mock.patch.object(export_pdf, 'LIGNES_PAR_TABLEAU', 5), \
+                mock.patch.object(export_pdf.Frame, 'add', compter):
+            pages = export_pdf.ecrire_pdf(
+                io.BytesIO(), MouvementStock.objects.all(), {}, resume=False,
+                sur_progression=lambda lignes: progression.append((lignes, len(mis_en_page))),
+            )
+        # 16 tableaux, chacun demandé seulement après la mise en page du précédent
+        self.assertEqual([lignes for lignes, _ in progression[:-1]], list(range(5, 81, 5)))
+        deja_mis_en_page = [nombre for _, nombre in progression[:-1]]
+        self.assertEqual(deja_mis_en_page, sorted(set(deja_mis_en_page)))
+        self.assertGreaterEqual(pages, 3)
+
+    def test_nom_de_produit_echappe(self):
+        produit = creer_produit('PDF&1', nom_produit='Thé & <b>Café', quantite=3)
+        MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=1)
+        contenu = self._pdf(produit=produit.pk)
+        self.assertTrue(contenu.startswith(b'%PDF'))
+
+    def test_resume_au_dela_du_plafond(self):
+        with mock.patch.object(export_pdf, 'LIGNES_MAX', 10):
+            contenu = self._pdf()
+        self.assertTrue(contenu.startswith(b'%PDF'))
+        self.assertEqual(contenu.count(b'/Type /Page\n'), 1)
+
+
+class TachesExportTests(TransactionTestCase):
+    # Hors transaction, les exports lisent la copie des rapports (miroir de la base de test)
+    databases = {'default', 'rapports'}
+
+    def setUp(self):
+        produit = creer_produit(quantite=10)
+        MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=3)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        patch = mock.patch.object(taches, 'DOSSIER_EXPORTS', Path(dossier.name))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_demandes_identiques_dedupliquees(self):
+        premiere = self.client.post(reverse('export_job_submit'), {'format': 'csv', 'type_mouvement': 'sortie'})
+        seconde = self.client.post(reverse('export_job_submit'), {'format': 'csv', 'type_mouvement': 'sortie'})
+        autre = self.client.post(reverse('export_job_submit'), {'format': 'pdf', 'type_mouvement': 'sortie'})
+        self.assertEqual(premiere.status_code, 202)
+        self.assertEqual(seconde.status_code, 200)
+        self.assertEqual(premiere.json()['id'], seconde.json()['id'])
+        self.assertNotEqual(premiere.json()['id'], autre.json()['id'])
+
+    def test_worker_produit_le_fichier(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Nécessite une base de test sur fichier partagée entre processus.")
+        tache = self.client.post(reverse('export_job_submit'), {'format': 'csv', 'type_mouvement': 'sortie'}).json()
+        call_command('run_export_worker', '--une-fois', '--processus', '1', stdout=io.StringIO())
+
+        etat = self.client.get(tache['url_statut']).json()
+        self.assertEqual(etat['statut'], 'terminee')
+        self.assertEqual(etat['progression'], 100)
+        response = self.client.get(etat['url_telechargement'])
+        lignes = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lignes), 2)
+        self.assertIn(',sortie,3,', lignes[1])
+
+
+    def _tache(self, format='csv', **champs):
+        criteres = {'date_debut': '', 'date_fin': '', 'produit': '', 'type_mouvement': 'sortie', 'mode': ''}
+        return TacheExport.objects.create(
+            format=format, criteres=criteres, empreinte=os.urandom(8).hex(), **champs,
+        )
+
+    def test_processus_arrete_brutalement(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Nécessite une base de test sur fichier partagée entre processus.")
+        plantee, suivante = self._tache('pdf'), self._tache('csv')
+        sortie = io.StringIO()
+        with mock.patch('inventory.management.commands.run_export_worker.executer_tache', executer_ou_planter):
+            call_command('run_export_worker', '--une-fois', '--processus', '1', stdout=sortie, stderr=io.StringIO())
+        plantee.refresh_from_db()
+        suivante.refresh_from_db()
+        self.assertEqual((plantee.statut, plantee.erreur), ('echec', "Processus d'export interrompu."))
+        # Le pool est recréé : la tâche suivante est exécutée
+        self.assertEqual(suivante.statut, 'terminee')
+
+    def test_seules_les_taches_abandonnees_sont_relancees(self):
+        recente = timezone.now()
+        active = self._tache(statut='en_cours', worker='autre:1', date_pulsation=recente)
+        abandonnee = self._tache(statut='en_cours', worker='autre:2', date_pulsation=recente - timedelta(minutes=10))
+        self.assertEqual(TacheExport.relancer_abandonnees(timedelta(minutes=5)), 1)
+        active.refresh_from_db()
+        abandonnee.refresh_from_db()
+        self.assertEqual(active.statut, 'en_cours')
+        self.assertEqual((abandonnee.statut, abandonnee.worker), ('en_attente', ''))
+
+    def test_exports_perimes_purges(self):
+        maintenant = timezone.now()
+        ancien_fichier = taches.DOSSIER_EXPORTS / 'ancien.csv'
+        recent_fichier = taches.DOSSIER_EXPORTS / 'recent.csv'
+        ancien_fichier.write_text('x')
+        recent_fichier.write_text('x')
+        ancienne = self._tache(statut='terminee', fichier=str(ancien_fichier), date_fin=maintenant - timedelta(days=30))
+        recente = self._tache(statut='terminee', fichier=str(recent_fichier), date_fin=maintenant)
+        self.assertEqual(taches.purger(timedelta(days=7)), 1)
+        self.assertFalse(ancien_fichier.exists())
+        self.assertTrue(recent_fichier.exists())
+        self.assertFalse(TacheExport.objects.filter(pk=ancienne.pk).exists())
+        self.assertTrue(TacheExport.objects.filter(pk=recente.pk).exists())
+
+
+class RechercheProduitsTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('employe', password='x'))
+        categorie = Categorie.objects.create(nom='Électronique')
+        creer_produit('3700000000011', nom_produit='Câble USB', description='Câble de charge', categorie=categorie)
+        creer_produit('3700000000028', nom_produit='Chargeur USB rapide', categorie=categorie)
+        creer_produit('3700000000035', nom_produit='Clavier', description='Clavier sans fil USB')
+
+    def _recherche(self, query, **parametres):
+        return self.client.get(reverse('product_list'), {'q': query, **parametres}).context
+
+    def test_recherche_classee_et_sans_accents(self):
+        noms = [p.nom for p in self._recherche('cable')['products']]
+        self.assertEqual(noms, ['Câble USB'])
+        noms = [p.nom for p in self._recherche('usb')['products']]
+        self.assertEqual(sorted(noms), ['Chargeur USB rapide', 'Clavier', 'Câble USB'])
+
+    def test_index_suit_les_modifications(self):
+        produit = Produit.objects.get(code_barre='3700000000035')
+        produit.nom = 'Souris'
+        produit.description = ''
+        produit.save()
+        self.assertEqual([p.nom for p in self._recherche('souris')['products']], ['Souris'])
+        self.assertEqual(list(self._recherche('clavier')['products']), [])
+        produit.delete()
+        self.assertEqual(list(self._recherche('souris')['products']), [])
+
+    def test_triggers_absents_signales(self):
+        self.assertEqual(checks.verifier_index_plein_texte(None, databases=['default']), [])
+        # Ce que fait une reconstruction de la table par SQLite
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER inventory_produit_fts_au")
+        erreurs = checks.verifier_index_plein_texte(None, databases=['default'])
+        self.assertEqual([erreur.id for erreur in erreurs], ['inventory.E002'])
+        self.assertIn('inventory_produit_fts_au', erreurs[0].msg)
+
+    def test_code_barre_exact_sans_fts(self):
+        with CaptureQueriesContext(connection) as requetes:
+            context = self._recherche('3700000000028')
+        self.assertEqual([p.nom for p in context['products']], ['Chargeur USB rapide'])
+        self.assertFalse([q for q in requetes.captured_queries if 'inventory_produit_fts' in q['sql']])
+
+    def test_pagination_et_categories_jointes(self):
+        with mock.patch.object(views, 'PRODUITS_PAR_PAGE', 2):
+            context = self._recherche('usb')
+            self.assertEqual(len(context['products']), 2)
+            self.assertEqual(context['page_obj'].paginator.num_pages, 2)
+            with self.assertNumQueries(0):
+                [p.categorie for p in context['products']]
+
+
+class RechercheCodeBarreTests(TestCase):
+
+    def setUp(self):
+        cache_produits.cache.vider()
+        self.addCleanup(cache_produits.cache.vider)
+        self.produit = creer_produit('3700000000011', quantite=5)
+        self.client.force_login(User.objects.create_user('employe', password='x'))
+        self.url = reverse('product_barcode_lookup', args=['3700000000011'])
+
+    def test_succes_apres_premier_echec(self):
+        premiere = self.client.get(self.url)
+        self.assertEqual(premiere['X-Cache'], 'MISS')
+        self.assertEqual(premiere.json()['quantite_actuelle'], 5)
+        with CaptureQueriesContext(connection) as requetes:
+            seconde = self.client.get(self.url)
+        self.assertEqual(seconde['X-Cache'], 'HIT')
+        self.assertFalse([q for q in requetes.captured_queries if 'inventory_produit' in q['sql']])
+        self.assertEqual(cache_produits.cache.statistiques()['succes'], 1)
+
+    def test_code_inconnu(self):
+        response = self.client.get(reverse('product_barcode_lookup', args=['inconnu']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_mouvement_invalide_l_entree(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=2)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['quantite_actuelle'], 3)
+
+    def test_taille_bornee(self):
+        lru = cache_produits.CacheLRU(taille=2)
+        for pk in range(3):
+            lru.ecrire(f'code{pk}', {'id': pk})
+        self.assertIsNone(lru.lire('code0'))
+        self.assertEqual(lru.lire('code2'), {'id': 2})
+
+
+class SelecteurProduitTests(TestCase):
+
+    def setUp(self):
+        for i in range(30):
+            creer_produit(f'37{i:011d}', nom_produit=f'Article {i:02d}')
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+
+    def test_formulaire_ne_charge_pas_le_catalogue(self):
+        response = self.client.get(reverse('stock_in'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Article 00')
+        self.assertContains(response, reverse('product_autocomplete'))
+
+    def test_validation_lit_seulement_le_produit_choisi(self):
+        produit = Produit.objects.get(nom='Article 07')
+        form = MouvementStockForm(data={'produit': produit.pk, 'quantite': 3})
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertTrue(form.is_valid(), form.errors)
+        # Le champ puis la validation de la clé étrangère : deux lectures par clé primaire, aucun parcours
+        selects = [q['sql'] for q in requetes.captured_queries if 'FROM "inventory_produit"' in q['sql']]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertIn(f'"inventory_produit"."id" = {produit.pk}', sql)
+        self.assertContains(self.client.get(reverse('report_generation'), {'produit': produit.pk}), 'Article 07')
+
+    def test_autocompletion_par_prefixe_et_limite(self):
+        response = self.client.get(reverse('product_autocomplete'), {'q': 'Artic', 'limit': 5})
+        self.assertEqual(len(response.json()['resultats']), 5)
+        response = self.client.get(reverse('product_autocomplete'), {'q': '3700000000012'})
+        self.assertEqual([p['nom'] for p in response.json()['resultats']], ['Article 12'])
+        self.assertEqual(self.client.get(reverse('product_autocomplete')).json(), {'resultats': []})
+
+
+class AlerteStockTests(TestCase):
+
+    def setUp(self):
+        self.produit = creer_produit('AL1', quantite=20, seuil_alerte_faible=5)
+
+    def _etats(self):
+        return list(AlerteStock.objects.filter(produit=self.produit).order_by('pk').values_list('etat', 'date_fermeture'))
+
+    def test_ouverture_et_fermeture_au_franchissement_des_seuils(self):
+        # Création à 0 : rupture ouverte puis fermée par la réception initiale
+        self.assertEqual([etat for etat, _ in self._etats()], ['rupture'])
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=16)
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=2)
+        sortie = MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=2)
+        etats = self._etats()
+        self.assertEqual([etat for etat, _ in etats], ['rupture', 'faible', 'rupture'])
+        self.assertIsNotNone(etats[1][1])
+        self.assertIsNone(etats[2][1])
+        sortie.delete()
+        self.assertEqual(AlerteStock.ouvertes().get(produit=self.produit).etat, 'faible')
+
+    def test_changement_de_seuil(self):
+        self.produit.seuil_alerte_faible = 25
+        self.produit.save()
+        self.assertEqual(AlerteStock.ouvertes().get(produit=self.produit).etat, 'faible')
+        self.produit.seuil_alerte_faible = 5
+        self.produit.save()
+        self.assertFalse(AlerteStock.ouvertes().filter(produit=self.produit).exists())
+
+    def test_commande_de_reparation(self):
+        Produit.objects.filter(pk=self.produit.pk).update(quantite_actuelle=0)
+        AlerteStock.objects.all().delete()
+        call_command('repair_stock_alerts', stdout=io.StringIO())
+        self.assertEqual(AlerteStock.ouvertes().get(produit=self.produit).etat, 'rupture')
+        self.assertEqual(AlerteStock.synchroniser(), (0, 0))
+
+    def test_page_d_alertes_lit_la_table_des_alertes(self):
+        creer_produit('AL2', seuil_alerte_faible=3)
+        self.client.force_login(User.objects.create_user('employe', password='x'))
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('alert_list'))
+        self.assertContains(response, 'Produit AL2')
+        self.assertNotContains(response, 'Produit AL1')
+        sql = [q['sql'] for q in requetes.captured_queries if 'inventory_produit' in q['sql']]
+        self.assertTrue(all(q.split('FROM ')[1].startswith('"inventory_alertestock"') for q in sql))
+
+
+class StatistiquesProduitTests(TestCase):
+
+    def setUp(self):
+        self.fournisseur = Fournisseur.objects.create(nom='Grossiste')
+        self.produit = creer_produit('ST1')
+
+    def _statistiques(self):
+        return StatistiquesProduit.objects.get(produit=self.produit)
+
+    def test_agregats_tenus_par_les_mouvements(self):
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=10, fournisseur=self.fournisseur)
+        derniere = MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=4)
+        importer_mouvements(lire_csv(io.StringIO("code_barre,type_mouvement,quantite\nST1,entree,5\n")))
+        statistiques = self._statistiques()
+        self.assertEqual((statistiques.total_entrees, statistiques.total_sorties), (15, 4))
+        self.assertEqual(statistiques.dernier_fournisseur, self.fournisseur)
+        self.assertGreaterEqual(statistiques.date_dernier_mouvement, derniere.date_mouvement)
+        call_command('rebuild_product_stats', '--verifier', stdout=io.StringIO())
+
+    def test_suppression_recalcule_les_agregats(self):
+        entree = MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=3, fournisseur=self.fournisseur)
+        entree.delete()
+        statistiques = self._statistiques()
+        self.assertEqual(statistiques.total_entrees, 0)
+        self.assertIsNone(statistiques.date_dernier_mouvement)
+        self.assertIsNone(statistiques.dernier_fournisseur)
+
+    def test_verification_puis_reconstruction(self):
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=7)
+        StatistiquesProduit.objects.filter(produit=self.produit).update(total_entrees=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_product_stats', '--verifier', stdout=io.StringIO())
+        call_command('rebuild_product_stats', stdout=io.StringIO())
+        self.assertEqual(self._statistiques().total_entrees, 7)
+        call_command('rebuild_product_stats', '--verifier', stdout=io.StringIO())
+
+    def test_liste_des_produits_sans_requete_par_ligne(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('employe', password='x'))
+        # Session et droits mis en cache par un premier affichage
+        self.client.get(reverse('product_list'))
+        # Les nouveaux produits invalident les lignes en cache (après validation) : elles sont recalculées
+        with self.captureOnCommitCallbacks(execute=True):
+            creer_produit('ST2', quantite=2)
+        with CaptureQueriesContext(connection) as avant:
+            self.client.get(reverse('product_list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(10):
+                creer_produit(f'ST{i + 3}', quantite=2)
+        with CaptureQueriesContext(connection) as apres:
+            response = self.client.get(reverse('product_list'))
+        self.assertEqual(len(apres.captured_queries), len(avant.captured_queries))
+        self.assertContains(response, 'Total Reçu')
+
+
+class ReconciliationStockTests(TestCase):
+
+    def setUp(self):
+        self.produits = [creer_produit(f'RC{i}', quantite=10) for i in range(5)]
+
+    def test_rapport_et_reparation_des_ecarts(self):
+        # Suppression en masse : contourne MouvementStock.delete() et laisse la quantité en écart
+        MouvementStock.objects.create(produit=self.produits[1], type_mouvement='sortie', quantite=4)
+        MouvementStock.objects.filter(produit=self.produits[1], type_mouvement='sortie').delete()
+        Produit.objects.filter(pk=self.produits[3].pk).update(quantite_actuelle=0)
+
+        sortie = io.StringIO()
+        call_command('reconcile_stock', '--taille-lot', '2', '--verbosity', '2', stdout=sortie)
+        self.assertIn('Tranche', sortie.getvalue())
+        self.assertIn('2 en écart', sortie.getvalue())
+        self.assertIn(f'Produit {self.produits[1].pk} : quantité 6, grand livre 10', sortie.getvalue())
+
+        call_command('reconcile_stock', '--reparer', '--lot-reparation', '1', stdout=io.StringIO())
+        for produit in self.produits:
+            produit.refresh_from_db()
+            self.assertEqual(produit.quantite_actuelle, solde_du_grand_livre(produit))
+            self.assertEqual(StockJournalier.quantite_au(produit.pk, timezone.localdate()), produit.quantite_actuelle)
+        self.assertEqual(AlerteStock.ouvertes().get(produit=self.produits[3]).etat, 'faible')
+        # La sortie supprimée en masse ne figure plus dans les cumuls
+        self.assertFalse(CumulMouvements.objects.filter(dimension='produit', cle=self.produits[1].pk, sorties__gt=0).exists())
+        sortie = io.StringIO()
+        call_command('reconcile_stock', stdout=sortie)
+        self.assertIn('0 en écart', sortie.getvalue())
+
+    def test_un_agregat_groupe_par_tranche(self):
+        with CaptureQueriesContext(connection) as requetes:
+            call_command('reconcile_stock', '--taille-lot', '1000000', stdout=io.StringIO())
+        agregats = [q['sql'] for q in requetes.captured_queries if 'GROUP BY' in q['sql']]
+        self.assertEqual(len(agregats), 1)
+
+
+class CumulMouvementsTests(TestCase):
+
+    def setUp(self):
+        self.categorie = Categorie.objects.create(nom='Boissons')
+        self.fournisseur = Fournisseur.objects.create(nom='Grossiste')
+        self.produit = creer_produit('CU1', categorie=self.categorie)
+        self.autre = creer_produit('CU2')
+
+    def _cumuls(self):
+        return set(CumulMouvements.objects.exclude(nombre=0).values_list('dimension', 'cle', 'periode', 'date_debut', 'entrees', 'sorties', 'nombre'))
+
+    def test_mise_a_jour_incrementale_identique_a_la_reconstruction(self):
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=10, fournisseur=self.fournisseur)
+        MouvementStock.objects.create(produit=self.autre, type_mouvement='entree', quantite=4)
+        sortie = MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=3)
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=2)
+        sortie.delete()
+        importer_mouvements(lire_csv(io.StringIO("code_barre,type_mouvement,quantite,fournisseur\nCU2,entree,6,Grossiste\n")))
+        # Mouvement antidaté par une modification, comme depuis l'admin
+        ancien = MouvementStock.objects.create(produit=self.autre, type_mouvement='sortie', quantite=1)
+        ancien.date_mouvement = timezone.now() - timedelta(days=400)
+        ancien.save()
+
+        incrementaux = self._cumuls()
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(incrementaux, self._cumuls())
+        jour = timezone.localdate()
+        self.assertIn(('categorie', self.categorie.pk, 'jour', jour, 10, 2, 2), incrementaux)
+        self.assertIn(('fournisseur', self.fournisseur.pk, 'semaine', jour - timedelta(days=jour.weekday()), 16, 0, 2), incrementaux)
+
+    def test_changement_de_categorie_puis_modification_et_suppression(self):
+        ancien = MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=10)
+        ancien.date_mouvement = timezone.now() - timedelta(days=10)
+        ancien.save()
+        sortie = MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=3)
+        autre_categorie = Categorie.objects.create(nom='Épicerie')
+        self.produit.categorie = autre_categorie
+        self.produit.save()
+        # Modification et suppression d'anciens mouvements après le changement de catégorie
+        sortie.delete()
+        ancien.quantite = 8
+        ancien.save()
+        MouvementStock.objects.create(produit=self.autre, type_mouvement='entree', quantite=2)
+
+        incrementaux = self._cumuls()
+        self.assertFalse(CumulMouvements.objects.filter(Q(entrees__lt=0) | Q(sorties__lt=0) | Q(nombre__lt=0)).exists())
+        self.assertIn(('categorie', autre_categorie.pk, 'jour', timezone.localdate() - timedelta(days=10), 8, 0, 1), incrementaux)
+        self.assertFalse([cumul for cumul in incrementaux if cumul[:2] == ('categorie', self.categorie.pk)])
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(incrementaux, self._cumuls())
+
+        # Suppression de la catégorie : ses produits et leurs cumuls passent sans catégorie
+        autre_categorie.delete()
+        incrementaux = self._cumuls()
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(incrementaux, self._cumuls())
+
+    def test_endpoint_sans_lecture_des_mouvements(self):
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=5)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('analytics'), {'dimension': 'produit', 'produit': self.produit.pk, 'periode': 'jour', 'format': 'json'})
+        self.assertFalse([q for q in requetes.captured_queries if 'inventory_mouvementstock' in q['sql']])
+        points = response.json()['points']
+        self.assertEqual([(p['entrees'], p['sorties']) for p in points], [(5, 0)])
+        self.assertContains(self.client.get(reverse('analytics')), 'Entrées et Sorties')
+        response = self.client.get(reverse('analytics'), {'dimension': 'categorie', 'periode': 'jour', 'format': 'json'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PrevisionsTests(TestCase):
+
+    def test_calcul_vectorise(self):
+        # Produit 1 : 2 sorties par jour pendant 60 jours ; produit 2 : aucune ; clé 9 : produit supprimé
+        jours = np.arange(60)
+        cles = np.concatenate([np.full(60, 1), [9]])
+        resultats = previsions.calculer(
+            np.array([1, 2]), np.array([30.0, 5.0]), cles, np.concatenate([jours, [59]]), np.full(61, 2.0), 60,
+            fenetre=28, alpha=0.5, delai=7, coefficient=1.65, seuil_minimum=3,
+        )
+        self.assertEqual(resultats['demande_moyenne'].tolist(), [2.0, 0.0])
+        self.assertEqual(resultats['ecart_type'].tolist(), [0.0, 0.0])
+        self.assertAlmostEqual(resultats['demande_lissee'][0], 2.0)
+        self.assertAlmostEqual(resultats['jours_couverture'][0], 15.0)
+        self.assertTrue(np.isnan(resultats['jours_couverture'][1]))
+        # Sans demande, le point de commande ne descend pas sous le minimum
+        self.assertEqual(resultats['point_commande'].tolist(), [14, 3])
+
+    def test_produit_sans_demande_garde_son_seuil(self):
+        lent = creer_produit('PV0', quantite=40, seuil_alerte_faible=8)
+        actif = creer_produit('PV2', quantite=100, seuil_alerte_faible=5)
+        MouvementStock.objects.create(produit=actif, type_mouvement='sortie', quantite=90)
+        call_command('compute_forecasts', stdout=io.StringIO())
+        self.assertEqual(PrevisionStock.objects.get(produit=lent).point_commande, previsions.SEUIL_MINIMUM)
+
+        self.assertEqual(list(previsions.suggestions().values_list('produit_id', flat=True)), [actif.pk])
+        self.assertEqual(previsions.appliquer_suggestions(), 1)
+        # Même demandé explicitement, le seuil d'un produit sans demande n'est pas remplacé
+        self.assertEqual(previsions.appliquer_suggestions([lent.pk]), 0)
+        lent.refresh_from_db()
+        self.assertEqual(lent.seuil_alerte_faible, 8)
+
+    def test_suggestions_et_application(self):
+        produit = creer_produit('PV1', quantite=100, seuil_alerte_faible=5)
+        MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=90)
+        call_command('compute_forecasts', stdout=io.StringIO())
+        prevision = PrevisionStock.objects.get(produit=produit)
+        self.assertGreater(prevision.point_commande, produit.seuil_alerte_faible)
+
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.assertContains(self.client.get(reverse('reorder_suggestions')), 'Produit PV1')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('reorder_suggestions'), {'produits': [produit.pk]})
+        produit.refresh_from_db()
+        self.assertEqual(produit.seuil_alerte_faible, prevision.point_commande)
+        self.assertEqual(AlerteStock.ouvertes().get(produit=produit).etat, 'faible')
+        self.assertNotContains(self.client.get(reverse('reorder_suggestions')), 'Produit PV1')
+
+    def test_application_de_toutes_les_suggestions_par_lots(self):
+        for i in range(5):
+            produit = creer_produit(f'PT{i}', quantite=100, seuil_alerte_faible=5)
+            MouvementStock.objects.create(produit=produit, type_mouvement='sortie', quantite=90)
+        call_command('compute_forecasts', stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(previsions.appliquer_suggestions(taille_lot=2), 5)
+        # Un UPDATE par lot de 2 produits : jamais une liste IN de toutes les suggestions
+        mises_a_jour = [q for q in requetes.captured_queries if q['sql'].startswith('UPDATE "inventory_produit"')]
+        self.assertEqual(len(mises_a_jour), 3)
+        self.assertFalse(previsions.suggestions().exists())
+        self.assertEqual(AlerteStock.ouvertes().count(), 5)
+
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.assertRedirects(self.client.post(reverse('reorder_suggestions'), {'tous': '1'}), reverse('reorder_suggestions'))
+
+
+class ConnexionSQLiteTests(TestCase):
+
+    def test_pragmas_appliques_a_chaque_connexion(self):
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1) # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.produits = [creer_produit(f'INS{i}', quantite=5) for i in range(3)]
+
+    def test_inactive_par_defaut(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('product_list')))
+
+    @override_settings(INSTRUMENTATION_REQUETES=True, INSTRUMENTATION_BUDGET_REQUETES=1)
+    def test_entete_et_depassement_de_budget(self):
+        with self.assertLogs('inventory.instrumentation', 'WARNING') as journal:
+            response = self.client.get(reverse('product_list'))
+        self.assertRegex(response['Server-Timing'], r'^sql;dur=[\d.]+;desc="\d+ requetes", vue;dur=[\d.]+$')
+        ligne = json.loads(journal.records[0].getMessage())
+        self.assertEqual(ligne['vue'], 'product_list')
+        self.assertGreater(ligne['requetes'], 1)
+        self.assertEqual(ligne['depassements'], ['requetes'])
+
+    @override_settings(INSTRUMENTATION_REQUETES=True)
+    def test_flux_journalise_a_la_fin(self):
+        with self.assertLogs('inventory.instrumentation', 'INFO') as journal:
+            response = self.client.get(reverse('export_movements_csv'))
+            self.assertEqual(journal.records, []) # Rien avant la fin du flux
+            b''.join(response.streaming_content)
+        ligne = json.loads(journal.records[-1].getMessage())
+        self.assertEqual(ligne['vue'], 'export_movements_csv')
+        self.assertEqual(ligne['depassements'], [])
+
+    def test_lignes_info_ecrites_par_la_configuration_des_journaux(self):
+        logger = logging.getLogger('inventory.instrumentation')
+        self.assertTrue(logger.isEnabledFor(logging.INFO))
+        self.assertTrue([handler for handler in logger.handlers if handler.level <= logging.INFO])
+
+    def test_doublons_regroupes_par_empreinte(self):
+        mesure = instrumentation.MesureRequetes()
+        mesure.demarrer()
+        try:
+            for produit in self.produits:
+                Produit.objects.get(pk=produit.pk)
+            list(Produit.objects.filter(pk__in=[p.pk for p in self.produits[:2]]))
+            list(Produit.objects.filter(pk__in=[self.produits[2].pk]))
+        finally:
+            mesure.arreter()
+        self.assertEqual(mesure.nombre, 5)
+        self.assertEqual([doublon['nombre'] for doublon in mesure.doublons(2)], [3, 2])
+        self.assertEqual(
+            instrumentation.normaliser("SELECT 1 FROM t WHERE a = 'x' AND b IN (%s, %s)"),
+            "SELECT ? FROM t WHERE a = ? AND b IN (...)",
+        )
+
+
+
+
+class CacheCatalogueTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cache_catalogue.compteurs.vider()
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.employe = User.objects.create_user('employe', password='x')
+        self.categorie = Categorie.objects.create(nom='Papeterie')
+        self.produit = creer_produit('CAT1', nom_produit='Cahier', categorie=self.categorie)
+
+    def _lignes_produits(self, utilisateur):
+        self.client.force_login(utilisateur)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('product_list'))
+        # Seule la requête des lignes joint la table des statistiques
+        return response, [q for q in requetes.captured_queries if 'inventory_statistiquesproduit' in q['sql']]
+
+    def test_lignes_servies_depuis_le_cache_jusqu_a_une_modification(self):
+        _, lignes = self._lignes_produits(self.employe)
+        self.assertEqual(len(lignes), 1)
+        response, lignes = self._lignes_produits(self.employe)
+        self.assertEqual(lignes, [])
+        self.assertContains(response, 'Cahier')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=7)
+        response, lignes = self._lignes_produits(self.employe)
+        self.assertEqual(len(lignes), 1)
+        self.assertContains(response, '<td>7</td>', html=True)
+
+        # Renommer la catégorie change aussi les lignes des produits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categorie.nom = 'Bureau'
+            self.categorie.save()
+        self.assertContains(self._lignes_produits(self.employe)[0], 'Bureau')
+
+    def test_colonnes_d_actions_non_partagees_entre_profils(self):
+        edition = reverse('product_edit', args=[self.produit.pk])
+        self.assertContains(self._lignes_produits(self.admin)[0], edition)
+        self.assertNotContains(self._lignes_produits(self.employe)[0], edition)
+
+        self.client.force_login(self.admin)
+        self.assertContains(self.client.get(reverse('categorie_list')), reverse('categorie_edit', args=[self.categorie.pk]))
+        self.client.force_login(self.employe)
+        response = self.client.get(reverse('categorie_list'))
+        self.assertContains(response, 'Papeterie')
+        self.assertNotContains(response, reverse('categorie_edit', args=[self.categorie.pk]))
+        self.assertEqual(self.client.get(reverse('fournisseur_list')).status_code, 200)
+
+    def test_versions_partagees_et_invalidees_par_les_commandes(self):
+        version = cache_catalogue.versions('produit')
+        # Le cache local au processus ne contient pas les versions
+        cache.clear()
+        self.assertEqual(cache_catalogue.versions('produit'), version)
+        for commande in ('rebuild_product_stats', 'backfill_stock_journalier', 'repair_stock_alerts'):
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command(commande, stdout=io.StringIO())
+            self.assertNotEqual(cache_catalogue.versions('produit'), version, commande)
+            version = cache_catalogue.versions('produit')
+
+    def test_une_seule_ecriture_des_versions_par_transaction(self):
+        partage = cache_catalogue.partage()
+        with mock.patch.object(partage, 'set_many', wraps=partage.set_many) as ecriture:
+            with self.captureOnCommitCallbacks(execute=True):
+                MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=7)
+        self.assertEqual(ecriture.call_count, 1)
+        self.assertLessEqual(
+            {'inventory:catalogue:version:produit', 'inventory:catalogue:version:mouvement'},
+            set(ecriture.call_args.args[0]),
+        )
+
+    def test_cache_indisponible_apres_validation(self):
+        version = cache_catalogue.versions('produit')
+        partage = cache_catalogue.partage()
+        with mock.patch.object(partage, 'set_many', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('django', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    MouvementStock.objects.create(produit=self.produit, type_mouvement='entree', quantite=7)
+        # Le mouvement reste enregistré ; la version est écrite à la validation suivante
+        self.assertEqual(MouvementStock.objects.count(), 1)
+        self.assertEqual(cache_catalogue.versions('produit'), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            Fournisseur.objects.create(nom='Grossiste')
+        self.assertNotEqual(cache_catalogue.versions('produit'), version)
+
+    def test_statistiques(self):
+        self._lignes_produits(self.admin)
+        self._lignes_produits(self.admin)
+        statistiques = self.client.get(reverse('catalogue_cache_stats')).json()
+        self.assertEqual((statistiques['succes'], statistiques['echecs'], statistiques['taux_succes']), (1, 1, 0.5))
+        self.assertEqual(set(statistiques['versions']), {'produit', 'categorie', 'fournisseur'})
+
+
+class DroitsEnCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.groupe = Group.objects.create(name='Administrateurs')
+        self.groupe.permissions.add(Permission.objects.get(codename='view_mouvementstock'))
+        self.utilisateur = User.objects.create_user('gestionnaire', password='x')
+        self.utilisateur.groups.add(self.groupe)
+        self.client.login(username='gestionnaire', password='x')
+
+    def _rapport(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('report_generation'))
+        return response, [q['sql'] for q in requetes.captured_queries]
+
+    def test_droits_et_session_lus_dans_le_cache(self):
+        response, requetes = self._rapport()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue([sql for sql in requetes if 'auth_permission' in sql])
+        response, requetes = self._rapport()
+        self.assertEqual(response.status_code, 200)
+        # Toutes les requêtes : session, utilisateur, droits (entrée et version lues ensemble)
+        self.assertEqual(len(requetes), 3, requetes)
+        self.assertEqual(len([sql for sql in requetes if 'cache_partage' in sql]), 2)
+        # Droits et session sont dans le cache partagé, pas dans celui du processus
+        cache.clear()
+        self.assertEqual(len(self._rapport()[1]), 3)
+
+    def test_retrait_du_groupe_et_des_permissions(self):
+        self.assertEqual(self._rapport()[0].status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.groupe.permissions.clear()
+        self.assertEqual(self._rapport()[0].status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.utilisateur.user_permissions.add(Permission.objects.get(codename='view_mouvementstock'))
+        self.assertEqual(self._rapport()[0].status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.groupe.user_set.remove(self.utilisateur)
+        self.assertEqual(self._rapport()[0].status_code, 302)
+
+    def test_utilisateur_anonyme(self):
+        self.assertEqual(droits.groupes(AnonymousUser()), frozenset())
+
+
+    def test_cache_propre_au_processus_refuse(self):
+        self.assertEqual(checks.verifier_cache_partage(None), [])
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(CACHES={'default': locmem, 'partage': locmem}):
+            erreurs = checks.verifier_cache_partage(None)
+        self.assertEqual([erreur.id for erreur in erreurs], ['inventory.E001'])
+        self.assertIn("cache partagé 'partage'", erreurs[0].msg)
+        with override_settings(SESSION_CACHE_ALIAS='default'):
+            erreurs = checks.verifier_cache_partage(None)
+        self.assertEqual([erreur.id for erreur in erreurs], ['inventory.E001'])
+        self.assertIn("cache des sessions 'default'", erreurs[0].msg)
+
+
+class MigrationCachePartageTests(TransactionTestCase):
+
+    def test_table_du_cache_creee_par_migrate(self):
+        # Base seulement migrée : ni createcachetable, ni table créée par le lanceur de tests
+        call_command('migrate', 'inventory', '0010', verbosity=0)
+        self.assertNotIn('cache_partage', connection.introspection.table_names())
+        call_command('migrate', 'inventory', verbosity=0)
+        self.assertIn('cache_partage', connection.introspection.table_names())
+
+        User.objects.create_user('nouveau', password='x')
+        self.assertTrue(self.client.login(username='nouveau', password='x'))
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+
+class ApiV1Tests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.login(username='admin', password='x')
+        self.produits = [creer_produit(f'API{i}', nom_produit=f'Produit {i}') for i in range(3)]
+
+    def test_pagination_par_curseur_et_selection_des_champs(self):
+        url = reverse('api_v1_produits')
+        donnees = self.client.get(url, {'taille': 2, 'champs': 'id,nom'}).json()
+        self.assertEqual(donnees['resultats'], [{'id': p.pk, 'nom': p.nom} for p in self.produits[:2]])
+        suite = self.client.get(url, {'taille': 2, 'champs': 'id,nom', 'curseur': donnees['curseur_suivant']}).json()
+        self.assertEqual(suite, {'resultats': [{'id': self.produits[2].pk, 'nom': 'Produit 2'}], 'curseur_suivant': None})
+
+        self.assertEqual(self.client.get(url, {'champs': 'nom,mot_de_passe'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'curseur': '!!'}).status_code, 400)
+
+    def test_page_inchangee_renvoyee_en_304_sans_lire_les_produits(self):
+        url = reverse('api_v1_produits')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"v1-produits-'))
+        self.assertIn('Last-Modified', response)
+        # Seuls l'utilisateur et les versions du catalogue (cache partagé) sont lus
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertTrue([q for q in requetes.captured_queries if 'cache_partage' in q['sql']])
+        self.assertFalse([q for q in requetes.captured_queries if 'cache_partage' not in q['sql'] and 'auth_user' not in q['sql']])
+
+        # Un mouvement change les quantités des produits et la liste des mouvements
+        etag_mouvements = self.client.get(reverse('api_v1_mouvements'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            MouvementStock.objects.create(produit=self.produits[0], type_mouvement='entree', quantite=4)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resultats'][0]['quantite_actuelle'], 4)
+        self.assertEqual(self.client.get(reverse('api_v1_mouvements'), HTTP_IF_NONE_MATCH=etag_mouvements).status_code, 200)
+
+    def test_suppressions_en_set_null_changent_l_etag(self):
+        categorie = Categorie.objects.create(nom='Boissons')
+        fournisseur = Fournisseur.objects.create(nom='Grossiste')
+        employe = User.objects.create_user('employe', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            Produit.objects.filter(pk=self.produits[0].pk).update(categorie=categorie)
+            MouvementStock.objects.create(produit=self.produits[0], type_mouvement='entree', quantite=4, fournisseur=fournisseur, utilisateur=employe)
+        produits, mouvements = reverse('api_v1_produits'), reverse('api_v1_mouvements')
+
+        # Les produits de la catégorie supprimée passent sans catégorie
+        etag = self.client.get(produits)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            categorie.delete()
+        response = self.client.get(produits, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['resultats'][0]['categorie'])
+
+        # Les mouvements du fournisseur ou de l'utilisateur supprimé aussi
+        for supprime, champ in ((fournisseur, 'fournisseur'), (employe, 'utilisateur')):
+            etag = self.client.get(mouvements)['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                supprime.delete()
+            response = self.client.get(mouvements, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, champ)
+            self.assertIsNone(response.json()['resultats'][0][champ])
+
+    def test_compression_gzip(self):
+        url = reverse('api_v1_produits')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_mouvements_reserves_aux_lecteurs_des_rapports(self):
+        User.objects.create_user('employe', password='x')
+        self.client.login(username='employe', password='x')
+        self.assertEqual(self.client.get(reverse('api_v1_mouvements')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('api_v1_fournisseurs')).status_code, 200)
+
+
+class BenchmarkTests(TestCase):
+
+    def test_jeu_de_donnees_coherent(self):
+        call_command(
+            'seed_benchmark', '--produits', '30', '--fournisseurs', '4', '--categories', '3', '--mouvements', '600',
+            '--taille-lot', '100', stdout=io.StringIO(),
+        )
+        self.assertEqual(Produit.objects.count(), 30)
+        self.assertEqual(MouvementStock.objects.count(), 600)
+        # Quantités égales au solde du grand livre, points de contrôle et statistiques reconstruits
+        produits = Produit.objects.annotate(
+            solde=Sum('mouvementstock__quantite', filter=Q(mouvementstock__type_mouvement='entree'), default=0)
+            - Sum('mouvementstock__quantite', filter=Q(mouvementstock__type_mouvement='sortie'), default=0)
+        )
+        self.assertFalse(produits.exclude(quantite_actuelle=F('solde')).exists())
+        self.assertEqual(StatistiquesProduit.objects.count(), 30)
+        self.assertTrue(StockJournalier.objects.exists())
+        premier = MouvementStock.objects.order_by('date_mouvement').first()
+        self.assertLess(premier.date_mouvement, timezone.now() - timedelta(days=300))
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark', '--produits', '1', '--mouvements', '0', stdout=io.StringIO())
+
+    def test_mesures_et_detection_des_regressions(self):
+        creer_produit('BM1', quantite=5)
+        reference = os.path.join(tempfile.mkdtemp(), 'reference.json')
+        self.addCleanup(os.remove, reference)
+        arguments = ['benchmark_urls', '--repetitions', '2', '--echauffement', '0', '--vues', 'home', 'product_list', 'stock_document']
+        call_command(*arguments, '--sortie', reference, stdout=io.StringIO())
+        with open(reference, encoding='utf-8') as fichier:
+            mesures = json.load(fichier)['vues']
+        self.assertEqual(set(mesures), {'home', 'product_list', 'stock_document'})
+        self.assertGreater(mesures['product_list']['requetes'], 0)
+        self.assertEqual(mesures['stock_document'], {'url': reverse('stock_document'), 'statut': 405})
+        self.assertFalse(User.objects.filter(username='benchmark-urls').exists()) # Rollback
+
+        call_command(*arguments, '--comparer', reference, stdout=io.StringIO())
+        mesures['product_list']['requetes'] = 0
+        with open(reference, 'w', encoding='utf-8') as fichier:
+            json.dump({'vues': mesures}, fichier)
+        with self.assertRaisesMessage(CommandError, 'product_list'):
+            call_command(*arguments, '--comparer', reference, stdout=io.StringIO())
+
+
+class CopieRapportsTests(TransactionTestCase):
+    databases = {'default', 'rapports'}
+
+    def setUp(self):
+        # En test, 'rapports' est un miroir de la base de test : on la fait pointer vers une vraie copie
+        self.dossier = tempfile.TemporaryDirectory()
+        self.replique = connections['rapports']
+        self.nom_miroir = self.replique.settings_dict['NAME']
+        self.replique.close()
+        self.replique.settings_dict['NAME'] = os.path.join(self.dossier.name, 'rapports.sqlite3')
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.produit = creer_produit('COPIE1', quantite=50)
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=3, raison_mouvement='avant copie')
+
+    def tearDown(self):
+        self.replique.close()
+        self.replique.settings_dict['NAME'] = self.nom_miroir
+        self.dossier.cleanup()
+
+    def test_synchronisation_refusee_sur_la_base_principale(self):
+        self.replique.settings_dict['NAME'] = connection.settings_dict['NAME']
+        with self.assertRaises(CommandError):
+            call_command('sync_report_replica', stdout=io.StringIO())
+
+    def test_exports_lus_dans_la_copie_et_ecritures_sur_la_principale(self):
+        self.assertEqual(rapports.base_de_lecture(), 'default') # Pas encore de copie
+        call_command('sync_report_replica', stdout=io.StringIO())
+        self.assertEqual(rapports.base_de_lecture(), 'rapports')
+        MouvementStock.objects.create(produit=self.produit, type_mouvement='sortie', quantite=4, raison_mouvement='apres copie')
+
+        self.client.force_login(self.admin)
+        contenu = b''.join(self.client.get(reverse('export_movements_csv')).streaming_content).decode()
+        self.assertIn('avant copie', contenu)
+        self.assertNotIn('apres copie', contenu)
+        # Rapport sans date de fin : mouvements et stock de clôture viennent tous deux de la copie
+        response = self.client.get(reverse('report_generation'), {'produit': self.produit.pk})
+        self.assertEqual(len(response.context['movements']), 2)
+        self.assertEqual(response.context['stock_fin'], 47)
+
+        # La copie refuse toute écriture ; une instance lue dans la copie est enregistrée dans la principale
+        with self.assertRaises(OperationalError):
+            MouvementStock.objects.using('rapports').update(quantite=1)
+        produit = Produit.objects.using('rapports').get(pk=self.produit.pk)
+        produit.nom = 'Renommé'
+        produit.save()
+        self.assertEqual(Produit.objects.get(pk=self.produit.pk).nom, 'Renommé')
+
+        # Copie trop ancienne : retour à la base principale
+        with mock.patch.object(rapports, 'REPLIQUE_AGE_MAX', -1):
+            self.assertEqual(rapports.base_de_lecture(), 'default')
+
+    def test_lecture_longue_ne_bloque_pas_les_ecritures(self):
+        MouvementStock.objects.bulk_create(
+            MouvementStock(produit=self.produit, type_mouvement='entree', quantite=1) for _ in range(50)
+        )
+        call_command('sync_report_replica', stdout=io.StringIO())
+        # Export en cours : la lecture de la copie reste ouverte entre deux lots
+        with CaptureQueriesContext(connection) as principale, CaptureQueriesContext(self.replique) as copie:
+            lignes = rapports.lignes_export(rapports.mouvements_filtres({}), taille_lot=10)
+            next(lignes)
+        self.assertTrue([q for q in copie.captured_queries if 'inventory_mouvementstock' in q['sql']])
+        self.assertFalse([q for q in principale.captured_queries if 'inventory_mouvementstock' in q['sql']])
+        # Sans attente de verrou, une écriture bloquée échouerait immédiatement
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout = 0")
+        try:
+            MouvementStock(produit=self.produit, type_mouvement='entree', quantite=2).save()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA busy_timeout = 20000")
+        # 52 mouvements copiés (dont 2 créés par setUp), le premier déjà lu ; l'écriture suivante n'y figure pas
+        self.assertEqual(sum(1 for _ in lignes), 51)
+
+
+def _trafic_concurrent(produit_id, graine, operations):
+    connections.close_all()
+    rng = random.Random(graine)
+    for _ in range(operations):
+        type_mouvement = rng.choice(['entree', 'sortie'])
+        try:
+            MouvementStock(produit_id=produit_id, type_mouvement=type_mouvement, quantite=rng.randint(1, 5)).save()
+        except StockInsuffisant:
+            pass
+    connections.close_all()
+
+
+class MouvementStockConcurrenceTests(TransactionTestCase):
+
+    def test_aucune_derive_sous_trafic_multi_processus(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Nécessite une base de test sur fichier partagée entre processus.")
+        produit = creer_produit(quantite=20)
+        connections.close_all()
+
+        contexte = multiprocessing.get_context('fork')
+        processus = [contexte.Process(target=_trafic_concurrent, args=(produit.pk, graine, 40)) for graine in range(4)]
+        for p in processus:
+            p.start()
+        for p in processus:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        produit.refresh_from_db()
+        self.assertGreaterEqual(produit.quantite_actuelle, 0)
+        self.assertEqual(produit.quantite_actuelle, solde_du_grand_livre(produit))
@@ -11,6 +11,14 @@ urlpatterns = [
     path('products/add/', views.product_add_view, name='product_add'),
     path('products/edit/<int:pk>/', views.product_edit_view, name='product_edit'),
     path('products/delete/<int:pk>/', views.product_delete_view, name='product_delete'),
+    path('api/products/barcode/<str:code_barre>/', views.product_barcode_lookup_view, name='product_barcode_lookup'),
+    path('api/products/barcode-cache/', views.product_barcode_cache_stats_view, name='product_barcode_cache_stats'),
+    path('api/products/autocomplete/', views.product_autocomplete_view, name='product_autocomplete'),
+    path('api/catalogue-cache/', views.catalogue_cache_stats_view, name='catalogue_cache_stats'),
+    path('api/v1/produits/', views.api_v1_view, {'ressource': 'produits'}, name='api_v1_produits'),
+    path('api/v1/categories/', views.api_v1_view, {'ressource': 'categories'}, name='api_v1_categories'),
+    path('api/v1/fournisseurs/', views.api_v1_view, {'ressource': 'fournisseurs'}, name='api_v1_fournisseurs'),
+    path('api/v1/mouvements/', views.api_v1_view, {'ressource': 'mouvements'}, name='api_v1_mouvements'),
 
     # URLs pour les Catégories
     path('categories/', views.categorie_list_view, name='categorie_list'),
@@ -27,12 +35,20 @@ urlpatterns = [
     # URLs pour les Mouvements de Stock
     path('stock_in/', views.stock_in_view, name='stock_in'),
     path('stock_out/', views.stock_out_view, name='stock_out'),
+    path('stock/import/', views.import_movements_view, name='import_movements'),
+    path('stock/document/', views.stock_document_view, name='stock_document'),
 
     # URLs pour les Alertes
     path('alerts/', views.alert_list_view, name='alert_list'),
+    path('alerts/reorder-suggestions/', views.reorder_suggestions_view, name='reorder_suggestions'),
     
     # URLs pour les Rapports et Exports
     path('reports/', views.report_generation_view, name='report_generation'),
+    path('reports/stock-at-date/', views.stock_at_date_view, name='stock_at_date'),
+    path('reports/analytics/', views.analytics_view, name='analytics'),
     path('reports/export/csv/', views.export_movements_csv, name='export_movements_csv'),
     path('reports/export/pdf/', views.export_movements_pdf, name='export_movements_pdf'),
+    path('reports/export/jobs/', views.export_job_submit_view, name='export_job_submit'),
+    path('reports/export/jobs/<int:pk>/', views.export_job_status_view, name='export_job_status'),
+    path('reports/export/jobs/<int:pk>/download/', views.export_job_download_view, name='export_job_download'),
 ]
\ No newline at end of file
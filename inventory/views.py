@@ -1,77 +1,58 @@
 # inventory/views.py
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required, permission_required, user_passes_test
-from django.db import models, transaction
-from datetime import timedelta, date
-from dateutil.relativedelta import relativedelta
+from django.db import DEFAULT_DB_ALIAS, models
+from datetime import timedelta
+from django.utils import timezone
 
 from django.contrib.auth import logout as auth_logout
 from django.contrib import messages
-from django.db.models import Q, Sum
-from django.db.models.functions import Coalesce
 
 # Imports pour les modèles
-from .models import Produit, Categorie, MouvementStock, Fournisseur
+from .models import AlerteStock, Produit, Categorie, Fournisseur, StockInsuffisant, StockJournalier, TacheExport
 # Imports pour les formulaires (assurez-vous que tous sont définis dans forms.py)
-from .forms import ProduitForm, MouvementStockForm, RapportMouvementsForm, CategorieForm, FournisseurForm
+from .forms import ProduitForm, MouvementStockForm, RapportMouvementsForm, CategorieForm, FournisseurForm, StockADateForm, AnalyseMouvementsForm
+from .importation import LECTEURS, ErreurImport, detecter_encodage, detecter_format, enregistrer_document, importer_mouvements
+from . import analyses, api, cache_catalogue, cache_produits, droits, previsions, rapports, recherche, tableau_de_bord, taches
 
 # Imports pour les réponses HTTP (export CSV/PDF)
-from django.http import HttpResponse # Importé ici car utilisé pour HttpResponse
-import csv # Pour la génération CSV
-import io # Pour gérer les fichiers en mémoire (pour PDF)
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse, Http404
+from django.core.exceptions import PermissionDenied
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET, require_POST
+import io # Pour lire les imports envoyés dans le corps de la requête
+import json # Corps des bons de réception / sortie multi-lignes
+import tempfile # Fichier temporaire de l'export PDF
 
-# Imports pour l'export PDF (assurez-vous d'avoir pip install reportlab)
-from reportlab.lib.pagesizes import letter, A4 # A4 est plus commun en Europe
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.lib.units import inch # Ajouté ici, car il était potentiellement manquant
+# Export PDF (assurez-vous d'avoir pip install reportlab)
+from . import export_pdf
+
+
+# Nombre de produits par page (liste, stock à date, suggestions) et maximum renvoyé par l'autocomplétion
+PRODUITS_PAR_PAGE = getattr(settings, 'PRODUITS_PAR_PAGE', 50)
+PRODUITS_AUTOCOMPLETION_MAX = getattr(settings, 'PRODUITS_AUTOCOMPLETION_MAX', 50)
 
 
 # Helper pour vérifier si l'utilisateur est administrateur (peut être basé sur le groupe ou is_staff)
+# Les groupes sont lus dans le cache des droits (droits.py), pas en base à chaque requête
 def is_admin(user):
-    return user.is_staff or user.groups.filter(name='Administrateurs').exists()
+    return user.is_staff or droits.GROUPE_ADMINISTRATEURS in droits.groupes(user)
 
 # Helper pour vérifier si l'utilisateur est employé (ou fait partie du groupe Employés)
 def is_employee(user):
-    return user.groups.filter(name='Employés').exists()
+    return droits.GROUPE_EMPLOYES in droits.groupes(user)
 
 
 # --- Vues Générales ---
 
 @login_required
 def home_view(request):
-    low_stock_products = Produit.objects.filter(quantite_actuelle__lte=models.F('seuil_alerte_faible'), quantite_actuelle__gt=0).order_by('nom')
-
-    total_products = Produit.objects.count()
-    total_low_stock_products = low_stock_products.count()
-    total_out_of_stock_products = Produit.objects.filter(quantite_actuelle=0).count()
-
-    recent_movements = MouvementStock.objects.all().order_by('-date_mouvement')[:5]
-
-    today = date.today()
-    one_month_ago = today - relativedelta(months=1)
-
-    total_in_last_month = MouvementStock.objects.filter(
-        date_mouvement__gte=one_month_ago,
-        type_mouvement='entree'
-    ).aggregate(total_qty=Coalesce(Sum('quantite'), 0))['total_qty']
-
-    total_out_last_month = MouvementStock.objects.filter(
-        date_mouvement__gte=one_month_ago,
-        type_mouvement='sortie'
-    ).aggregate(total_qty=Coalesce(Sum('quantite'), 0))['total_qty']
-
-    context = {
-        'low_stock_products': low_stock_products,
-        'total_products': total_products,
-        'total_low_stock_products': total_low_stock_products,
-        'total_out_of_stock_products': total_out_of_stock_products,
-        'recent_movements': recent_movements,
-        'total_in_last_month': total_in_last_month,
-        'total_out_last_month': total_out_last_month,
-    }
+    # Compteurs, alertes et derniers mouvements servis depuis le cache (voir tableau_de_bord.py)
+    context = tableau_de_bord.obtenir()
     return render(request, 'inventory/home.html', context)
 
 
@@ -86,21 +67,85 @@ def custom_logout_view(request):
 
 @login_required
 def product_list_view(request):
-    products = Produit.objects.all()
     query = request.GET.get('q')
-    if query:
-        products = products.filter(
-            models.Q(nom__icontains=query) |
-            models.Q(code_barre__icontains=query)
-        ).distinct()
-    products = products.order_by('nom')
+    # Recherche plein texte classée et paginée, catégories chargées par jointure (voir recherche.py)
+    paginator = Paginator(recherche.rechercher_produits(query), PRODUITS_PAR_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
     context = {
-        'products': products,
+        'products': page.object_list,
+        'page_obj': page,
         'query': query,
+        # Lignes servies depuis le cache tant qu'aucun produit ni aucune catégorie n'a changé (voir cache_catalogue.py)
+        'cle_fragment': cache_catalogue.cle(
+            'produits', ('produit', 'categorie'), request.user,
+            q=query or '', page=page.number, taille=PRODUITS_PAR_PAGE,
+        ),
     }
     return render(request, 'inventory/product_list.html', context)
 
 
+@login_required
+def product_barcode_lookup_view(request, code_barre):
+    # Recherche rapide pour les douchettes, servie depuis le cache LRU du processus
+    resume, succes = cache_produits.rechercher(code_barre)
+    if resume is None:
+        response = JsonResponse({'erreur': f"Aucun produit avec le code-barres '{code_barre}'."}, status=404)
+    else:
+        response = JsonResponse(resume)
+    response['X-Cache'] = 'HIT' if succes else 'MISS'
+    return response
+
+
+@login_required
+@user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
+def product_barcode_cache_stats_view(request):
+    return JsonResponse(cache_produits.cache.statistiques())
+
+
+@login_required
+@user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
+def catalogue_cache_stats_view(request):
+    return JsonResponse(cache_catalogue.statistiques())
+
+
+@gzip_page
+@require_GET
+@login_required
+def api_v1_view(request, ressource):
+    # Synchronisation du catalogue et des mouvements (voir api.py) : droits et paramètres vérifiés
+    # avant les entêtes conditionnels, puis 304 sans lire les tables du stock si la page n'a pas changé
+    permission = api.RESSOURCES[ressource]['permission']
+    if permission and not request.user.has_perm(permission):
+        raise PermissionDenied
+    try:
+        api.parametres(request, ressource)
+    except api.ParametreInvalide as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+    return _api_v1_page(request, ressource)
+
+
+@condition(etag_func=api.etag, last_modified_func=api.derniere_modification)
+def _api_v1_page(request, ressource):
+    champs, apres, taille = api.parametres(request, ressource)
+    resultats, suivant = api.page(ressource, champs, apres, taille)
+    return JsonResponse({'resultats': resultats, 'curseur_suivant': suivant})
+
+
+@login_required
+def product_autocomplete_view(request):
+    # Options du sélecteur de produit, chargées pendant la saisie (préfixe de nom ou de code-barres)
+    limite_max = PRODUITS_AUTOCOMPLETION_MAX
+    try:
+        limite = min(max(int(request.GET.get('limit', 20)), 1), limite_max)
+    except ValueError:
+        limite = 20
+    resultats = [
+        {'id': p.pk, 'nom': p.nom, 'code_barre': p.code_barre, 'quantite_actuelle': p.quantite_actuelle}
+        for p in recherche.autocompleter(request.GET.get('q'), limite)
+    ]
+    return JsonResponse({'resultats': resultats})
+
+
 @permission_required('inventory.add_produit', raise_exception=True)
 def product_add_view(request):
     if request.method == 'POST':
@@ -157,6 +202,9 @@ def categorie_list_view(request):
     categories = Categorie.objects.all().order_by('nom')
     context = {
         'categories': categories,
+        'cle_fragment': cache_catalogue.cle(
+            'categories', ('categorie',), request.user, droits=('inventory.change_categorie', 'inventory.delete_categorie'),
+        ),
     }
     return render(request, 'inventory/categorie_list.html', context)
 
@@ -221,6 +269,9 @@ def fournisseur_list_view(request):
     fournisseurs = Fournisseur.objects.all().order_by('nom')
     context = {
         'fournisseurs': fournisseurs,
+        'cle_fragment': cache_catalogue.cle(
+            'fournisseurs', ('fournisseur',), request.user, droits=('inventory.change_fournisseur', 'inventory.delete_fournisseur'),
+        ),
     }
     return render(request, 'inventory/fournisseur_list.html', context)
 
@@ -309,14 +360,16 @@ def stock_out_view(request):
             produit = form.cleaned_data['produit']
             quantite_sortie = form.cleaned_data['quantite']
 
-            if quantite_sortie > produit.quantite_actuelle:
+            mouvement = form.save(commit=False)
+            mouvement.type_mouvement = 'sortie'
+            mouvement.utilisateur = request.user
+            try:
+                # Le contrôle du stock est fait par la base, dans la transaction de l'enregistrement
+                mouvement.save()
+            except StockInsuffisant:
+                produit.refresh_from_db(fields=['quantite_actuelle'])
                 messages.error(request, f"Erreur : La quantité de sortie ({quantite_sortie}) dépasse le stock actuel ({produit.quantite_actuelle}) pour '{produit.nom}'.")
             else:
-                mouvement = form.save(commit=False)
-                mouvement.type_mouvement = 'sortie'
-                mouvement.utilisateur = request.user
-                mouvement.save()
-
                 messages.success(request, f"Sortie de {mouvement.quantite} unités de '{mouvement.produit.nom}' enregistrée avec succès.")
                 return redirect('product_list')
     else:
@@ -328,171 +381,288 @@ def stock_out_view(request):
     return render(request, 'inventory/stock_out_form.html', context)
 
 
+@require_POST
+@permission_required('inventory.add_mouvementstock', raise_exception=True)
+def import_movements_view(request):
+    # Accepte un fichier envoyé dans le champ 'fichier' ou le corps brut de la requête
+    fichier = request.FILES.get('fichier')
+    if fichier is not None:
+        format_fichier = request.POST.get('format') or detecter_format(fichier.name)
+        binaire = fichier.file
+    else:
+        type_contenu = request.content_type or ''
+        format_fichier = request.GET.get('format') or ('jsonl' if 'json' in type_contenu else 'csv')
+        binaire = io.BytesIO(request.body)
+    flux = io.TextIOWrapper(binaire, encoding=detecter_encodage(binaire), newline='')
+
+    if format_fichier not in LECTEURS:
+        return JsonResponse({'erreur': f"Format inconnu '{format_fichier}'."}, status=400)
+
+    try:
+        total = importer_mouvements(LECTEURS[format_fichier](flux), utilisateur=request.user)
+    except ErreurImport as e:
+        return JsonResponse({'erreur': e.message, 'ligne': e.ligne, 'lignes_importees': e.lignes_importees}, status=400)
+    except UnicodeDecodeError:
+        return JsonResponse({'erreur': "Encodage du fichier non reconnu (UTF-8 ou Windows-1252 attendu)."}, status=400)
+    return JsonResponse({'lignes_importees': total})
+
+
+@require_POST
+@permission_required('inventory.add_mouvementstock', raise_exception=True)
+def stock_document_view(request):
+    # Bon de réception ou de sortie multi-lignes (JSON), enregistré en une seule transaction :
+    # {"type_mouvement": "entree", "fournisseur": "...", "raison_mouvement": "...", "lignes": [{"code_barre": "...", "quantite": 3}]}
+    try:
+        document = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'erreur': "JSON invalide."}, status=400)
+    if not isinstance(document, dict) or not isinstance(document.get('lignes'), list):
+        return JsonResponse({'erreur': "Le champ 'lignes' (liste) est obligatoire."}, status=400)
+
+    try:
+        total = enregistrer_document(
+            document.get('type_mouvement'),
+            document['lignes'],
+            utilisateur=request.user,
+            fournisseur=document.get('fournisseur'),
+            raison_mouvement=document.get('raison_mouvement'),
+        )
+    except ErreurImport as e:
+        return JsonResponse({'erreur': e.message, 'ligne': e.ligne}, status=400)
+    return JsonResponse({'mouvements_enregistres': total}, status=201)
+
+
 # --- Vues pour les Alertes et Rapports ---
 
 @login_required
 def alert_list_view(request):
-    low_stock_products = Produit.objects.filter(
-        models.Q(quantite_actuelle__lte=models.F('seuil_alerte_faible'))
-    ).order_by('nom')
+    # Alertes ouvertes, tenues à jour par les mouvements (voir AlerteStock.synchroniser)
+    alertes = AlerteStock.ouvertes().select_related('produit').order_by('produit__nom')
     context = {
-        'low_stock_products': low_stock_products,
+        'alertes': alertes,
     }
     return render(request, 'inventory/alert_list.html', context)
 
 
+@permission_required('inventory.change_produit', raise_exception=True)
+def reorder_suggestions_view(request):
+    # Points de commande calculés par manage.py compute_forecasts (voir previsions.py)
+    suggestions = previsions.suggestions()
+    if request.method == 'POST':
+        if request.POST.get('tous'):
+            produit_ids = None
+        else:
+            produit_ids = [int(pk) for pk in request.POST.getlist('produits') if pk.isdigit()]
+        modifies = previsions.appliquer_suggestions(produit_ids)
+        messages.success(request, f"Seuil d'alerte mis à jour pour {modifies} produit(s).")
+        return redirect('reorder_suggestions')
+
+    paginator = Paginator(suggestions, PRODUITS_PAR_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    context = {
+        'suggestions': page.object_list,
+        'page_obj': page,
+    }
+    return render(request, 'inventory/reorder_suggestions.html', context)
+
+
 @permission_required('inventory.view_mouvementstock', raise_exception=True)
 @user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
 def report_generation_view(request):
     form = RapportMouvementsForm(request.GET or None)
     movements = None
+    stock_debut = stock_fin = age_donnees = None
+    page_precedente_url = page_suivante_url = None
     if form.is_valid():
         date_debut = form.cleaned_data.get('date_debut')
         date_fin = form.cleaned_data.get('date_fin')
         produit = form.cleaned_data.get('produit')
-        type_mouvement = form.cleaned_data.get('type_mouvement')
-
-        movements = MouvementStock.objects.all()
-
-        if date_debut:
-            movements = movements.filter(date_mouvement__gte=date_debut)
-        if date_fin:
-            movements = movements.filter(date_mouvement__lt=date_fin + timedelta(days=1))
+        # Copie des rapports si elle est à jour, sinon base principale ; toutes les lectures du rapport y sont faites
+        base = rapports.base_de_lecture()
+
+        # Pagination par curseur : le coût d'une page ne dépend pas de sa position dans la période
+        movements, precedent, suivant = rapports.page_de_mouvements(
+            rapports.mouvements_filtres(form.cleaned_data, using=base),
+            apres=rapports.decoder_curseur(request.GET.get('apres', '')),
+            avant=rapports.decoder_curseur(request.GET.get('avant', '')),
+            taille=rapports.taille_de_page(request.GET.get('taille')),
+        )
+
+        # Les liens de page conservent les filtres courants
+        parametres = request.GET.copy()
+        parametres.pop('apres', None)
+        parametres.pop('avant', None)
+        if precedent:
+            parametres['avant'] = precedent
+            page_precedente_url = '?' + parametres.urlencode()
+            del parametres['avant']
+        if suivant:
+            parametres['apres'] = suivant
+            page_suivante_url = '?' + parametres.urlencode()
+
+        # Stock d'ouverture et de clôture de la période, lus dans les points de contrôle journaliers de la même base
+        # que les mouvements (sans date de fin : clôture du jour, pas la quantité actuelle de la base principale)
         if produit:
-            movements = movements.filter(produit=produit)
-        if type_mouvement:
-            movements = movements.filter(type_mouvement=type_mouvement)
-
-        movements = movements.order_by('-date_mouvement')
+            if date_debut:
+                stock_debut = StockJournalier.quantite_au(produit.pk, date_debut - timedelta(days=1), using=base)
+            stock_fin = StockJournalier.quantite_au(produit.pk, date_fin or timezone.localdate(), using=base)
+        if base != DEFAULT_DB_ALIAS:
+            age_donnees = rapports.age_replique()
 
     context = {
         'form': form,
         'movements': movements,
+        'stock_debut': stock_debut,
+        'stock_fin': stock_fin,
+        'page_precedente_url': page_precedente_url,
+        'page_suivante_url': page_suivante_url,
+        'age_donnees': age_donnees,
     }
     return render(request, 'inventory/report_form.html', context)
 
 
+@login_required
+def stock_at_date_view(request):
+    form = StockADateForm(request.GET or None)
+    products = page = None
+    if form.is_valid():
+        jour = form.cleaned_data['date']
+        # Paginé comme la liste des produits : la sous-requête du point de contrôle n'est évaluée que pour la page affichée
+        paginator = Paginator(
+            Produit.objects
+            .annotate(quantite_a_date=StockJournalier.sous_requete_quantite(jour))
+            .order_by('nom', 'pk'),
+            PRODUITS_PAR_PAGE,
+        )
+        page = paginator.get_page(request.GET.get('page'))
+        products = page.object_list
+    context = {
+        'form': form,
+        'products': products,
+        'page_obj': page,
+    }
+    return render(request, 'inventory/stock_at_date.html', context)
+
+
 # --- Vues pour l'Export de Rapports ---
 
 @permission_required('inventory.view_mouvementstock', raise_exception=True)
-@user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
-def export_movements_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="rapport_mouvements.csv"'
+def analytics_view(request):
+    # Séries lues dans les cumuls pré-calculés (CumulMouvements), jamais dans les mouvements
+    form = AnalyseMouvementsForm(request.GET or {'dimension': 'tout', 'periode': 'semaine'})
+    points = None
+    if form.is_valid():
+        points = analyses.serie(
+            form.cleaned_data['dimension'],
+            form.cleaned_data['periode'],
+            cle=form.cle(),
+            date_debut=form.cleaned_data['date_debut'],
+            date_fin=form.cleaned_data['date_fin'],
+        )
+
+    if request.GET.get('format') == 'json':
+        if points is None:
+            return JsonResponse({'erreur': form.errors.get_json_data()}, status=400)
+        return JsonResponse({
+            'dimension': form.cleaned_data['dimension'],
+            'cle': form.cle(),
+            'periode': form.cleaned_data['periode'],
+            'points': [
+                {'date': point['date_debut'].isoformat(), 'entrees': point['entrees'], 'sorties': point['sorties'], 'nombre': point['nombre']}
+                for point in points
+            ],
+        })
+
+    context = {
+        'form': form,
+        'points': points,
+        # Échelle des barres du graphique
+        'maximum': max((max(point['entrees'], point['sorties']) for point in points or []), default=0) or 1,
+    }
+    return render(request, 'inventory/analytics.html', context)
 
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Produit', 'Code Barre', 'Type Mouvement', 'Quantite', 'Raison Mouvement', 'Utilisateur', 'Fournisseur'])
 
+@permission_required('inventory.view_mouvementstock', raise_exception=True)
+@user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
+def export_movements_csv(request):
     form = RapportMouvementsForm(request.GET)
-    movements = MouvementStock.objects.all()
-    if form.is_valid():
-        date_debut = form.cleaned_data.get('date_debut')
-        date_fin = form.cleaned_data.get('date_fin')
-        produit = form.cleaned_data.get('produit')
-        type_mouvement = form.cleaned_data.get('type_mouvement')
+    movements = rapports.mouvements_filtres(form.cleaned_data if form.is_valid() else {})
 
-        if date_debut:
-            movements = movements.filter(date_mouvement__gte=date_debut)
-        if date_fin:
-            movements = movements.filter(date_mouvement__lt=date_fin + timedelta(days=1))
-        if produit:
-            movements = movements.filter(produit=produit)
-        if type_mouvement:
-            movements = movements.filter(type_mouvement=type_mouvement)
-
-    movements = movements.order_by('-date_mouvement')
-
-    for movement in movements:
-        writer.writerow([
-            movement.date_mouvement.strftime('%Y-%m-%d %H:%M:%S'),
-            movement.produit.nom,
-            movement.produit.code_barre,
-            movement.get_type_mouvement_display(),
-            movement.quantite,
-            movement.raison_mouvement if movement.raison_mouvement else '',
-            movement.utilisateur.username if movement.utilisateur else 'N/A',
-            movement.fournisseur.nom if movement.fournisseur else '',
-        ])
+    # Réponse en flux : le fichier est produit et envoyé au fil de la lecture en base
+    response = StreamingHttpResponse(rapports.flux_csv(movements), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="rapport_mouvements.csv"'
     return response
 
 
 @permission_required('inventory.view_mouvementstock', raise_exception=True)
 @user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
 def export_movements_pdf(request):
-    # Utilise BytesIO pour écrire le PDF en mémoire
-    buffer = io.BytesIO() # <<< CORRECTION ICI
-    doc = SimpleDocTemplate(buffer, pagesize=A4) # <<< CORRECTION ICI
+    form = RapportMouvementsForm(request.GET)
+    criteres = form.cleaned_data if form.is_valid() else {}
+    movements = rapports.mouvements_filtres(criteres)
+    resume = True if request.GET.get('mode') == 'resume' else None
+
+    # Le PDF est écrit dans un fichier temporaire puis envoyé par blocs (FileResponse ferme le fichier)
+    fichier = tempfile.TemporaryFile()
+    try:
+        export_pdf.ecrire_pdf(fichier, movements, criteres, resume=resume)
+    except Exception:
+        fichier.close()
+        raise
+    fichier.seek(0)
+    return FileResponse(fichier, content_type='application/pdf', filename='rapport_mouvements.pdf')
+
+
+# --- Vues pour les Exports en arrière-plan ---
+
+def _etat_tache(tache):
+    etat = {
+        'id': tache.pk,
+        'format': tache.format,
+        'statut': tache.statut,
+        'progression': tache.progression,
+        'lignes_traitees': tache.lignes_traitees,
+        'lignes_total': tache.lignes_total,
+        'url_statut': reverse('export_job_status', args=[tache.pk]),
+    }
+    if tache.statut == 'terminee':
+        etat['url_telechargement'] = reverse('export_job_download', args=[tache.pk])
+    if tache.statut == 'echec':
+        etat['erreur'] = tache.erreur
+    return etat
 
-    elements = []
-    styles = getSampleStyleSheet()
 
-    # Titre du rapport
-    title_style = styles['h1']
-    title_style.alignment = 1 # Centre
-    elements.append(Paragraph("Rapport des Mouvements de Stock", title_style))
-    elements.append(Paragraph("<br/><br/>", styles['Normal'])) # Espace
+@require_POST
+@permission_required('inventory.view_mouvementstock', raise_exception=True)
+@user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
+def export_job_submit_view(request):
+    format_export = request.POST.get('format')
+    if format_export not in dict(TacheExport.FORMAT_CHOICES):
+        return JsonResponse({'erreur': "Format d'export invalide."}, status=400)
+    form = RapportMouvementsForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'erreur': form.errors.get_json_data()}, status=400)
 
-    # Récupérer les mouvements de stock avec les mêmes filtres
-    form = RapportMouvementsForm(request.GET)
-    movements = MouvementStock.objects.all()
-    if form.is_valid():
-        date_debut = form.cleaned_data.get('date_debut')
-        date_fin = form.cleaned_data.get('date_fin')
-        produit = form.cleaned_data.get('produit')
-        type_mouvement = form.cleaned_data.get('type_mouvement')
-
-        if date_debut:
-            elements.append(Paragraph(f"De: {date_debut.strftime('%d/%m/%Y')}", styles['Normal']))
-            movements = movements.filter(date_mouvement__gte=date_debut)
-        if date_fin:
-            elements.append(Paragraph(f"À: {date_fin.strftime('%d/%m/%Y')}", styles['Normal']))
-            movements = movements.filter(date_mouvement__lt=date_fin + timedelta(days=1))
-        if produit:
-            elements.append(Paragraph(f"Produit: {produit.nom}", styles['Normal']))
-            movements = movements.filter(produit=produit)
-        if type_mouvement:
-            elements.append(Paragraph(f"Type de Mouvement: {dict(MouvementStock.TYPE_MOUVEMENT_CHOICES).get(type_mouvement, type_mouvement)}", styles['Normal']))
-            movements = movements.filter(type_mouvement=type_mouvement)
-        
-        elements.append(Paragraph("<br/>", styles['Normal'])) # Espace
-        
-    movements = movements.order_by('-date_mouvement')
-
-    # Préparer les données pour le tableau PDF
-    data = [
-        ['Date', 'Produit', 'Type Mouvement', 'Quantité', 'Raison Mouvement', 'Utilisateur', 'Fournisseur']
-    ]
-    for movement in movements:
-        data.append([
-            movement.date_mouvement.strftime('%Y-%m-%d %H:%M:%S'),
-            movement.produit.nom + ' (' + movement.produit.code_barre + ')',
-            movement.get_type_mouvement_display(),
-            str(movement.quantite), # Convertir en chaîne
-            movement.raison_mouvement if movement.raison_mouvement else '',
-            movement.utilisateur.username if movement.utilisateur else 'N/A',
-            movement.fournisseur.nom if movement.fournisseur else '',
-        ])
-
-    # Créer le tableau
-    table = Table(data, colWidths=[1.3*inch, 1.8*inch, 1*inch, 0.8*inch, 1.5*inch, 1*inch, 1*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#343a40')), # Couleur de l'entête
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('LEFTPADDING', (0, 0), (-1, -1), 3),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-        ('FONTSIZE', (0,0), (-1,-1), 8), # Taille de police réduite
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('WORDWRAP', (1,1), (1,-1), True), # En cas de noms de produits longs
-        ('WORDWRAP', (4,1), (4,-1), True), # En cas de raisons longues
-    ]))
-
-    elements.append(table)
-
-    doc.build(elements)
-    buffer.seek(0) # Ramène le curseur au début du buffer
-    return HttpResponse(buffer.getvalue(), content_type='application/pdf') 
\ No newline at end of file
+    # Une demande identique déjà en attente ou en cours est réutilisée
+    criteres = taches.criteres_de_requete(form, mode=request.POST.get('mode', ''))
+    tache, creee = TacheExport.soumettre(format_export, criteres, utilisateur=request.user)
+    return JsonResponse(_etat_tache(tache), status=202 if creee else 200)
+
+
+@permission_required('inventory.view_mouvementstock', raise_exception=True)
+@user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
+def export_job_status_view(request, pk):
+    tache = get_object_or_404(TacheExport, pk=pk)
+    return JsonResponse(_etat_tache(tache))
+
+
+@permission_required('inventory.view_mouvementstock', raise_exception=True)
+@user_passes_test(is_admin, login_url='/login/', redirect_field_name='')
+def export_job_download_view(request, pk):
+    tache = get_object_or_404(TacheExport, pk=pk, statut='terminee')
+    try:
+        fichier = open(tache.fichier, 'rb')
+    except OSError:
+        raise Http404("Le fichier de l'export n'est plus disponible.")
+    content_type = 'text/csv' if tache.format == 'csv' else 'application/pdf'
+    return FileResponse(fichier, content_type=content_type, as_attachment=True, filename=f"rapport_mouvements.{tache.format}")
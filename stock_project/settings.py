@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En premier pour mesurer toute la requête ; inactif tant que INSTRUMENTATION_REQUETES est faux
+    'inventory.instrumentation.InstrumentationRequetesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +52,28 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Hausse relative de latence (p95) ou de pic mémoire au-delà de laquelle benchmark_urls --comparer échoue
+BENCHMARK_SEUIL_REGRESSION = 0.25
+
+# Mesure des requêtes SQL et de la durée de chaque vue (voir inventory/instrumentation.py)
+INSTRUMENTATION_REQUETES = False
+INSTRUMENTATION_BUDGET_REQUETES = 30      # Au-delà, la requête est journalisée en WARNING
+INSTRUMENTATION_BUDGET_DUREE_MS = 500
+INSTRUMENTATION_DOUBLONS_MIN = 3          # Nombre d'exécutions d'un même SQL à partir duquel il est signalé
+
+# Journaux : sans configuration, Python n'affiche que WARNING et au-delà ; les lignes JSON de
+# l'instrumentation (INFO pour chaque requête) sont écrites sur la sortie d'erreur du serveur
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inventory.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 ROOT_URLCONF = 'stock_project.urls'
 
 TEMPLATES = [
@@ -77,9 +101,123 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            # BEGIN IMMEDIATE : une transaction prend le verrou d'écriture dès son ouverture et attend
+            # (busy_timeout) au lieu d'échouer en "database is locked" lors du passage lecture -> écriture
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Base de test sur fichier (et non en mémoire) pour que les tests multi-processus partagent la même base
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    # Copie en lecture seule de la base, lue par les rapports et les exports (voir inventory/routeurs.py).
+    # Rafraîchie par la commande sync_report_replica ; absente ou trop ancienne, les rapports lisent 'default'.
+    'rapports': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_rapports.sqlite3',
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+# Les écritures vont toujours sur 'default' ; aucune migration n'est appliquée à la copie des rapports
+DATABASE_ROUTERS = ['inventory.routeurs.RouteurRapports']
+
+# Alias de la copie lue par les rapports et âge maximal (secondes) au-delà duquel on lit la base principale
+RAPPORTS_BASE_LECTURE = 'rapports'
+RAPPORTS_REPLIQUE_AGE_MAX = 15 * 60
+
+# PRAGMA appliqués à chaque nouvelle connexion SQLite (voir inventory/signals.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',        # Les lectures ne bloquent plus les écritures (et inversement)
+    'busy_timeout': 20000,        # Attente maximale (ms) d'un verrou avant "database is locked"
+    'synchronous': 'NORMAL',      # En WAL : fsync aux points de contrôle seulement, sans risque de corruption
+    'mmap_size': 268435456,       # Lectures par projection mémoire (256 Mo)
+    'cache_size': -65536,         # Cache de pages par connexion (64 Mo ; valeur négative = en Kio)
+    'temp_store': 'MEMORY',
+}
+
+# PRAGMA des connexions à la copie des rapports (RAPPORTS_BASE_LECTURE) : aucune écriture possible
+SQLITE_PRAGMAS_RAPPORTS = {
+    'query_only': 'ON',
+    'mmap_size': 268435456,
+    'cache_size': -65536,
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Le cache mémoire ('default') est propre à chaque processus : il ne garde que des entrées dont la clé
+# change à chaque invalidation (fragments du catalogue, tableau de bord). Le reste est gardé dans le cache 'partage'.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gestion-de-stock',
+    },
+    # Cache commun à tous les processus (serveurs web et commandes de gestion) : versions du catalogue,
+    # droits et sessions, pour qu'une invalidation faite par un processus soit vue par tous.
+    # Table créée par la migration inventory 0011 (createcachetable) ; Redis ou Memcached conviennent aussi, un cache
+    # propre au processus (LocMemCache, DummyCache) est refusé par la vérification inventory.E001.
+    'partage': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_partage',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Durée de vie (secondes) des indicateurs de la page d'accueil en cache
+TABLEAU_DE_BORD_CACHE_TIMEOUT = 300
+
+# Sessions lues dans le cache partagé (écrites aussi en base : une session évincée du cache reste valide)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'partage'
+
+# Groupes et permissions de chaque utilisateur gardés en cache (inventory/droits.py) ;
+# invalidés dès qu'un utilisateur, ses groupes ou les permissions d'un groupe changent
+AUTHENTICATION_BACKENDS = ['inventory.droits.BackendDroitsEnCache']
+DROITS_CACHE_TIMEOUT = 300
+
+# API JSON de synchronisation (api/v1/...) : lignes par page par défaut et maximum (?taille=)
+API_TAILLE_PAGE = 100
+API_TAILLE_PAGE_MAX = 1000
+
+# Durée de vie (secondes) des fragments en cache des listes du catalogue (produits, catégories, fournisseurs) ;
+# ils sont de toute façon ignorés dès qu'une modification change la version du modèle
+CATALOGUE_CACHE_TIMEOUT = 3600
+
+# Cache LRU (par processus) de la recherche par code-barres : nombre d'entrées et durée de vie en secondes
+SCANNER_CACHE_TAILLE = 10000
+SCANNER_CACHE_TTL = 30
+
+# Nombre de produits par page dans la liste et la recherche de produits
+PRODUITS_PAR_PAGE = 50
+# Nombre maximal de produits renvoyés par l'autocomplétion du sélecteur de produit
+PRODUITS_AUTOCOMPLETION_MAX = 50
+
+# Nombre de mouvements par page de rapport (modifiable par ?taille=, dans la limite du maximum)
+RAPPORT_TAILLE_PAGE = 100
+RAPPORT_TAILLE_PAGE_MAX = 1000
+
+# Au-delà de ce nombre de mouvements, l'export PDF ne contient que les totaux par produit
+EXPORT_PDF_LIGNES_MAX = 20000
+
+# Dossier des fichiers produits par les tâches d'export en arrière-plan (manage.py run_export_worker)
+EXPORTS_DIR = BASE_DIR / 'exports'
+# Durée de conservation des exports terminés (tâches et fichiers), purgés par le worker
+EXPORTS_RETENTION_JOURS = 7
+
+# Prévisions de demande et points de commande suggérés (manage.py compute_forecasts)
+PREVISION_HISTORIQUE_JOURS = 90   # Jours de sorties lus ; au-delà, le poids du lissage exponentiel est négligeable
+PREVISION_FENETRE_JOURS = 28      # Fenêtre de la moyenne mobile et de l'écart-type de la demande
+PREVISION_ALPHA = 0.3             # Coefficient du lissage exponentiel
+PREVISION_DELAI_REAPPRO_JOURS = 7 # Délai de réapprovisionnement couvert par le point de commande
+PREVISION_COEFFICIENT_SECURITE = 1.65 # Stock de sécurité en écarts-types (environ 95 % de service)
+PREVISION_SEUIL_MINIMUM = 1       # Point de commande minimal suggéré (un seuil à 0 couperait les alertes)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators